@@ -3,4 +3,51 @@
 METADATA_DIR = "metadata"
 DATA_DIR = "data"
 MAX_ENTRIES_PER_PARQUET = 500
+MAX_BYTES_PER_PARQUET = 256 * 1024 * 1024  # Shards are also finalized past this size
 SAVE_THRESHOLD = 50  # Save every 50 entries
+ID_INDEX_FILE = "id_index.sqlite"  # IDs already harvested / ingested, shared by both pipelines
+
+# PDF downloader
+DOWNLOAD_CONCURRENCY = 8  # Downloads in flight at once per category
+DOWNLOAD_REQUESTS_PER_SECOND = 1.0  # Politeness budget shared by all downloads of all categories
+DOWNLOAD_MAX_BYTES = 50 * 1024 * 1024  # Larger PDFs are rejected
+DOWNLOAD_MAX_RETRIES = 4
+DOWNLOAD_BACKOFF_BASE = 2.0  # Seconds, doubled on every retry
+DOWNLOAD_TIMEOUT = 120  # Seconds per download
+RETRY_MAX_ATTEMPTS = 6  # Failed runs after which a paper is given up (404s and non-PDFs are given up at once)
+RETRY_BACKOFF_BASE = 300  # Seconds before a failed paper is retried, doubled on every failure
+RETRY_BACKOFF_CAP = 86400  # Maximum seconds between two retries of a paper
+DOWNLOAD_SPILL_BYTES = 20 * 1024 * 1024  # Larger PDFs go to a temporary file instead of memory
+DOWNLOAD_SPILL_DIR = "/dev/shm"  # tmpfs for the spilled PDFs (system temporary directory if missing)
+DOWNLOAD_CACHE_DIR = None  # Local cache of the downloaded PDFs and sources, e.g. "download_cache" (disabled if None)
+DOWNLOAD_CACHE_MAX_BYTES = 200 * 1024 ** 3  # Least recently used downloads are evicted past this size
+
+# Ingest pipeline
+INGEST_WORKERS = 4  # Categories ingested at once, each in its own process
+INGEST_PROGRESS_FILE = "ingest_progress.json"  # Status of every category, for restarts
+INGEST_SOURCE = "pdf"  # "pdf", or "latex" to extract e-print sources and fall back to the PDF without them
+EXTRACT_WORKERS = None  # Text extraction processes split between the category workers (None: one per core)
+EXTRACT_HEAD_PAGES = 50  # Pages kept from the start of long PDFs (None: every page)
+EXTRACT_TAIL_PAGES = 10  # Pages kept from the end of long PDFs, so the references boundary is not lost
+EXTRACT_TIMEOUT = 120  # Seconds before the extraction of a document is killed
+EXTRACT_MAX_BYTES = 2 * 1024 * 1024  # Cap on the extracted text of a document (UTF-8 bytes)
+PIPELINE_QUEUE_SIZE = 16  # Capacity of each queue between download, extraction and writing
+PIPELINE_REPORT_INTERVAL = 30  # Seconds between two queue depth / throughput reports
+TAR_WRITE_BATCH = 1000  # Papers written at once when ingesting bulk tar archives (split by category)
+
+# Metadata harvester
+ARXIV_API_URL = "http://export.arxiv.org/api/query"
+HARVEST_OUTPUT_FORMAT = "parquet"  # "parquet" (dataset directory per category) or "json" (legacy)
+HARVEST_PAGE_SIZE = 2000
+HARVEST_MAX_START = 20000  # Last offset requested within a single window
+HARVEST_WINDOW_CAP = 10000  # Maximum results per submittedDate window
+HARVEST_START_DATE = "199101010000"  # Lower bound of the first window (YYYYMMDDHHMM)
+HARVEST_REQUESTS_PER_SECOND = 1.0  # Global budget shared by all categories
+HARVEST_CONCURRENT_QUERIES = 4  # Categories in flight at once
+HARVEST_CONCURRENT_WINDOWS = 8  # Windows fetched at once across all categories
+HARVEST_COALESCE = True  # Merge categories smaller than a page into OR-combined queries
+HARVEST_MAX_RETRIES = 5
+HARVEST_BACKOFF_BASE = 2.0  # Seconds, doubled on every retry
+HARVEST_TIMEOUT = 120  # Seconds per request
+HARVEST_CACHE_DIR = "harvest_cache"  # Compressed API responses, keyed by query URL (under --output-dir)
+HARVEST_CACHE_TTL = 86400  # Seconds a cached page is served without revalidation
@@ -1,113 +1,535 @@
-from utils.file_utils import ensure_dir, load_metadata
-from utils.pdf_utils import extract_text_from_pdf
-from utils.download_utils import download_paper
-from utils.parquet_utils import get_last_processed_id, save_to_parquet
-from config import METADATA_DIR, DATA_DIR, SAVE_THRESHOLD
+from utils.pdf_utils import extract_text_within_budget, cap_text
+from utils.timebox_utils import TimeboxedPool
+from utils.latex_utils import extract_text_from_source
+from utils.download_utils import download_pdfs
+from utils.manifest_utils import CategoryWriter
+from utils.id_index_utils import IdIndex, normalize_arxiv_id
+from utils.metadata_store_utils import list_metadata_categories, iter_metadata_batches, count_metadata_records
+from utils.file_utils import write_json_atomic
+from utils.rate_limit_utils import SharedTokenBucket
+from utils.pipeline_utils import run_pipeline
+from utils.tar_utils import iter_tar_pdfs
+from utils.retry_queue_utils import RetryQueue
+from utils.blob_cache_utils import BlobCache
+from config import (METADATA_DIR, SAVE_THRESHOLD, MAX_ENTRIES_PER_PARQUET, MAX_BYTES_PER_PARQUET, ID_INDEX_FILE,
+                    DOWNLOAD_CONCURRENCY, DOWNLOAD_REQUESTS_PER_SECOND, DOWNLOAD_MAX_BYTES, DOWNLOAD_MAX_RETRIES,
+                    DOWNLOAD_BACKOFF_BASE, DOWNLOAD_TIMEOUT, DOWNLOAD_SPILL_BYTES, DOWNLOAD_SPILL_DIR,
+                    EXTRACT_WORKERS, PIPELINE_QUEUE_SIZE, PIPELINE_REPORT_INTERVAL, INGEST_WORKERS,
+                    INGEST_PROGRESS_FILE, INGEST_SOURCE, TAR_WRITE_BATCH, EXTRACT_HEAD_PAGES, EXTRACT_TAIL_PAGES,
+                    EXTRACT_TIMEOUT, EXTRACT_MAX_BYTES, RETRY_MAX_ATTEMPTS, RETRY_BACKOFF_BASE, RETRY_BACKOFF_CAP,
+                    DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_MAX_BYTES)
 
+import argparse
+import asyncio
+import json
 import os 
 import re
-import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+# Metadata columns needed for ingest (the category comes from the dataset name)
+METADATA_COLUMNS = ["title", "authors", "published_year", "summary", "pdf_link"]
 
-def process_papers():
-    # Iterate through each JSON file in the METADATA_DIR
-    for json_file in os.listdir(METADATA_DIR):
-        
-        if not json_file.endswith(".json"):
-            continue
-        
-        category = os.path.splitext(json_file)[0]
-        
-        # Path to the JSON metadata file
-        category_path = os.path.join(METADATA_DIR, json_file)
-        
-        # Load metadata from the JSON file
-        metadata = load_metadata(category_path)
-        
-        # Get the last processed arXiv ID from parquet files (if any)
-        last_processed_arxiv_id = get_last_processed_id(category) 
-        
-        # Initialize an empty list to store the current batch of data
-        data_chunk = []
-        
-        # Define the path to the directory where the papers' PDFs will be saved
-        category_data_dir = os.path.join(DATA_DIR, category)
-        ensure_dir(category_data_dir)
-
-        # Flag to resume processing from the last processed paper
-        resume_processing = last_processed_arxiv_id is None 
-    
-
-        # Iterate through each paper in the metadata
-        for i, paper in enumerate(metadata):            
-            # Extract the arXiv ID from the PDF link
-            arxiv_id_match = re.search(r"(\d{4}\.\d+)", paper['pdf_link'])
-            
-            if not arxiv_id_match:
-                legacy_match = re.search(r"[a-z\-]+\/(\d{6,})", paper['pdf_link'])
-                
-                if legacy_match:
-                    arxiv_id = legacy_match.group(1)
-                else:
-                    print(f"⚠ Skipping paper {paper['title']} (Invalid ArXiv ID)")
-                    continue
+# Download limiter shared by every category worker, set by `init_worker`
+shared_limiter = None
+
+
+def iter_category_metadata(category_path):
+    """
+    Streams the metadata of a category paper by paper, in record batches.
+    """
+    for batch in iter_metadata_batches(category_path, columns=METADATA_COLUMNS):
+        yield from batch.to_pylist()
+
+
+def pending_papers(category, metadata, manifest, harvested_ids, ingested_ids, queued_ids=()):
+    """
+    Yields the download jobs of the papers of a category that still have to be processed.
+
+    Args:
+        category (str): The category name.
+        metadata (iterable of dict): The metadata of the category.
+        manifest (IngestManifest): The ingest manifest of the category.
+        harvested_ids (IdIndex): Index of the papers already harvested.
+        ingested_ids (IdIndex): Index of the papers already ingested.
+        queued_ids (set of str): The arXiv IDs left to the retry queue.
+
+    Yields:
+        tuple: ((index, arxiv_id, index_id, paper), pdf_link) pairs, as expected by `download_pdfs`.
+    """
+    # Iterate through each paper in the metadata
+    for i, paper in enumerate(metadata):
+        # Extract the arXiv ID from the PDF link
+        arxiv_id_match = re.search(r"(\d{4}\.\d+)", paper['pdf_link'])
+
+        if not arxiv_id_match:
+            legacy_match = re.search(r"[a-z\-]+\/(\d{6,})", paper['pdf_link'])
+
+            if legacy_match:
+                arxiv_id = legacy_match.group(1)
             else:
-                arxiv_id = arxiv_id_match.group(0)
-           
-            if not resume_processing:
-                if arxiv_id == last_processed_arxiv_id:
-                    print(f"Found last processed paper {arxiv_id}, resuming_downloads...")
-                    resume_processing = True
+                print(f"⚠ Skipping paper {paper['title']} (Invalid ArXiv ID)")
                 continue
+        else:
+            arxiv_id = arxiv_id_match.group(0)
 
-            # Define the path for saving the downloaded PDF
-            pdf_filename = f"{arxiv_id}.pdf"
-            pdf_path = os.path.join(category_data_dir, pdf_filename)
-
-            # Download the paper using the arXiv ID and save to the specified directory
-            if not download_paper(paper['pdf_link'], arxiv_id, category_data_dir):
-                continue  # Skip if download fails
-            
-            # Extract text from the downloaded PDF
-            pdf_text = extract_text_from_pdf(pdf_path)
-            if not pdf_text:
-                print(f"⚠ Skipping {arxiv_id} (Empty PDF text)")
-                os.remove(pdf_path)
-                print(f"🗑 Deleted {pdf_filename}")
+        # Skip papers already in the category's shards, and failed papers left to the retry queue
+        if arxiv_id in manifest or arxiv_id in queued_ids:
+            continue
+
+        # Skip papers already ingested, or harvested under another category, before any download
+        index_id = normalize_arxiv_id(paper['pdf_link'])
+        if index_id:
+            harvested_category = harvested_ids.get(index_id)
+            if index_id in ingested_ids or (harvested_category and harvested_category != category):
+                print(f"⏭ Skipping {arxiv_id} (already processed)")
                 continue
-            
-            data_chunk.append({
-                "arxiv_id": arxiv_id,
-                "title": paper["title"],
-                "authors": ", ".join(paper["authors"]),
-                "year": paper["published_year"],
-                "category": category,
-                "summary": paper["summary"], 
-                "pdf_content": pdf_text, 
-
-            })
-
-            # Print progress
-            print(i)
-            
-            # Delete the PDF after processing
-            os.remove(pdf_path)
-            print(f"🗑 Deleted {pdf_filename}")
-
-            # Save data to Parquet every SAVE_THRESHOLD papers
-            if len(data_chunk) >= SAVE_THRESHOLD:
-                save_to_parquet(category, data_chunk)
-                data_chunk = []  # Reset the data chunk
-        
-
-            time.sleep(1)
-
-        # Final save if there is remaining data
-        if data_chunk:
-            save_to_parquet(category, data_chunk)
-    
+
+        yield (i, arxiv_id, index_id, paper), paper['pdf_link']
+
+
+def extract_pdf_within_budget(pdf):
+    """
+    Extracts the text of a PDF within the configured page and size budget.
+    """
+    return extract_text_within_budget(pdf, EXTRACT_HEAD_PAGES, EXTRACT_TAIL_PAGES, EXTRACT_MAX_BYTES)
+
+
+def extract_download(pdf):
+    """
+    Extracts the text of a downloaded PDF. Runs in the extraction pool, whose workers are killed after
+    EXTRACT_TIMEOUT seconds.
+
+    Args:
+        pdf (bytes or str): The PDF bytes, or the path of the temporary file a large PDF was spilled to.
+
+    Returns:
+        tuple: The extracted text (None if the PDF could not be read) and the limits applied to it.
+    """
+    # Spilled PDFs are the only ones that ever touch the disk. They are removed before the extraction, which
+    # may be killed on the way
+    if isinstance(pdf, str):
+        with open(pdf, "rb") as f:
+            data = f.read()
+        os.remove(pdf)
+        pdf = data
+
+    return extract_pdf_within_budget(pdf)
+
+
+def source_link(pdf_link):
+    """
+    Builds the link of a paper's e-print source from its PDF link.
+
+    Args:
+        pdf_link (str): e.g. 'http://arxiv.org/pdf/2101.01234v1'.
+
+    Returns:
+        str: e.g. 'http://arxiv.org/e-print/2101.01234v1'.
+    """
+    return pdf_link.replace("/pdf/", "/e-print/", 1)
+
+
+def extract_source_within_budget(data):
+    """
+    Extracts the text of an e-print source within the configured budget.
+
+    arXiv serves the PDF itself for papers submitted without source, in which case the PDF is extracted.
+    """
+    if data.startswith(b"%PDF"):
+        return extract_pdf_within_budget(data)
+
+    text = extract_text_from_source(data)
+    if text is None:
+        return None, ["no LaTeX document in the source"]
+    text, note = cap_text(text, EXTRACT_MAX_BYTES)
+    return text, [note] if note else []
+
+
+def extract_source(source):
+    """
+    Extracts the text of a downloaded e-print source. Runs in the extraction pool, whose workers are killed
+    after EXTRACT_TIMEOUT seconds.
+
+    Args:
+        source (bytes or str): The source bytes, or the path of the temporary file it was spilled to.
+
+    Returns:
+        tuple: The extracted text (None if the source holds no usable document) and the limits applied to it.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            data = f.read()
+        os.remove(source)
+    else:
+        data = source
+
+    return extract_source_within_budget(data)
+
+
+def paper_record(category, arxiv_id, paper, pdf_text):
+    """
+    Builds the Parquet record of an ingested paper.
+    """
+    return {
+        "arxiv_id": arxiv_id,
+        "title": paper["title"],
+        "authors": ", ".join(paper["authors"]),
+        "year": paper["published_year"],
+        "category": category,
+        "summary": paper["summary"],
+        "pdf_content": pdf_text,
+    }
+
+
+def with_retries(jobs, retry_queue, category, manifest):
+    """
+    Yields the fresh download jobs first, then the retries of the category that are due, so retries never
+    hold back fresh downloads.
+    """
+    yield from jobs
+
+    due = [(item, url) for item, url in retry_queue.due(category) if item[1] not in manifest]
+    if due:
+        print(f"🔁 Retrying {len(due)} failed downloads of {category}")
+    yield from due
+
+
+async def process_category(category, category_path, harvested_ids, ingested_ids, retry_queue, extract_pool,
+                           extract_workers, download_cache=None, output_dir="."):
+    """
+    Downloads, extracts and saves every pending paper of a category through the staged ingest
+    pipeline: downloads, text extraction in the process pool and Parquet writes all overlap.
+
+    With INGEST_SOURCE set to "latex", the e-print sources are ingested first and the papers without a
+    usable LaTeX source go through the PDF path afterwards. Failed downloads go to the retry queue, and the
+    retries that are due are drained after the fresh downloads.
+
+    Args:
+        category (str): The category name.
+        category_path (str): The metadata of the category (Parquet dataset or legacy JSON file).
+        harvested_ids (IdIndex): Index of the papers already harvested.
+        ingested_ids (IdIndex): Index of the papers already ingested.
+        retry_queue (RetryQueue): The queue of failed downloads.
+        extract_pool (TimeboxedPool): The pool running the text extraction.
+        extract_workers (int): Number of processes in the pool.
+        download_cache (BlobCache, optional): The local cache of the downloads.
+        output_dir (str): The directory of the shards and the manifest of the category.
+
+    Returns:
+        IngestManifest: The manifest of the category.
+    """
+    # Stream the metadata in record batches, so downloads start after the first batch
+    metadata = iter_category_metadata(category_path)
+
+    writer = CategoryWriter(category, ingested_ids, max_rows=MAX_ENTRIES_PER_PARQUET, max_bytes=MAX_BYTES_PER_PARQUET,
+                            output_dir=output_dir)
+    jobs = pending_papers(category, metadata, writer.manifest, harvested_ids, ingested_ids,
+                          retry_queue.queued_ids(category))
+
+    def download(jobs, expect_pdf=True):
+        return download_pdfs(
+            jobs,
+            max_concurrency=DOWNLOAD_CONCURRENCY,
+            requests_per_second=DOWNLOAD_REQUESTS_PER_SECOND,
+            max_bytes=DOWNLOAD_MAX_BYTES,
+            max_retries=DOWNLOAD_MAX_RETRIES,
+            backoff_base=DOWNLOAD_BACKOFF_BASE,
+            timeout=DOWNLOAD_TIMEOUT,
+            spill_bytes=DOWNLOAD_SPILL_BYTES,
+            spill_dir=DOWNLOAD_SPILL_DIR,
+            limiter=shared_limiter,
+            expect_pdf=expect_pdf,
+            cache=download_cache,
+        )
+
+    def write_batch(batch):
+        data_chunk = [paper_record(category, arxiv_id, paper, pdf_text)
+                      for (i, arxiv_id, index_id, paper), pdf_text, _ in batch]
+        ids = [(arxiv_id, index_id) for (i, arxiv_id, index_id, paper), _, _ in batch]
+        limited = {item[1]: "; ".join(notes) for item, _, notes in batch if notes}
+        return ids, writer.write(data_chunk), limited
+
+    def on_written(result):
+        ids, shard, limited = result
+        writer.written(ids, shard, limited)
+        retry_queue.remove(category, [arxiv_id for arxiv_id, _ in ids])
+
+    def on_failure(item, stage, error):
+        writer.fail(item[1], f"{stage}: {error}")
+
+        # Only transient download failures are worth another attempt
+        retryable = stage == "download" and getattr(error, "retryable", False)
+        delay = retry_queue.record_failure(category, item, item[3]["pdf_link"], f"{stage}: {error}", retryable)
+        outcome = f"retrying in {delay / 60:.0f} min" if delay is not None else "giving up"
+        if stage == "download":
+            print(f"❌ Failed to download {item[1]}: {error} ({outcome})")
+        else:
+            print(f"⚠ Skipping {item[1]} ({error})")
+
+    # Papers whose LaTeX source could not be used, to be retried from their PDF
+    fallback = []
+
+    def on_source_failure(item, stage, error):
+        fallback.append((item, item[3]["pdf_link"]))
+
+    async def ingest(downloads, extract, on_failure):
+        await run_pipeline(
+            downloads,
+            extract,
+            extract_pool,
+            write_batch,
+            on_written=on_written,
+            on_failure=on_failure,
+            batch_size=SAVE_THRESHOLD,
+            queue_size=PIPELINE_QUEUE_SIZE,
+            extract_workers=extract_workers,
+            report_interval=PIPELINE_REPORT_INTERVAL,
+        )
+
+    try:
+        if INGEST_SOURCE == "latex":
+            await ingest(download(((item, source_link(pdf_link)) for item, pdf_link in jobs), expect_pdf=False),
+                         extract_source, on_source_failure)
+            if fallback:
+                print(f"↩ Falling back to the PDF of {len(fallback)} papers without usable LaTeX source")
+            jobs = fallback
+
+        await ingest(download(with_retries(jobs, retry_queue, category, writer.manifest)), extract_download,
+                     on_failure)
+    finally:
+        # Keep what was written so far, even if the pipeline failed
+        writer.close()
+
+    return writer.manifest
+
+
+def init_worker(limiter):
+    """
+    Initializes a category worker process with the download limiter shared by all workers.
+    """
+    global shared_limiter
+    shared_limiter = limiter
+
+
+def ingest_category(category, category_path, extract_workers, reextract_dir=None):
+    """
+    Ingests one category in a worker process, with its own extraction process pool.
+
+    Args:
+        category (str): The category name.
+        category_path (str): The metadata of the category (Parquet dataset or legacy JSON file).
+        extract_workers (int): Number of extraction processes of the worker.
+        reextract_dir (str, optional): The directory of a re-extraction (see `process_papers`), which keeps
+            its own shards, manifest, index of the ingested papers and retry queue.
+
+    Returns:
+        dict: The number of processed and failed papers of the category, and of failed papers waiting for
+            a retry or given up.
+    """
+    # Persistent indexes of the papers already harvested and already ingested, shared with the harvester
+    state_file = os.path.join(reextract_dir, os.path.basename(ID_INDEX_FILE)) if reextract_dir else ID_INDEX_FILE
+    harvested_ids = IdIndex(ID_INDEX_FILE, "harvested")
+    ingested_ids = IdIndex(state_file, "ingested")
+    retry_queue = RetryQueue(state_file, RETRY_MAX_ATTEMPTS, RETRY_BACKOFF_BASE, RETRY_BACKOFF_CAP)
+    download_cache = BlobCache(DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_MAX_BYTES) if DOWNLOAD_CACHE_DIR else None
+
+    try:
+        with TimeboxedPool(extract_workers, EXTRACT_TIMEOUT) as extract_pool:
+            manifest = asyncio.run(process_category(category, category_path, harvested_ids, ingested_ids,
+                                                    retry_queue, extract_pool, extract_workers, download_cache,
+                                                    reextract_dir or "."))
+        counts = retry_queue.counts(category)
+    finally:
+        harvested_ids.close()
+        ingested_ids.close()
+        retry_queue.close()
+        if download_cache:
+            download_cache.close()
+
+    if download_cache:
+        print(f"🗄 {category}: {download_cache.hits} downloads served from the cache, {download_cache.misses} fetched.")
+
+    print(f"✅ {category}: {len(manifest.processed)} papers processed, {len(manifest.failed)} failed "
+          f"({counts['retries']} waiting for a retry).")
+    return {"processed": len(manifest.processed), "failed": len(manifest.failed), **counts}
+
+
+def process_papers(reextract_dir=None):
+    """
+    Ingests the pending papers of every category, a few categories at a time.
+
+    With `reextract_dir`, every paper is extracted again into a new dataset in that directory instead, e.g.
+    after a change to the extraction, whatever was already ingested in the current one. The downloads are
+    read from the download cache (DOWNLOAD_CACHE_DIR) wherever they are cached. The re-extraction keeps its
+    own manifests and progress in the directory, so it resumes like the ingest does; once it is complete, its
+    directory replaces the current dataset.
+
+    Args:
+        reextract_dir (str, optional): The directory of the new dataset.
+    """
+    categories = list_metadata_categories(METADATA_DIR)
+    totals = {category: count_metadata_records(path) for category, path in categories.items()}
+
+    progress_file = INGEST_PROGRESS_FILE
+    if reextract_dir:
+        os.makedirs(reextract_dir, exist_ok=True)
+        progress_file = os.path.join(reextract_dir, os.path.basename(INGEST_PROGRESS_FILE))
+        print(f"🔁 Re-extracting every paper into '{reextract_dir}'")
+
+    progress = {}
+    if os.path.exists(progress_file):
+        with open(progress_file, 'r', encoding='utf-8') as f:
+            progress = json.load(f)
+
+    # Finished categories are skipped until their metadata grows or they have retries waiting
+    pending = [
+        category for category in categories
+        if not (progress.get(category, {}).get("status") == "done"
+                and progress[category]["total"] == totals[category]
+                and progress[category].get("retries", progress[category]["failed"]) == 0)
+    ]
+
+    # Smallest remaining work first, so small categories are not stuck behind large ones
+    pending.sort(key=lambda category: totals[category] - progress.get(category, {}).get("processed", 0))
+
+    # PyMuPDF extraction is CPU-bound, so the cores are split between the category workers
+    extract_workers = max(1, (EXTRACT_WORKERS or os.cpu_count()) // INGEST_WORKERS)
+    limiter = SharedTokenBucket(DOWNLOAD_REQUESTS_PER_SECOND)
+
+    with ProcessPoolExecutor(max_workers=INGEST_WORKERS, initializer=init_worker, initargs=(limiter,)) as pool:
+        futures = {
+            pool.submit(ingest_category, category, categories[category], extract_workers, reextract_dir): category
+            for category in pending
+        }
+        for future in as_completed(futures):
+            category = futures[future]
+            try:
+                progress[category] = {"status": "done", "total": totals[category], **future.result()}
+            except Exception as e:
+                print(f"❌ Failed to ingest {category}: {e}")
+                progress[category] = {**progress.get(category, {}), "status": "failed", "error": str(e)}
+            write_json_atomic(progress_file, progress)
+
     print("✅ All papers processed.")
 
 
+async def process_tar_archives(tar_paths, harvested_ids, ingested_ids, extract_pool, extract_workers):
+    """
+    Ingests the pending papers of every category from local copies of arXiv's bulk PDF tarballs. The
+    archives are streamed in order, each PDF is matched to its metadata by arXiv ID, and the text
+    extraction is fanned out to the process pool.
+
+    The pending papers of all categories are kept in memory while the archives are read, so their
+    metadata can be looked up as PDFs come by.
+
+    Args:
+        tar_paths (list of str): The tar archives.
+        harvested_ids (IdIndex): Index of the papers already harvested.
+        ingested_ids (IdIndex): Index of the papers already ingested.
+        extract_pool (TimeboxedPool): The pool running the text extraction.
+        extract_workers (int): Number of processes in the pool.
+    """
+    loop = asyncio.get_running_loop()
+
+    writers = {}
+    pending = {}
+    for category, category_path in list_metadata_categories(METADATA_DIR).items():
+        writer = CategoryWriter(category, ingested_ids, max_rows=MAX_ENTRIES_PER_PARQUET,
+                                max_bytes=MAX_BYTES_PER_PARQUET)
+        writers[category] = writer
+        metadata = iter_category_metadata(category_path)
+        for item, _ in pending_papers(category, metadata, writer.manifest, harvested_ids, ingested_ids):
+            if item[2]:
+                pending.setdefault(item[2], (category, item))
+    print(f"📚 Matching {len(pending)} pending papers against {len(tar_paths)} archives")
+
+    async def archive_pdfs():
+        for tar_path in tar_paths:
+            print(f"📂 Reading {tar_path}")
+            pdfs = iter_tar_pdfs(tar_path, wanted=pending.__contains__, max_bytes=DOWNLOAD_MAX_BYTES)
+            while True:
+                # Reading the archive blocks, so it runs off the event loop
+                member = await loop.run_in_executor(None, next, pdfs, None)
+                if member is None:
+                    break
+                index_id, pdf_bytes, error = member
+                match = pending.pop(index_id, None)
+                if match:
+                    yield match, pdf_bytes, error
+
+    def write_batch(batch):
+        by_category = {}
+        for (category, item), pdf_text, notes in batch:
+            by_category.setdefault(category, []).append((item, pdf_text, notes))
+
+        results = []
+        for category, papers in by_category.items():
+            data_chunk = [paper_record(category, arxiv_id, paper, pdf_text)
+                          for (i, arxiv_id, index_id, paper), pdf_text, _ in papers]
+            ids = [(arxiv_id, index_id) for (i, arxiv_id, index_id, paper), _, _ in papers]
+            limited = {item[1]: "; ".join(notes) for item, _, notes in papers if notes}
+            results.append((category, ids, writers[category].write(data_chunk), limited))
+        return results
+
+    def on_written(results):
+        for category, ids, shard, limited in results:
+            writers[category].written(ids, shard, limited)
+
+    def on_failure(match, stage, error):
+        category, item = match
+        writers[category].fail(item[1], f"{stage}: {error}")
+        print(f"⚠ Skipping {item[1]} ({error})")
+
+    try:
+        await run_pipeline(
+            archive_pdfs(),
+            extract_download,
+            extract_pool,
+            write_batch,
+            on_written=on_written,
+            on_failure=on_failure,
+            batch_size=TAR_WRITE_BATCH,
+            queue_size=PIPELINE_QUEUE_SIZE,
+            extract_workers=extract_workers,
+            report_interval=PIPELINE_REPORT_INTERVAL,
+        )
+    finally:
+        # Keep what was written so far, even if the pipeline failed
+        for writer in writers.values():
+            writer.close()
+
+    if pending:
+        print(f"ℹ {len(pending)} pending papers were not found in the archives")
+
+
+def ingest_tar_archives(tar_paths):
+    harvested_ids = IdIndex(ID_INDEX_FILE, "harvested")
+    ingested_ids = IdIndex(ID_INDEX_FILE, "ingested")
+    extract_workers = EXTRACT_WORKERS or os.cpu_count()
+
+    try:
+        with TimeboxedPool(extract_workers, EXTRACT_TIMEOUT) as extract_pool:
+            asyncio.run(process_tar_archives(tar_paths, harvested_ids, ingested_ids, extract_pool, extract_workers))
+    finally:
+        harvested_ids.close()
+        ingested_ids.close()
+
+    print("✅ All archives processed.")
+
+
 if __name__ == "__main__":
-    process_papers()
+    parser = argparse.ArgumentParser(description="Download the papers of every category and extract their text.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--tar", nargs="+", metavar="ARCHIVE",
+                      help="Ingest the PDFs of local bulk tar archives instead of downloading them.")
+    mode.add_argument("--reextract", metavar="DIR",
+                      help="Extract the text of every paper again into a new dataset in DIR, including the papers "
+                           "already ingested, reading the downloads from the download cache where possible.")
+    args = parser.parse_args()
+
+    if args.reextract and not DOWNLOAD_CACHE_DIR:
+        parser.error("--reextract reads the downloads from the download cache, set DOWNLOAD_CACHE_DIR in config.py")
+    if args.tar:
+        ingest_tar_archives(args.tar)
+    else:
+        process_papers(args.reextract)
@@ -0,0 +1,84 @@
+from utils.parquet_utils import (METADATA_SCHEMA, TEXT_SCHEMA, TEXT_DIR, METADATA_COMPRESSION_LEVEL,
+                                 TEXT_COMPRESSION_LEVEL)
+
+import argparse
+import os
+import re
+
+import pyarrow.parquet as pq
+
+# Shards of the ingest, e.g. 'math.GM_1.parquet'
+SHARD_FILE = re.compile(r"^(.*)_\d+\.parquet$")
+
+
+def split_shard(shard_file, text_dir):
+    """
+    Splits a shard holding the full papers into a metadata shard, written in place, and a text shard of the
+    same name in `text_dir`. The shard is streamed one row group at a time.
+
+    The text shard is finalized first and the original shard is only replaced at the end, so an interrupted
+    migration leaves the shard as it was and can simply be run again.
+
+    Args:
+        shard_file (str): The path of the shard.
+        text_dir (str): The directory of the text dataset.
+
+    Returns:
+        tuple: The size in bytes of the shard before and after the split (metadata and text together).
+    """
+    text_file = os.path.join(text_dir, os.path.basename(shard_file))
+    size_before = os.path.getsize(shard_file)
+
+    source = pq.ParquetFile(shard_file)
+    with pq.ParquetWriter(f"{text_file}.tmp", TEXT_SCHEMA, compression="zstd",
+                          compression_level=TEXT_COMPRESSION_LEVEL) as text_writer, \
+            pq.ParquetWriter(f"{shard_file}.split", METADATA_SCHEMA, compression="zstd",
+                             compression_level=METADATA_COMPRESSION_LEVEL) as metadata_writer:
+        for i in range(source.num_row_groups):
+            row_group = source.read_row_group(i)
+            text_writer.write_table(row_group.select(TEXT_SCHEMA.names).cast(TEXT_SCHEMA))
+            metadata_writer.write_table(row_group.select(METADATA_SCHEMA.names).cast(METADATA_SCHEMA))
+
+    os.replace(f"{text_file}.tmp", text_file)
+    os.replace(f"{shard_file}.split", shard_file)
+    return size_before, os.path.getsize(shard_file) + os.path.getsize(text_file)
+
+
+def split_text_dataset(data_dir):
+    """
+    Migrates the shards of a directory from the single-table layout, where every row carries the full text
+    of the paper, to the metadata and text datasets. Shards that were already split are left alone.
+
+    Args:
+        data_dir (str): The directory of the shards.
+    """
+    text_dir = os.path.join(data_dir, TEXT_DIR)
+    os.makedirs(text_dir, exist_ok=True)
+
+    migrated = 0
+    total_before = total_after = 0
+    for file in sorted(os.listdir(data_dir)):
+        shard_file = os.path.join(data_dir, file)
+        if not SHARD_FILE.match(file) or not os.path.isfile(shard_file):
+            continue
+        if "pdf_content" not in pq.read_schema(shard_file).names:
+            continue
+
+        size_before, size_after = split_shard(shard_file, text_dir)
+        migrated += 1
+        total_before += size_before
+        total_after += size_after
+        print(f"✂️ Split {file} ({size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB)")
+
+    if migrated:
+        print(f"✅ Split {migrated} shards ({total_before / 1e6:.1f} MB -> {total_after / 1e6:.1f} MB).")
+    else:
+        print("✅ No shards left to split.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split the full text of the ingested papers from their metadata.")
+    parser.add_argument("data_dir", nargs="?", default=".", help="Directory of the shards.")
+    args = parser.parse_args()
+
+    split_text_dataset(args.data_dir)
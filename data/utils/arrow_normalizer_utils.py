@@ -0,0 +1,239 @@
+import functools
+import re
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from utils.normalizer_utils import FLAVORS, VARIANTS, reference_cut, split_dots
+from utils.preprocessing_utils import meaningful_short_words
+
+# Columnar engine of `normalizer_utils.normalize_variants`: the same pipeline applied to a whole Arrow string
+# array at once, as pyarrow.compute kernels (RE2). Only two steps run in Python: the references cut, which
+# searches the lines of each document, and the dot splitting, whose lookarounds RE2 does not support. The
+# per-word and per-line steps are rewritten as RE2 patterns without lookarounds, giving the same output.
+
+# The character filters, as in `keep_with_numbers` / `keep_without_numbers`
+NOT_KEPT_WITH_NUMBERS = r"[^a-z0-9.\-()' \n]+"
+NOT_KEPT_WITHOUT_NUMBERS = r"[^a-z.\-()' \n]+"
+# `(?<=\d)\.(?=\d)` without lookarounds: a match consumes the digit after the dot, so in a chain like '1.2.3'
+# every other dot is left for a second pass, after which the dots left are at least two digits apart
+DECIMAL_POINT = r"(\p{Nd})\.(\p{Nd})"
+
+# Final sigma: Python lowercases it by context ('ς'), utf8proc does not
+CONTEXTUAL_LOWERCASE = "Σ"
+
+# `join_lines`: a line ending with '-' is merged with the next one, stripped of its leading whitespace
+# (in the sense of `str.isspace`, which RE2's \s does not follow)
+LINE_WHITESPACE = "".join(
+    f"\\x{{{ord(char):x}}}" for char in map(chr, range(0x3001)) if char.isspace() and char != "\n"
+)
+HYPHENATED_LINE_BREAK = rf"-\n[{LINE_WHITESPACE}]*"
+
+# Characters left by the character filters, besides spaces and newlines
+KEPT_CHARACTERS = "abcdefghijklmnopqrstuvwxyz0123456789.-()'"
+# Lines left with only numbers and symbols, once their spaces are collapsed
+NUMBERS_ONLY = r"[0-9. ()\-]+"
+# Lines of 3 or fewer words
+SHORT_LINE = r" *(?:[^ \n]+ +){0,2}[^ \n]* *"
+
+
+@functools.lru_cache(maxsize=None)
+def divergent_lowercase():
+    """
+    Builds the pattern matching the characters that `utf8_lower` lowercases differently from `str.lower`
+    (special casings such as 'İ', and characters the two Unicode versions disagree on). Computed once per
+    process, in about a second.
+    """
+    chars = [chr(code) for code in range(0x110000) if not 0xD800 <= code < 0xE000]
+    lowered = pc.utf8_lower(pa.array(chars)).to_pylist()
+    divergent = [char for char, lower in zip(chars, lowered) if char.lower() != lower]
+    return "[" + re.escape(CONTEXTUAL_LOWERCASE + "".join(divergent)) + "]"
+
+
+def lower(texts):
+    """
+    Lowercases an array exactly like `str.lower`: with `utf8_lower`, except for the texts holding a character
+    it would lowercase differently, which are lowercased in Python.
+    """
+    lowered = pc.utf8_lower(texts)
+    divergent = pc.fill_null(pc.match_substring_regex(texts, divergent_lowercase()), False)
+    if not pc.any(divergent).as_py():
+        return lowered
+    fixed = [text.lower() for text in pc.filter(texts, divergent).to_pylist()]
+    return pc.replace_with_mask(lowered, divergent, pa.array(fixed, pa.string()))
+
+
+def map_strings(func, texts):
+    """
+    Applies a Python function to every non-null string of an array.
+    """
+    return pa.array([None if text is None else func(text) for text in texts.to_pylist()], pa.string())
+
+
+def character_class(chars):
+    return "[" + "".join(char if char.isalnum() else "\\" + char for char in sorted(chars)) + "]"
+
+
+@functools.lru_cache(maxsize=None)
+def dropped_word_pattern():
+    """
+    Builds the pattern of a word that `clean_lines` drops, with the space or newline (or text boundary) on
+    each side: any word of 1 or 2 characters that is not in `meaningful_short_words`, spelled out over the
+    characters left by the character filters.
+    """
+    alternatives = []
+    firsts_by_seconds = {}
+    for first in KEPT_CHARACTERS:
+        seconds = frozenset(second for second in KEPT_CHARACTERS if first + second not in meaningful_short_words)
+        firsts_by_seconds.setdefault(seconds, []).append(first)
+    for seconds, firsts in firsts_by_seconds.items():
+        if seconds:
+            alternatives.append(character_class(firsts) + character_class(seconds))
+    alternatives.append(character_class([char for char in KEPT_CHARACTERS if char not in meaningful_short_words]))
+    return r"(^|[ \n])(?:" + "|".join(alternatives) + r")([ \n]|$)"
+
+
+def join_lines(texts):
+    """
+    Columnar `join_lines`. Removing a hyphenated line break can leave another '-' at the end of the line
+    (e.g. '--' before an empty line), which `join_lines` merges with the next line again, so the kernel is run
+    until no line break is left to remove.
+    """
+    texts = pc.replace_substring_regex(texts, HYPHENATED_LINE_BREAK, "")
+    while pc.any(pc.match_substring_regex(texts, HYPHENATED_LINE_BREAK)).as_py():
+        texts = pc.replace_substring_regex(texts, HYPHENATED_LINE_BREAK, "")
+    return texts
+
+
+def drop_lines(texts, line_pattern):
+    """
+    Drops the lines matching a pattern, like `"\n".join([line for line in lines if not match(line)])`: the
+    lines after the first one go along with the line break before them, then the first line with the one
+    after it.
+    """
+    texts = pc.replace_substring_regex(texts, rf"(?m)\n{line_pattern}$", "")
+    return pc.replace_substring_regex(texts, rf"\A{line_pattern}(?:\n|\z)", "")
+
+
+def clean_lines(texts):
+    """
+    Columnar `normalizer_utils.clean_lines`: drops the short words of every line, collapses its spaces, then
+    drops the lines left with only numbers and symbols.
+    """
+    # A match takes the space after the word, which may be the one before the next word: a second pass
+    # catches the words skipped that way, since every word left is then at least two spaces apart
+    texts = pc.replace_substring_regex(texts, dropped_word_pattern(), r"\1\2")
+    texts = pc.replace_substring_regex(texts, dropped_word_pattern(), r"\1\2")
+    texts = pc.replace_substring_regex(texts, r" {2,}", " ")
+    texts = pc.replace_substring_regex(texts, r"(?m)^ | $", "")
+    return drop_lines(texts, NUMBERS_ONLY)
+
+
+def clean_array(texts, flat):
+    """
+    Runs the cleaning stage of the original `clean_text` on an array, see `normalizer_utils.clean_segments`.
+    """
+    texts = clean_lines(texts)
+    texts = pc.replace_substring_regex(texts, r"\([^b-z]*\)", "")
+    if flat:
+        texts = pc.utf8_trim(pc.replace_substring_regex(texts, r"[ \n]{2,}|\n", " "), " ")
+    else:
+        texts = pc.replace_substring_regex(texts, r" {2,}", " ")
+    texts = pc.replace_substring_regex(texts, r"\.[.\s]*\.", ".")
+    for old, new in (("( ", "("), (" )", ")"), (" .", ".")):
+        texts = pc.replace_substring(texts, old, new)
+    texts = pc.replace_substring_regex(texts, r"-+\s", " ")
+    return pc.replace_substring_regex(texts, r"\s-+", " ")
+
+
+def prepare_parts(texts, flavor, parts):
+    """
+    Lowercases the documents, cuts their references and runs the stages shared by every variant (line
+    joining, punctuation splitting).
+
+    Args:
+        texts (pyarrow.Array): The raw documents.
+        flavor (str): "lines" or "flat", see `normalizer_utils`.
+        parts (set of str): "body" (without references) and/or "whole" (with references).
+
+    Returns:
+        tuple: The prepared parts as an array, and for each part the index of every document in that array.
+            A document without references shares the same entry for both parts.
+    """
+    prepared = []
+    indices = {part: [] for part in parts}
+    for text in lower(texts).to_pylist():
+        if text is None:
+            prepared.append(None)
+            for part in parts:
+                indices[part].append(len(prepared) - 1)
+            continue
+
+        if flavor == "flat":
+            if text.startswith("arxiv"):
+                text = "\n".join(text.split("\n")[1:])
+            lines = text.split("\n")
+        else:
+            lines = text.splitlines()
+        cut = reference_cut(lines, flavor)
+
+        texts_of_parts = {}
+        for part in sorted(parts):
+            whole = text if part == "whole" or cut is None else "\n".join(lines[:cut])
+            if whole not in texts_of_parts:
+                texts_of_parts[whole] = len(prepared)
+                prepared.append(whole)
+            indices[part].append(texts_of_parts[whole])
+
+    prepared = join_lines(pa.array(prepared, pa.string()))
+    for old, new in (("- ", ""), ("(", " ( "), (")", " ) ")):
+        prepared = pc.replace_substring(prepared, old, new)
+    return map_strings(split_dots, prepared), indices
+
+
+def normalize_array(texts, flavor="lines", variants=VARIANTS):
+    """
+    Produces preprocessing variants of a whole array of documents, identical to calling
+    `normalizer_utils.normalize_variants` on each of them.
+
+    Args:
+        texts (pyarrow.Array, pyarrow.ChunkedArray or list): The raw documents. Null ones stay null.
+        flavor (str): "lines" or "flat", see `normalizer_utils`.
+        variants (iterable of str): The variants to produce, among `VARIANTS`.
+
+    Returns:
+        dict: The array of every requested variant, e.g. 'wo_ref_w_nums_wo_short'.
+    """
+    if flavor not in FLAVORS:
+        raise ValueError(f"Unknown flavor '{flavor}', expected one of {FLAVORS}")
+    variants = tuple(variants)
+    unknown = set(variants) - set(VARIANTS)
+    if unknown:
+        raise ValueError(f"Unknown variants {sorted(unknown)}, expected some of {VARIANTS}")
+    if not isinstance(texts, (pa.Array, pa.ChunkedArray)):
+        texts = pa.array(texts, pa.string())
+    flat = flavor == "flat"
+
+    parts = {"whole" if variant.startswith("w_ref") else "body" for variant in variants}
+    prepared, indices = prepare_parts(texts, flavor, parts)
+
+    results = {}
+    for nums in ("w", "wo"):
+        wanted = [variant for variant in variants if variant.split("_ref_")[1].startswith(f"{nums}_nums")]
+        if not wanted:
+            continue
+        if nums == "w":
+            kept = pc.replace_substring_regex(prepared, NOT_KEPT_WITH_NUMBERS, "")
+        else:
+            kept = pc.replace_substring_regex(prepared, DECIMAL_POINT, r"\1\2")
+            kept = pc.replace_substring_regex(kept, DECIMAL_POINT, r"\1\2")
+            kept = pc.replace_substring_regex(kept, NOT_KEPT_WITHOUT_NUMBERS, "")
+        cleaned = clean_array(kept, flat)
+        short = drop_lines(cleaned, SHORT_LINE) if any(v.endswith("_wo_short") for v in wanted) else None
+
+        for variant in wanted:
+            part = "whole" if variant.startswith("w_ref") else "body"
+            source = short if variant.endswith("_wo_short") else cleaned
+            results[variant] = pc.take(source, pa.array(indices[part], pa.int64()))
+
+    return {variant: results[variant] for variant in variants}
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import pyarrow as pa
+
+# Versioned arXiv downloads, e.g. 'http://arxiv.org/pdf/2101.01234v2' or 'https://arxiv.org/e-print/hep-th/9901001v1'
+VERSIONED_URL = re.compile(r"/(pdf|e-print)/(.+v\d+)(?:\.pdf)?$")
+
+
+def cache_key(url):
+    """
+    Builds the cache key of a download from its URL: the kind of blob and the versioned arXiv ID.
+
+    Args:
+        url (str): e.g. 'http://arxiv.org/pdf/2101.01234v2'.
+
+    Returns:
+        str or None: e.g. 'pdf/2101.01234v2', or None if the URL has no version, since its content may change.
+    """
+    match = VERSIONED_URL.search(url)
+    return f"{match.group(1)}/{match.group(2)}" if match else None
+
+
+class BlobCache:
+    """
+    Local cache of downloaded blobs (PDFs, e-print sources), so extraction can be re-run at disk speed
+    without downloading anything again (see `data_extraction.py --reextract`).
+
+    Blobs are addressed by key, not by content: each one is stored zstd-compressed under the SHA-256 of its key
+    (kind and versioned arXiv ID), whose content never changes once published. An SQLite index next to the blobs
+    keeps their sizes and last access times; once the blobs exceed `max_bytes`, the least recently used ones are
+    evicted. The cache is safe to share between threads and between processes.
+    """
+
+    def __init__(self, cache_dir, max_bytes, compression_level=3):
+        """
+        Args:
+            cache_dir (str): Directory of the blobs and their index.
+            max_bytes (int): Size budget of the stored blobs, in bytes.
+            compression_level (int): The zstd level of the stored blobs.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.codec = pa.Codec("zstd", compression_level=compression_level)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                key TEXT PRIMARY KEY, digest TEXT, size INTEGER, stored_size INTEGER, last_access REAL
+            ) WITHOUT ROWID
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access)")
+        # Running total of the stored sizes, so writes do not have to sum the whole index
+        self.conn.execute("CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY, stored_bytes INTEGER)")
+        self.conn.execute("INSERT OR IGNORE INTO totals SELECT 0, COALESCE(SUM(stored_size), 0) FROM blobs "
+                          "WHERE NOT EXISTS (SELECT 1 FROM totals)")
+        self.conn.commit()
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.zst")
+
+    def get(self, key):
+        """
+        Reads a blob from the cache and marks it as recently used.
+
+        Args:
+            key (str): The cache key, see `cache_key`.
+
+        Returns:
+            bytes or None: The blob, or None if it is not cached.
+        """
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT digest, size FROM blobs WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.conn.execute("UPDATE blobs SET last_access = ? WHERE key = ?", (time.time(), key))
+        if row is None:
+            self.misses += 1
+            return None
+
+        digest, size = row
+        try:
+            with open(self._path(digest), "rb") as f:
+                data = self.codec.decompress(f.read(), decompressed_size=size, asbytes=True)
+        except (OSError, pa.ArrowException):
+            # Evicted by another process in the meantime, or damaged
+            with self._lock, self.conn:
+                self._forget(key)
+                self.conn.execute("DELETE FROM blobs WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """
+        Stores a blob, then evicts the least recently used blobs if the cache is over its budget.
+
+        Args:
+            key (str): The cache key, see `cache_key`.
+            data (bytes or str): The blob, or the path of a file holding it.
+        """
+        if isinstance(data, str):
+            with open(data, "rb") as f:
+                data = f.read()
+
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        path = self._path(digest)
+        compressed = self.codec.compress(data, asbytes=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(compressed)
+        os.replace(f"{path}.tmp", path)
+
+        with self._lock, self.conn:
+            self._forget(key)
+            self.conn.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?)",
+                              (key, digest, len(data), len(compressed), time.time()))
+            self.conn.execute("UPDATE totals SET stored_bytes = stored_bytes + ? WHERE id = 0", (len(compressed),))
+            self._evict()
+
+    def _forget(self, key):
+        # Takes the size of a blob about to be replaced or deleted off the total. Being a write, it also takes the
+        # database lock before the blob is read, so no other process can change it in between
+        self.conn.execute("UPDATE totals SET stored_bytes = stored_bytes - "
+                          "COALESCE((SELECT stored_size FROM blobs WHERE key = ?), 0) WHERE id = 0", (key,))
+
+    def _evict(self):
+        total = self.conn.execute("SELECT stored_bytes FROM totals WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        removed = 0
+        for key, digest, stored_size in self.conn.execute(
+                "SELECT key, digest, stored_size FROM blobs ORDER BY last_access"):
+            if total - removed <= self.max_bytes:
+                break
+            evicted.append((key, digest))
+            removed += stored_size
+
+        self.conn.executemany("DELETE FROM blobs WHERE key = ?", [(key,) for key, _ in evicted])
+        self.conn.execute("UPDATE totals SET stored_bytes = stored_bytes - ? WHERE id = 0", (removed,))
+        for _, digest in evicted:
+            try:
+                os.remove(self._path(digest))
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        self.conn.close()
@@ -1,37 +1,219 @@
-import subprocess
+import asyncio
 import os
+import random
+import tempfile
 
-def download_paper(url, arxiv_id, save_dir):
+import aiohttp
+
+from utils.rate_limit_utils import TokenBucket
+from utils.blob_cache_utils import cache_key
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Statuses meaning the server wants every download to slow down, not just this one
+GLOBAL_BACKOFF_STATUSES = {429, 503}
+
+
+class DownloadError(Exception):
+    """
+    Reason a download failed. `retryable` tells transient failures (rate limiting, server errors, timeouts)
+    from permanent ones (missing paper, not a PDF, too large).
     """
-    Downloads an arXiv paper using curl.
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+async def read_body(response, max_bytes, spill_bytes=None, spill_dir=None, expect_pdf=True):
+    """
+    Reads a PDF response body into memory, spilling it to a temporary file once it grows past `spill_bytes`.
 
     Args:
-        arxiv_id (str): The arXiv ID (e.g. '1507.00123' or 'hep-th/9901001')
-        save_dir (str): Directory where the PDF should be saved
+        response (aiohttp.ClientResponse): The response to read.
+        max_bytes (int): Maximum accepted size of a PDF.
+        spill_bytes (int, optional): Size above which the body is written to a temporary file instead.
+        spill_dir (str, optional): Directory of the temporary files, ideally a tmpfs such as /dev/shm.
+        expect_pdf (bool): Whether to reject bodies without the %PDF header.
 
     Returns:
-        bool: True if successful, False otherwise
+        tuple: The PDF bytes or the path of the spilled file (None on failure) and a DownloadError
+            (None on success).
     """
-    # Ensure save_dir exists
-    os.makedirs(save_dir, exist_ok=True)
+    content = bytearray()
+    size = 0
+    spill = None
+    handed_on = False
+    try:
+        async for chunk in response.content.iter_chunked(65536):
+            size += len(chunk)
+            if size > max_bytes:
+                return None, DownloadError(f"too large (over {max_bytes} bytes)")
+            if spill:
+                spill.write(chunk)
+                continue
 
-    # Replace slashes in legacy IDs to form valid filenames
-    output_path = os.path.join(save_dir, f"{arxiv_id}.pdf")
+            content += chunk
+            if spill_bytes and len(content) > spill_bytes:
+                if expect_pdf and not content.startswith(b"%PDF"):
+                    return None, DownloadError("response is not a PDF")
+                spill = tempfile.NamedTemporaryFile(dir=spill_dir, suffix=".pdf", delete=False)
+                spill.write(content)
+                content = None
 
-    try:
-        result = subprocess.run(
-            ["curl", "-L", url, "-o", output_path],
-            capture_output=True,
-            text=True
-        )
-
-        if result.returncode == 0:
-            print(f"✅ Downloaded {arxiv_id} to {output_path}")
-            return True
-        else:
-            print(f"❌ Failed to download {arxiv_id}: {result.stderr}")
-            return False
-
-    except Exception as e:
-        print(f"❌ Exception occurred: {e}")
-        return False
+        if spill:
+            spill.close()
+            handed_on = True
+            return spill.name, None
+        if expect_pdf and not content.startswith(b"%PDF"):
+            return None, DownloadError("response is not a PDF")
+        return bytes(content), None
+    finally:
+        # Remove the spilled file of a failed download
+        if spill and not handed_on:
+            spill.close()
+            os.remove(spill.name)
+
+
+def spill(content, spill_dir=None):
+    """
+    Writes a PDF to a temporary file, for the PDFs too large to be passed around in memory.
+
+    Returns:
+        str: The path of the file. The caller is responsible for removing it.
+    """
+    with tempfile.NamedTemporaryFile(dir=spill_dir, suffix=".pdf", delete=False) as f:
+        f.write(content)
+    return f.name
+
+
+async def fetch_pdf(session, url, limiter, max_bytes=50 * 1024 * 1024, max_retries=4, backoff_base=2.0,
+                    spill_bytes=None, spill_dir=None, expect_pdf=True):
+    """
+    Downloads a single PDF over a pooled session, retrying transient errors with jittered exponential backoff.
+
+    Responses that are not PDFs (wrong Content-Type or missing %PDF header) or that exceed `max_bytes`
+    are rejected without retrying; the PDF checks are skipped if `expect_pdf` is False (e.g. for e-print
+    sources). PDFs are kept in memory, except those larger than `spill_bytes`, which are written to a
+    temporary file in `spill_dir`; the caller is responsible for removing that file.
+
+    429 and 503 responses pause the shared limiter, so every download backs off, not only this one.
+
+    Args:
+        session (aiohttp.ClientSession): The pooled HTTP session.
+        url (str): The PDF link.
+        limiter (TokenBucket or SharedTokenBucket): The politeness limiter shared by all downloads.
+        max_bytes (int): Maximum accepted size of a PDF.
+        max_retries (int): Maximum number of attempts.
+        backoff_base (float): Base delay in seconds for the exponential backoff.
+        spill_bytes (int, optional): Size above which the PDF is spilled to a temporary file.
+        spill_dir (str, optional): Directory of the spilled files.
+        expect_pdf (bool): Whether the response has to be a PDF.
+
+    Returns:
+        tuple: The PDF bytes or the path of the spilled file (None on failure) and a DownloadError
+            (None on success).
+    """
+    error = None
+    for attempt in range(max_retries):
+        await limiter.acquire()
+        retry_after = None
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    content_type = response.headers.get("Content-Type", "")
+                    if expect_pdf and "pdf" not in content_type.lower():
+                        return None, DownloadError(f"unexpected Content-Type '{content_type}'")
+                    if response.content_length and response.content_length > max_bytes:
+                        return None, DownloadError(f"too large ({response.content_length} bytes)")
+
+                    return await read_body(response, max_bytes, spill_bytes, spill_dir, expect_pdf)
+
+                error = f"HTTP {response.status}"
+                if response.status not in RETRYABLE_STATUSES:
+                    return None, DownloadError(error)
+                status = response.status
+                retry_after = response.headers.get("Retry-After")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = str(e) or type(e).__name__
+            status = None
+
+        if attempt + 1 < max_retries:
+            delay = backoff_base * (2 ** attempt) * random.uniform(0.5, 1.5)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            if status in GLOBAL_BACKOFF_STATUSES:
+                limiter.pause(delay)
+            await asyncio.sleep(delay)
+
+    return None, DownloadError(f"{error} after {max_retries} attempts", retryable=True)
+
+
+async def download_pdfs(jobs, max_concurrency=8, requests_per_second=1.0, max_bytes=50 * 1024 * 1024,
+                        max_retries=4, backoff_base=2.0, timeout=120, spill_bytes=None, spill_dir=None, limiter=None,
+                        expect_pdf=True, cache=None):
+    """
+    Downloads PDFs concurrently over one keep-alive connection pool and yields them as they complete.
+
+    Jobs are pulled lazily, so at most `max_concurrency` downloads are in flight and the job iterable can be
+    a generator over streamed metadata. With a cache, versioned URLs are served from it when possible, without
+    touching the network or the limiter, and every successful download is stored in it.
+
+    Args:
+        jobs (iterable of tuple): (item, url) pairs. The item is handed back untouched with the result.
+        max_concurrency (int): Maximum number of downloads in flight.
+        requests_per_second (float): Politeness budget shared by all downloads.
+        max_bytes (int): Maximum accepted size of a PDF.
+        max_retries (int): Maximum number of attempts per PDF.
+        backoff_base (float): Base delay in seconds for the exponential backoff.
+        timeout (float): Total timeout in seconds for a single download.
+        spill_bytes (int, optional): Size above which a PDF is spilled to a temporary file instead of memory.
+        spill_dir (str, optional): Directory of the spilled files. Defaults to the system temporary directory.
+        limiter (TokenBucket or SharedTokenBucket, optional): A limiter shared with other downloaders, used
+            instead of a private one of `requests_per_second`.
+        expect_pdf (bool): Whether the URLs point to PDFs. False skips the PDF checks, e.g. for e-print sources.
+        cache (BlobCache, optional): The local cache of the downloads.
+
+    Yields:
+        tuple: (item, pdf, error) in completion order. pdf is the PDF bytes, or the path of the spilled
+            file, and None when the download failed, in which case error is a DownloadError.
+    """
+    if spill_dir and not os.path.isdir(spill_dir):
+        spill_dir = None
+    limiter = limiter or TokenBucket(requests_per_second)
+    connector = aiohttp.TCPConnector(limit=max_concurrency, keepalive_timeout=60)
+    jobs = iter(jobs)
+    loop = asyncio.get_running_loop()
+
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+
+        async def run(item, url):
+            key = cache_key(url) if cache is not None else None
+            if key:
+                # The cache lives on disk, so it is read and written off the event loop
+                content = await loop.run_in_executor(None, cache.get, key)
+                if content is not None:
+                    if spill_bytes and len(content) > spill_bytes:
+                        content = await loop.run_in_executor(None, spill, content, spill_dir)
+                    return item, content, None
+
+            content, error = await fetch_pdf(session, url, limiter, max_bytes, max_retries, backoff_base,
+                                             spill_bytes, spill_dir, expect_pdf)
+            if key and content is not None:
+                await loop.run_in_executor(None, cache.put, key, content)
+            return item, content, error
+
+        in_flight = set()
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < max_concurrency:
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                else:
+                    in_flight.add(asyncio.ensure_future(run(*job)))
+            if not in_flight:
+                break
+
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
@@ -64,3 +64,108 @@ def load_metadata(json_file):
     except Exception as e:
         print(f"⚠ Error loading metadata from {json_file}: {e}")
         return None
+
+
+def write_json_atomic(json_file, data):
+    """
+    Writes data to a JSON file through a temporary file, so an interrupted write never leaves a truncated file.
+
+    Args:
+        json_file (str): The path of the output JSON file.
+        data (dict or list): The data to write.
+    """
+    tmp_file = f"{json_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, json_file)
+
+
+class JsonArrayWriter:
+    """
+    Streams records into a JSON array file one at a time, producing the same layout as
+    `json.dump(records, f, ensure_ascii=False, indent=2)` without keeping the records in memory.
+
+    The array is written to a temporary file and renamed into place on `close`, so readers
+    never observe a half-written file. If no record was written, no file is created.
+
+    In append mode the new records are staged in the temporary file and spliced onto the end of
+    the existing array on `close`, without rewriting the records already stored.
+    """
+
+    def __init__(self, json_file, append=False):
+        """
+        Args:
+            json_file (str): The path of the output JSON file.
+            append (bool): Whether to append to an existing array instead of replacing it.
+        """
+        self.json_file = json_file
+        self.tmp_file = f"{json_file}.tmp"
+        self.append = append and os.path.exists(json_file)
+        self.count = 0
+        self._f = open(self.tmp_file, 'w', encoding='utf-8')
+        if not self.append:
+            self._f.write("[")
+
+    def write(self, record):
+        """
+        Appends a record to the array.
+
+        Args:
+            record (dict): The record to write.
+        """
+        encoded = json.dumps(record, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+        self._f.write(("," if self.count or self.append else "") + "\n  " + encoded)
+        self.count += 1
+
+    def abort(self):
+        """
+        Discards everything written so far without touching the output file.
+        """
+        self._f.close()
+        os.remove(self.tmp_file)
+
+    def close(self):
+        """
+        Closes the array and moves the records into place.
+
+        Returns:
+            int: Number of records written.
+        """
+        if self.count and not self.append:
+            self._f.write("\n]")
+        self._f.close()
+        if not self.count:
+            os.remove(self.tmp_file)
+        elif self.append:
+            self._splice()
+        else:
+            os.replace(self.tmp_file, self.json_file)
+        return self.count
+
+    def _splice(self):
+        """
+        Replaces the closing bracket of the existing array with the staged records.
+        """
+        with open(self.json_file, 'r+b') as target:
+            # Find the closing bracket and the last meaningful character before it
+            target.seek(0, os.SEEK_END)
+            position = target.tell()
+            tail = b""
+            while b"]" not in tail and position > 0:
+                step = min(4096, position)
+                position -= step
+                target.seek(position)
+                tail = target.read(step) + tail
+            body = tail[:tail.rindex(b"]")].rstrip()
+            end = position + len(body)
+
+            with open(self.tmp_file, 'rb') as staged:
+                fragment = staged.read()
+            if body.endswith(b"["):
+                # The existing array is empty, drop the leading separator
+                fragment = fragment[1:]
+
+            target.seek(end)
+            target.truncate()
+            target.write(fragment + b"\n]")
+        os.remove(self.tmp_file)
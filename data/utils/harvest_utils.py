@@ -0,0 +1,681 @@
+import asyncio
+import hashlib
+import os
+import random
+import shutil
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+import aiohttp
+
+from utils.file_utils import JsonArrayWriter, load_metadata, write_json_atomic
+from utils.http_cache_utils import ResponseCache
+from utils.id_index_utils import IdIndex, normalize_arxiv_id
+from utils.metadata_store_utils import ParquetRecordWriter, publish_shards
+from utils.rate_limit_utils import TokenBucket
+
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+ARXIV_NS = '{http://arxiv.org/schemas/atom}'
+OPENSEARCH_NS = '{http://a9.com/-/spec/opensearch/1.1/}'
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Format used by the `submittedDate` filter of the arXiv API
+DATE_FORMAT = '%Y%m%d%H%M'
+# Format of the <published> timestamps returned by the arXiv API
+PUBLISHED_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def parse_entry(entry, category):
+    """
+    Converts an Atom <entry> element into a paper dictionary.
+
+    Args:
+        entry (xml.etree.ElementTree.Element): The Atom entry element.
+        category (str): The category being harvested. Entries whose primary category differs are dropped.
+
+    Returns:
+        dict or None: The paper dictionary, or None if the entry does not belong to the category.
+    """
+    primary_cat = entry.find(f'{ARXIV_NS}primary_category')
+    if primary_cat is None:
+        return None
+
+    category_term = primary_cat.attrib.get('term', '')
+    if category_term != category:
+        return None
+
+    title = entry.find(f'{ATOM_NS}title').text.strip()
+    authors = [author.find(f'{ATOM_NS}name').text.strip()
+               for author in entry.findall(f'{ATOM_NS}author')]
+    summary = entry.find(f'{ATOM_NS}summary').text.strip()
+    published_raw = entry.find(f'{ATOM_NS}published').text.strip()
+    pdf_link = None
+    for link in entry.findall(f'{ATOM_NS}link'):
+        if link.attrib.get('title') == 'pdf':
+            pdf_link = link.attrib['href']
+            break
+
+    published_year = datetime.strptime(published_raw, PUBLISHED_FORMAT).year
+
+    return {
+        "title": title,
+        "authors": authors[:10],
+        "category": category_term,
+        "published_year": published_year,
+        "summary": summary,
+        "pdf_link": pdf_link or ""
+    }
+
+
+def build_url(base_url, query, start, max_results):
+    """
+    Builds the URL of one page of an arXiv API query.
+
+    Args:
+        base_url (str): The arXiv API endpoint.
+        query (str): The arXiv search query.
+        start (int): Offset of the first result.
+        max_results (int): Number of results requested.
+
+    Returns:
+        str: The full query URL.
+    """
+    return f"{base_url}?{urlencode({'search_query': query, 'start': start, 'max_results': max_results})}"
+
+
+def window_query(query, window_start, window_end):
+    """
+    Restricts a query to papers submitted within [window_start, window_end] (both inclusive, minute resolution).
+
+    Args:
+        query (str): The arXiv search query (e.g. 'cat:hep-th' or 'cat:cs.GL OR cat:math.GM').
+        window_start (str): First minute of the window, formatted as DATE_FORMAT.
+        window_end (str): Last minute of the window, formatted as DATE_FORMAT.
+
+    Returns:
+        str: The restricted query.
+    """
+    # AND binds tighter than OR: without the parentheses the window would only restrict the last category
+    return f"({query}) AND submittedDate:[{window_start} TO {window_end}]"
+
+
+async def parse_feed(chunks, on_entry):
+    """
+    Incrementally parses an Atom feed from an async iterator of byte chunks.
+
+    Args:
+        chunks (async iterator of bytes): The raw response body.
+        on_entry (callable): Called with every parsed Atom entry element.
+
+    Returns:
+        int or None: The `opensearch:totalResults` of the feed, if present.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    feed = None
+    total_results = None
+
+    async for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                if feed is None:
+                    feed = elem
+                continue
+
+            if elem.tag == f'{ATOM_NS}entry':
+                on_entry(elem)
+                # Drop the consumed entry so the tree never holds more than one
+                feed.remove(elem)
+            elif elem.tag == f'{OPENSEARCH_NS}totalResults' and elem.text and elem.text.strip().isdigit():
+                total_results = int(elem.text)
+
+    parser.close()
+    return total_results
+
+
+class Harvester:
+    """
+    Harvests arXiv API queries over a shared HTTP session and rate limiter.
+
+    Every query is split into `submittedDate` windows small enough to stay under the API result cap.
+    Windows are fetched in parallel and tracked in a per-category checkpoint, so an interrupted harvest
+    resumes at window granularity.
+
+    The newest `published` timestamp and ID of every category are kept in `watermarks.json`. In delta
+    mode, categories with a watermark only query the windows after it and append the new papers to the
+    existing metadata of the category.
+
+    Small categories can be harvested together through one OR-combined query; their papers are
+    demultiplexed by `arxiv:primary_category` back into per-category outputs.
+
+    Papers are stored either as a Parquet dataset per category (`<category>/part-*.parquet`, one shard per
+    window) or as a legacy `<category>.json` array.
+    """
+
+    def __init__(self, session, limiter, base_url, output_dir=".", page_size=2000, max_start=20000,
+                 max_retries=5, backoff_base=2.0, window_cap=10000, start_date="199101010000",
+                 max_concurrent_windows=8, delta=False, seen_ids=None, output_format="parquet", cache=None,
+                 end_date=None):
+        """
+        Args:
+            session (aiohttp.ClientSession): The pooled HTTP session.
+            limiter (TokenBucket): The rate limiter shared by all requests.
+            base_url (str): The arXiv API endpoint.
+            output_dir (str): Directory where the metadata is written.
+            page_size (int): Number of results requested per page.
+            max_start (int): Last `start` offset requested within a window.
+            max_retries (int): Maximum number of attempts per page.
+            backoff_base (float): Base delay in seconds for the exponential backoff.
+            window_cap (int): Maximum number of results a single window may hold.
+            start_date (str): Lower bound of the first window, formatted as DATE_FORMAT.
+            max_concurrent_windows (int): Number of windows fetched at once across all queries.
+            delta (bool): Whether to only fetch papers newer than each category's watermark.
+            seen_ids (IdIndex, optional): Persistent index of the IDs already harvested, shared across runs.
+            output_format (str): 'parquet' for a dataset directory per category, 'json' for one JSON file.
+            cache (ResponseCache, optional): On-disk cache of the API responses.
+            end_date (str, optional): Upper bound of the last window, formatted as DATE_FORMAT. Defaults to the
+                end of the current UTC day, so query URLs (and cache keys) are stable within a day.
+        """
+        self.session = session
+        self.limiter = limiter
+        self.base_url = base_url
+        self.output_dir = output_dir
+        self.page_size = page_size
+        self.max_start = max_start
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.window_cap = window_cap
+        self.start_date = start_date
+        self.window_semaphore = asyncio.Semaphore(max_concurrent_windows)
+        self.delta = delta
+        self.seen_ids = seen_ids
+        self.output_format = output_format
+        self.cache = cache
+        if end_date:
+            self.end_date = datetime.strptime(end_date, DATE_FORMAT)
+        else:
+            self.end_date = datetime.utcnow().replace(hour=23, minute=59, second=0, microsecond=0)
+        self.watermark_file = os.path.join(output_dir, "watermarks.json")
+        self.watermarks = (load_metadata(self.watermark_file) or {}) if os.path.exists(self.watermark_file) else {}
+
+    async def stream_page(self, url, on_entry, chunk_size=65536):
+        """
+        Streams one page of the arXiv API through an incremental XML parser, retrying transient failures
+        with jittered exponential backoff.
+
+        Each <entry> is handed to `on_entry` as soon as it is complete and then detached from the tree, so
+        memory does not grow with the number of entries. A retry after a partial read replays the page from
+        the start; `on_entry` is expected to skip entries it has already seen.
+
+        With a response cache, fresh pages are parsed from disk without touching the network or the rate
+        limiter, stale ones are revalidated with a conditional request, and new ones are cached as they stream.
+
+        Args:
+            url (str): The full query URL.
+            on_entry (callable): Called with every parsed Atom entry element.
+            chunk_size (int): Number of bytes fed to the parser at a time.
+
+        Returns:
+            int or None: The `opensearch:totalResults` of the query, or None if every attempt failed.
+        """
+        cached = self.cache.lookup(url) if self.cache is not None else None
+        if cached is not None and cached[1]:
+            self.cache.hits += 1
+            try:
+                return await parse_feed(self.cache.iter_body(url, chunk_size), on_entry)
+            except (OSError, EOFError, ET.ParseError) as e:
+                print(f"⚠ Unreadable cache entry for {url}: {e}")
+                cached = None
+        if self.cache is not None and self.cache.replay_only:
+            self.cache.misses += 1
+            print(f"❌ Not in cache (replay only): {url}")
+            return None
+
+        for attempt in range(self.max_retries):
+            await self.limiter.acquire()
+            retry_after = None
+            headers = self.cache.conditional_headers(cached[0]) if cached is not None else {}
+            try:
+                async with self.session.get(url, headers=headers) as response:
+                    if response.status == 304 and cached is not None:
+                        # Still valid, serve the cached copy
+                        self.cache.touch(url)
+                        self.cache.revalidated += 1
+                        return await parse_feed(self.cache.iter_body(url, chunk_size), on_entry)
+                    if response.status == 200:
+                        chunks = response.content.iter_chunked(chunk_size)
+                        if self.cache is not None:
+                            self.cache.misses += 1
+                            chunks = self.cache.tee(url, chunks, response.headers)
+                        return await parse_feed(chunks, on_entry)
+                    if response.status not in RETRYABLE_STATUSES:
+                        print(f"❌ Failed to fetch data: HTTP {response.status} for {url}")
+                        return None
+                    retry_after = response.headers.get("Retry-After")
+                    print(f"⚠ HTTP {response.status} for {url} (attempt {attempt + 1}/{self.max_retries})")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"⚠ Failed to fetch data: {e} (attempt {attempt + 1}/{self.max_retries})")
+            except ET.ParseError as e:
+                print(f"❌ Failed to parse XML: {e} (attempt {attempt + 1}/{self.max_retries})")
+
+            if attempt + 1 < self.max_retries:
+                delay = self.backoff_base * (2 ** attempt) * random.uniform(0.5, 1.5)
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                await asyncio.sleep(delay)
+
+        print(f"❌ Giving up on {url} after {self.max_retries} attempts")
+        return None
+
+    async def count_results(self, query):
+        """
+        Asks the API how many results a query has.
+
+        Args:
+            query (str): The arXiv search query.
+
+        Returns:
+            int or None: The number of results, or None if the request failed.
+        """
+        return await self.stream_page(build_url(self.base_url, query, 0, 1), lambda entry: None)
+
+    async def plan_windows(self, query, window_start, window_end, total=None):
+        """
+        Recursively bisects [window_start, window_end] until every window holds at most `window_cap` results.
+        Only the left half of each split is counted; the right half is derived from the parent total.
+
+        Args:
+            query (str): The arXiv search query (e.g. 'cat:hep-th').
+            window_start (datetime): First minute of the range.
+            window_end (datetime): Last minute of the range.
+            total (int, optional): Number of results in the range, if already known.
+
+        Returns:
+            list of dict or None: The planned windows in chronological order, or None if a count request failed.
+        """
+        if total is None:
+            total = await self.count_results(
+                window_query(query, window_start.strftime(DATE_FORMAT), window_end.strftime(DATE_FORMAT)))
+            if total is None:
+                return None
+
+        if total <= self.window_cap or window_end - window_start <= timedelta(days=1):
+            return [{
+                "start": window_start.strftime(DATE_FORMAT),
+                "end": window_end.strftime(DATE_FORMAT),
+                "expected": total,
+                "done": False,
+            }]
+
+        middle = (window_start + (window_end - window_start) / 2).replace(second=0, microsecond=0)
+        left_total = await self.count_results(
+            window_query(query, window_start.strftime(DATE_FORMAT), middle.strftime(DATE_FORMAT)))
+        if left_total is None:
+            return None
+
+        left, right = await asyncio.gather(
+            self.plan_windows(query, window_start, middle, left_total),
+            self.plan_windows(query, middle + timedelta(minutes=1), window_end, max(total - left_total, 0)),
+        )
+        if left is None or right is None:
+            return None
+        return left + right
+
+    async def harvest_window(self, query, categories, window, parts_dir, watermarks):
+        """
+        Fetches every page of one window and demultiplexes the papers by primary category into part files.
+
+        Args:
+            query (str): The arXiv search query (e.g. 'cat:hep-th' or 'cat:cs.GL OR cat:math.GM').
+            categories (list of str): The categories whose papers are kept.
+            window (dict): The window to fetch, as produced by `plan_windows`.
+            parts_dir (str): Directory holding one sub-directory of part files per category.
+            watermarks (dict): Watermark of each category in delta mode (None otherwise). Papers published
+                before it (and the watermark paper itself) are skipped.
+
+        Returns:
+            tuple or None: Number of papers written per category and the [published, id] of the newest one per
+                category, or None if a page failed and the window must be retried.
+        """
+        extension = ".parquet" if self.output_format == "parquet" else ".json"
+        query = window_query(query, window["start"], window["end"])
+        writers = {}
+        for category in categories:
+            os.makedirs(os.path.join(parts_dir, category), exist_ok=True)
+            part_file = os.path.join(parts_dir, category, f"{window['start']}-{window['end']}{extension}")
+            writers[category] = (ParquetRecordWriter(part_file) if self.output_format == "parquet"
+                                 else JsonArrayWriter(part_file))
+        total_results = None
+        newest = {}
+        window_ids = {category: set() for category in categories}
+
+        def on_entry(entry):
+            primary_cat = entry.find(f'{ARXIV_NS}primary_category')
+            category = primary_cat.attrib.get('term', '') if primary_cat is not None else None
+            if category not in writers:
+                return
+
+            paper_id = entry.find(f'{ATOM_NS}id')
+            arxiv_id = normalize_arxiv_id(paper_id.text) if paper_id is not None else None
+            if arxiv_id is None or arxiv_id in window_ids[category]:
+                return
+
+            # Skip papers harvested under another category, and in delta mode anything harvested before
+            watermark = watermarks.get(category)
+            seen_category = self.seen_ids.get(arxiv_id) if self.seen_ids is not None else None
+            if seen_category is not None and (seen_category != category or watermark):
+                return
+
+            published = entry.find(f'{ATOM_NS}published')
+            published = published.text.strip() if published is not None and published.text else ""
+            if watermark and (published < watermark["published"]
+                              or (published == watermark["published"] and paper_id.text == watermark["id"])):
+                return
+
+            paper = parse_entry(entry, category)
+            if paper is None:
+                return
+
+            window_ids[category].add(arxiv_id)
+            writers[category].write(paper)
+            if category not in newest or (published, paper_id.text) > tuple(newest[category]):
+                newest[category] = [published, paper_id.text]
+
+        label = categories[0] if len(categories) == 1 else f"{len(categories)} categories"
+        try:
+            for start in range(0, self.max_start + 1, self.page_size):
+                if total_results is not None and start >= total_results:
+                    break
+
+                print(f"Fetching {label} [{window['start']}–{window['end']}] results {start}–{start + self.page_size - 1}...")
+                total_results = await self.stream_page(build_url(self.base_url, query, start, self.page_size), on_entry)
+                if total_results is None:
+                    for writer in writers.values():
+                        writer.abort()
+                    return None
+        except BaseException:
+            for writer in writers.values():
+                writer.abort()
+            raise
+
+        counts = {category: writer.close() for category, writer in writers.items()}
+        if self.seen_ids is not None:
+            for category, ids in window_ids.items():
+                self.seen_ids.add_many(ids, category)
+        return counts, newest
+
+    def store_path(self, category):
+        """
+        Returns the location of the metadata of a category: a dataset directory or a JSON file.
+        """
+        return os.path.join(self.output_dir, category if self.output_format == "parquet" else f"{category}.json")
+
+    def estimate_size(self, category):
+        """
+        Estimates how many papers the next harvest of a category will return, from the previous run.
+
+        Args:
+            category (str): The category name.
+
+        Returns:
+            int or None: The estimate, or None if the category was never harvested.
+        """
+        watermark = self.watermarks.get(category)
+        if not watermark or not os.path.exists(self.store_path(category)):
+            return None
+        return watermark.get("last_count") if self.delta else watermark.get("total")
+
+    async def plan_groups(self, categories):
+        """
+        Coalesces small categories into OR-combined queries whose expected size fits in a single page.
+
+        Category sizes come from the previous run when known, and from a count request otherwise. Categories
+        larger than a page keep a query of their own. Packing is first-fit decreasing.
+
+        Args:
+            categories (list of str): The categories to harvest.
+
+        Returns:
+            list of tuple: (categories, total) pairs, where total is the exact result count of a single-category
+                query when it had to be counted, and None otherwise.
+        """
+        sizes = {category: self.estimate_size(category) for category in categories}
+        unknown = [category for category, size in sizes.items() if size is None]
+        counted = await asyncio.gather(*(self.count_results(f"cat:{category}") for category in unknown))
+        sizes.update(zip(unknown, counted))
+
+        groups = []
+        bins = []
+        for category in sorted(categories, key=lambda c: -(sizes[c] if sizes[c] is not None else self.page_size + 1)):
+            size = sizes[category]
+            if size is None or size > self.page_size:
+                groups.append(([category], size if category in unknown else None))
+                continue
+            for members in bins:
+                if members["size"] + size <= self.page_size:
+                    members["categories"].append(category)
+                    members["size"] += size
+                    break
+            else:
+                bins.append({"categories": [category], "size": size})
+
+        for members in bins:
+            exact = len(members["categories"]) == 1 and members["categories"][0] in unknown
+            groups.append((sorted(members["categories"]), members["size"] if exact else None))
+        return groups
+
+    async def harvest_group(self, categories, total=None, checkpoint_file=None):
+        """
+        Harvests a group of categories with one OR-combined query, window by window, and publishes the papers
+        of every category separately.
+
+        Progress is recorded in `<group>.parts/checkpoint.json`. If any window fails, its part is left pending
+        and a later run resumes from the checkpoint instead of starting over. In delta mode only the papers
+        after each category watermark are fetched and they are appended to the existing metadata.
+
+        Args:
+            categories (list of str): The categories of the group.
+            total (int, optional): Exact number of results of the group query, if already known.
+            checkpoint_file (str, optional): Checkpoint of an interrupted run of the group to resume.
+
+        Returns:
+            dict or None: Number of papers saved per category, or None if the group is incomplete.
+        """
+        if checkpoint_file is None:
+            if len(categories) == 1:
+                group_name = categories[0]
+            else:
+                group_name = "group-" + hashlib.sha1(" ".join(categories).encode()).hexdigest()[:10]
+            parts_dir = os.path.join(self.output_dir, f"{group_name}.parts")
+            checkpoint_file = os.path.join(parts_dir, "checkpoint.json")
+        parts_dir = os.path.dirname(checkpoint_file)
+
+        checkpoint = load_metadata(checkpoint_file) if os.path.exists(checkpoint_file) else None
+        if checkpoint is None:
+            query = " OR ".join(f"cat:{category}" for category in categories)
+            print(f"\n🔍 Starting query: {query}")
+
+            delta = {}
+            watermarks = {}
+            window_start = self.end_date
+            for category in categories:
+                watermark = self.watermarks.get(category)
+                delta[category] = bool(self.delta and watermark and os.path.exists(self.store_path(category)))
+                watermarks[category] = watermark if delta[category] else None
+                if delta[category]:
+                    window_start = min(window_start, datetime.strptime(watermark["published"], PUBLISHED_FORMAT).replace(second=0))
+                else:
+                    window_start = min(window_start, datetime.strptime(self.start_date, DATE_FORMAT))
+
+            # A known total only applies to the full range
+            if any(delta.values()):
+                total = None
+            windows = await self.plan_windows(query, window_start, self.end_date, total)
+            if windows is None:
+                print(f"❌ Could not plan windows for '{query}'")
+                return None
+            os.makedirs(parts_dir, exist_ok=True)
+            checkpoint = {"query": query, "categories": categories, "delta": delta, "watermarks": watermarks,
+                          "windows": windows}
+            write_json_atomic(checkpoint_file, checkpoint)
+        else:
+            print(f"\n🔍 Resuming query: {checkpoint['query']}")
+
+        query = checkpoint["query"]
+        categories = checkpoint["categories"]
+        windows = checkpoint["windows"]
+        pending = [window for window in windows if not window["done"]]
+        label = categories[0] if len(categories) == 1 else f"{len(categories)} categories"
+        print(f"🗂 {label}: {len(windows)} windows, {len(pending)} pending")
+
+        async def run(window):
+            async with self.window_semaphore:
+                result = await self.harvest_window(query, categories, window, parts_dir, checkpoint["watermarks"])
+            if result is not None:
+                window["done"] = True
+                window["count"], window["newest"] = result
+                write_json_atomic(checkpoint_file, checkpoint)
+
+        await asyncio.gather(*(run(window) for window in pending))
+
+        if not all(window["done"] for window in windows):
+            print(f"⚠️ Query '{query}' is incomplete, rerun to resume from the checkpoint")
+            return None
+
+        counts = {}
+        for category in categories:
+            counts[category] = self.publish_category(category, windows, parts_dir, checkpoint["delta"][category],
+                                                     checkpoint["watermarks"][category])
+        shutil.rmtree(parts_dir)
+        return counts
+
+    def publish_category(self, category, windows, parts_dir, delta, watermark):
+        """
+        Publishes the finished parts of one category in chronological order and moves its watermark.
+
+        Args:
+            category (str): The category name.
+            windows (list of dict): The finished windows of the group.
+            parts_dir (str): Directory holding one sub-directory of part files per category.
+            delta (bool): Whether the parts are appended to the existing metadata.
+            watermark (dict or None): The watermark the harvest started from.
+
+        Returns:
+            int: Number of papers published.
+        """
+        extension = ".parquet" if self.output_format == "parquet" else ".json"
+        store_path = self.store_path(category)
+        part_files = [os.path.join(parts_dir, category, f"{window['start']}-{window['end']}{extension}")
+                      for window in windows if window["count"].get(category)]
+        count = sum(window["count"].get(category, 0) for window in windows)
+        if count and self.output_format == "parquet":
+            publish_shards(part_files, store_path, append=delta)
+        elif count:
+            writer = JsonArrayWriter(store_path, append=delta)
+            for part_file in part_files:
+                for paper in load_metadata(part_file):
+                    writer.write(paper)
+            writer.close()
+
+        # Move the watermark to the newest paper seen and remember the size for the next plan
+        newest = [tuple(window["newest"][category]) for window in windows if category in window["newest"]]
+        if watermark:
+            newest.append((watermark["published"], watermark["id"]))
+        if newest:
+            published, paper_id = max(newest)
+            previous_total = watermark.get("total", 0) if watermark and delta else 0
+            self.watermarks[category] = {"published": published, "id": paper_id,
+                                         "total": previous_total + count, "last_count": count}
+            write_json_atomic(self.watermark_file, self.watermarks)
+
+        if count and delta:
+            print(f"✅ Appended {count} new papers to '{store_path}'")
+        elif count:
+            print(f"✅ Saved {count} papers to '{store_path}'")
+        elif delta:
+            print(f"✅ No new papers for '{category}'")
+        else:
+            print(f"⚠️ No papers found for '{category}'")
+        return count
+
+
+async def harvest(queries, base_url, output_dir=".", requests_per_second=1.0, max_concurrent_queries=4,
+                  max_concurrent_windows=8, timeout=120, id_index_file=None, coalesce=True, cache_dir=None,
+                  cache_ttl=86400, replay_only=False, **settings):
+    """
+    Harvests several queries concurrently over one keep-alive connection pool and one shared rate limit.
+
+    Groups left unfinished by a previous run are resumed first. The remaining categories are coalesced into
+    OR-combined queries when they are small enough to share a page.
+
+    Args:
+        queries (list of str): The arXiv search queries, one `cat:` query per category.
+        base_url (str): The arXiv API endpoint.
+        output_dir (str): Directory where the metadata is written.
+        requests_per_second (float): Global request budget shared by all queries.
+        max_concurrent_queries (int): Number of queries planned and published at once.
+        max_concurrent_windows (int): Number of windows fetched at once across all queries.
+        timeout (float): Total timeout in seconds for a single request.
+        id_index_file (str, optional): SQLite file of the persistent ID index. Without it, duplicates are
+            only detected within a window.
+        coalesce (bool): Whether to merge small categories into shared queries.
+        cache_dir (str, optional): Directory of the on-disk response cache. Without it, nothing is cached.
+        cache_ttl (float): Number of seconds a cached response is served without revalidation.
+        replay_only (bool): Whether to serve every page from the cache and never go to the network.
+        **settings: Extra keyword arguments forwarded to `Harvester`.
+
+    Returns:
+        dict: Number of papers saved per category (None for categories of incomplete queries).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    limiter = TokenBucket(requests_per_second)
+    semaphore = asyncio.Semaphore(max_concurrent_queries)
+    connector = aiohttp.TCPConnector(limit=max_concurrent_windows, keepalive_timeout=60)
+    seen_ids = IdIndex(id_index_file, "harvested") if id_index_file else None
+    cache = ResponseCache(cache_dir, cache_ttl, replay_only) if cache_dir else None
+    categories = [query.split(':')[1] for query in queries]
+
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            harvester = Harvester(session, limiter, base_url, output_dir,
+                                  max_concurrent_windows=max_concurrent_windows, seen_ids=seen_ids, cache=cache,
+                                  **settings)
+
+            # Resume the groups of an interrupted run as they were planned
+            resumed = []
+            for entry in sorted(os.listdir(output_dir)):
+                checkpoint_file = os.path.join(output_dir, entry, "checkpoint.json")
+                if entry.endswith(".parts") and os.path.exists(checkpoint_file):
+                    checkpoint = load_metadata(checkpoint_file)
+                    if checkpoint and set(checkpoint.get("categories", [])) <= set(categories):
+                        resumed.append((checkpoint["categories"], checkpoint_file))
+            remaining = [category for category in categories
+                         if not any(category in members for members, _ in resumed)]
+
+            if coalesce:
+                groups = await harvester.plan_groups(remaining)
+            else:
+                groups = [([category], None) for category in remaining]
+            print(f"🧩 Planned {len(groups)} queries for {len(remaining)} categories ({len(resumed)} resumed)")
+
+            async def run(members, total=None, checkpoint_file=None):
+                async with semaphore:
+                    counts = await harvester.harvest_group(members, total, checkpoint_file)
+                return counts or {category: None for category in members}
+
+            results = await asyncio.gather(
+                *(run(members, checkpoint_file=checkpoint_file) for members, checkpoint_file in resumed),
+                *(run(members, total) for members, total in groups),
+            )
+    finally:
+        if seen_ids is not None:
+            seen_ids.close()
+        if cache is not None:
+            print(f"🗄 Response cache: {cache.report()}")
+
+    counts = {}
+    for result in results:
+        counts.update(result)
+    return counts
@@ -0,0 +1,155 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+
+
+class ResponseCache:
+    """
+    On-disk cache of HTTP response bodies, keyed by the SHA-256 of the full request URL.
+
+    Bodies are stored gzip-compressed next to a small JSON file with the fetch time and the
+    ETag/Last-Modified validators. Entries younger than the TTL are served directly; older ones are
+    revalidated with a conditional request. In replay-only mode every entry is served regardless of
+    age and misses are reported instead of going to the network.
+    """
+
+    def __init__(self, cache_dir, ttl=86400, replay_only=False):
+        """
+        Args:
+            cache_dir (str): Directory holding the cache entries.
+            ttl (float): Number of seconds an entry is served without revalidation.
+            replay_only (bool): Whether to serve only from the cache, never from the network.
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.replay_only = replay_only
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        entry_dir = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(entry_dir, f"{key}.gz"), os.path.join(entry_dir, f"{key}.json")
+
+    def lookup(self, url):
+        """
+        Looks up the cache entry of a URL.
+
+        Args:
+            url (str): The full request URL.
+
+        Returns:
+            tuple or None: The entry metadata and whether it can be served without revalidation,
+                or None if the URL is not cached.
+        """
+        body_file, meta_file = self._paths(url)
+        if not os.path.exists(body_file) or not os.path.exists(meta_file):
+            return None
+        try:
+            with open(meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        fresh = self.replay_only or time.time() - meta["fetched_at"] < self.ttl
+        return meta, fresh
+
+    def conditional_headers(self, meta):
+        """
+        Builds the revalidation headers of a stale entry.
+
+        Args:
+            meta (dict): The entry metadata returned by `lookup`.
+
+        Returns:
+            dict: The If-None-Match / If-Modified-Since headers available for the entry.
+        """
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    async def iter_body(self, url, chunk_size=65536):
+        """
+        Streams the decompressed body of a cached URL.
+
+        Args:
+            url (str): The full request URL.
+            chunk_size (int): Number of bytes yielded at a time.
+
+        Yields:
+            bytes: The next chunk of the body.
+        """
+        body_file, _ = self._paths(url)
+        with gzip.open(body_file, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def touch(self, url):
+        """
+        Marks an entry as fetched now, after the server confirmed it is still valid.
+
+        Args:
+            url (str): The full request URL.
+        """
+        _, meta_file = self._paths(url)
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        meta["fetched_at"] = time.time()
+        self._write_meta(meta_file, meta)
+
+    def _write_meta(self, meta_file, meta):
+        tmp_file = f"{meta_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_file, meta_file)
+
+    async def tee(self, url, chunks, headers):
+        """
+        Passes a response body through while writing it to the cache. The entry only replaces the
+        previous one once the whole body has been read.
+
+        Args:
+            url (str): The full request URL.
+            chunks (async iterator of bytes): The raw response body.
+            headers (Mapping): The response headers, used to keep the validators.
+
+        Yields:
+            bytes: The chunks of the body, unchanged.
+        """
+        body_file, meta_file = self._paths(url)
+        os.makedirs(os.path.dirname(body_file), exist_ok=True)
+        tmp_file = f"{body_file}.tmp"
+        size = 0
+        try:
+            with gzip.open(tmp_file, 'wb') as f:
+                async for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+        except BaseException:
+            os.remove(tmp_file)
+            raise
+
+        os.replace(tmp_file, body_file)
+        self._write_meta(meta_file, {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "size": size,
+        })
+
+    def report(self):
+        """
+        Returns a one-line summary of the cache activity.
+        """
+        return f"{self.hits} hits, {self.revalidated} revalidated, {self.misses} misses"
@@ -0,0 +1,129 @@
+import hashlib
+import math
+import re
+import sqlite3
+
+# New-style IDs (e.g. '2101.01234v2') and legacy IDs (e.g. 'hep-th/9901001', 'math.GT/0309136')
+NEW_STYLE_ID = re.compile(r"(\d{4}\.\d{4,5})(?:v\d+)?")
+LEGACY_ID = re.compile(r"([a-z\-]+(?:\.[A-Z]{2})?/\d{7})(?:v\d+)?")
+
+
+def normalize_arxiv_id(value):
+    """
+    Extracts the version-less arXiv ID from an Atom ID URL, a PDF link or a bare ID.
+
+    Args:
+        value (str): e.g. 'http://arxiv.org/abs/2101.01234v2' or 'http://arxiv.org/pdf/hep-th/9901001v1'.
+
+    Returns:
+        str or None: The normalized ID (e.g. '2101.01234' or 'hep-th/9901001'), or None if none is found.
+    """
+    if not value:
+        return None
+    match = LEGACY_ID.search(value) or NEW_STYLE_ID.search(value)
+    return match.group(1) if match else None
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings. Answers "definitely not present" without touching the disk.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        """
+        Args:
+            capacity (int): Number of items the filter is sized for.
+            error_rate (float): Target false-positive rate at full capacity.
+        """
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.num_hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class IdIndex:
+    """
+    Persistent set of arXiv IDs backed by an SQLite table, with an in-memory Bloom filter in front.
+
+    Each ID is stored with the category it belongs to, so callers can tell a paper already seen under
+    another category from one seen under the current category. Memory use is the Bloom filter only
+    (about 10 bits per ID); positive answers are confirmed against SQLite.
+    """
+
+    def __init__(self, db_file, table, capacity=4_000_000, error_rate=0.01):
+        """
+        Args:
+            db_file (str): Path of the SQLite database shared by every index.
+            table (str): Name of the table holding this index (e.g. 'harvested', 'ingested').
+            capacity (int): Initial number of IDs the Bloom filter is sized for.
+            error_rate (float): Target false-positive rate of the Bloom filter.
+        """
+        self.table = table
+        self.error_rate = error_rate
+        self.conn = sqlite3.connect(db_file, timeout=60)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, category TEXT) WITHOUT ROWID")
+        self.conn.commit()
+        self.count = self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        self._build_filter(max(capacity, 2 * self.count))
+
+    def _build_filter(self, capacity):
+        self.bloom = BloomFilter(capacity, self.error_rate)
+        for (arxiv_id,) in self.conn.execute(f"SELECT id FROM {self.table}"):
+            self.bloom.add(arxiv_id)
+
+    def get(self, arxiv_id):
+        """
+        Looks up the category an ID was recorded under.
+
+        Args:
+            arxiv_id (str): The normalized arXiv ID.
+
+        Returns:
+            str or None: The category of the ID, or None if the ID is not in the index.
+        """
+        if arxiv_id not in self.bloom:
+            return None
+        row = self.conn.execute(f"SELECT category FROM {self.table} WHERE id = ?", (arxiv_id,)).fetchone()
+        return row[0] if row else None
+
+    def __contains__(self, arxiv_id):
+        return self.get(arxiv_id) is not None
+
+    def add_many(self, arxiv_ids, category):
+        """
+        Records a batch of IDs under a category in a single transaction.
+
+        Args:
+            arxiv_ids (iterable of str): The normalized arXiv IDs.
+            category (str): The category the IDs belong to.
+        """
+        arxiv_ids = list(arxiv_ids)
+        if not arxiv_ids:
+            return
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO {self.table} (id, category) VALUES (?, ?)",
+                                  [(arxiv_id, category) for arxiv_id in arxiv_ids])
+        for arxiv_id in arxiv_ids:
+            self.bloom.add(arxiv_id)
+        self.count += len(arxiv_ids)
+
+        # Keep the false-positive rate in check as the index grows
+        if self.count > self.bloom.capacity:
+            self.count = self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            self._build_filter(2 * self.count)
+
+    def close(self):
+        self.conn.close()
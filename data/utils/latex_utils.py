@@ -0,0 +1,119 @@
+import gzip
+import io
+import re
+import tarfile
+
+# Environments dropped with their contents: math, floats, code and the bibliography
+DROPPED_ENVIRONMENTS = (
+    "equation", "align", "alignat", "gather", "multline", "eqnarray", "displaymath", "math", "split",
+    "figure", "table", "tabular", "tikzpicture", "picture", "verbatim", "lstlisting", "thebibliography",
+)
+
+COMMENT = re.compile(r"(?<!\\)%[^\n]*")
+DOCUMENT_BODY = re.compile(r"\\begin\{document\}(.*?)(?:\\end\{document\}|$)", re.DOTALL)
+DROPPED_ENVIRONMENT = re.compile(
+    rf"\\begin\{{({'|'.join(DROPPED_ENVIRONMENTS)})(\*?)\}}.*?\\end\{{\1\2\}}", re.DOTALL
+)
+DISPLAY_MATH = re.compile(r"\$\$.*?\$\$|\\\[.*?\\\]", re.DOTALL)
+INLINE_MATH = re.compile(r"(?<!\\)\$.*?(?<!\\)\$|\\\(.*?\\\)", re.DOTALL)
+SECTION = re.compile(r"\\(?:part|chapter|section|subsection|subsubsection|paragraph)\*?(?:\[[^\]]*\])?\{([^{}]*)\}")
+KEPT_ARGUMENT = re.compile(r"\\(?:textbf|textit|textsl|textsc|texttt|textrm|emph|underline|mbox|text|footnote)\{([^{}]*)\}")
+COMMAND = re.compile(r"\\[a-zA-Z@]+\*?(?:\[[^\]]*\])*(?:\{[^{}]*\})*")
+ESCAPED = re.compile(r"\\([%&_#$])")
+INPUT = re.compile(r"\\(?:input|include)\{([^{}]+)\}")
+
+
+def latex_to_text(tex):
+    """
+    Turns LaTeX source into plain text. Comments, math, floats and the bibliography are dropped, section
+    titles and formatted text are kept, and every other command is removed with its arguments.
+
+    Args:
+        tex (str): The LaTeX source.
+
+    Returns:
+        str: The plain text, with paragraphs separated by blank lines.
+    """
+    tex = COMMENT.sub("", tex)
+    body = DOCUMENT_BODY.search(tex)
+    if body:
+        tex = body.group(1)
+
+    tex = DROPPED_ENVIRONMENT.sub(" ", tex)
+    tex = DISPLAY_MATH.sub(" ", tex)
+    tex = INLINE_MATH.sub(" ", tex)
+    tex = SECTION.sub(r"\n\n\1\n\n", tex)
+
+    # Formatting commands can be nested, so they are unwrapped from the inside out
+    for _ in range(5):
+        tex, count = KEPT_ARGUMENT.subn(r"\1", tex)
+        if not count:
+            break
+
+    tex = tex.replace("\\\\", "\n").replace("~", " ")
+    tex = ESCAPED.sub(r"\1", COMMAND.sub("", tex))
+    tex = tex.replace("{", "").replace("}", "")
+
+    tex = re.sub(r"[ \t]+", " ", tex)
+    tex = re.sub(r" *\n *", "\n", tex)
+    tex = re.sub(r"\n{3,}", "\n\n", tex)
+    return tex.strip()
+
+
+def decode_tex(data):
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+def resolve_inputs(tex, files, depth=0):
+    """
+    Inlines the files pulled in with \\input / \\include, when they are part of the source.
+    """
+    if depth > 5:
+        return tex
+
+    def replace(match):
+        name = match.group(1).strip()
+        included = files.get(name) or files.get(f"{name}.tex")
+        return resolve_inputs(included, files, depth + 1) if included is not None else ""
+
+    return INPUT.sub(replace, tex)
+
+
+def extract_text_from_source(data):
+    """
+    Extracts plain text from an arXiv e-print source: a gzipped tar archive of a LaTeX project, or a single
+    gzipped .tex file.
+
+    Args:
+        data (bytes): The raw e-print source.
+
+    Returns:
+        str or None: The extracted text, or None if the source holds no LaTeX document.
+    """
+    try:
+        if data[:2] == b"\x1f\x8b":
+            data = gzip.decompress(data)
+
+        try:
+            with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as tar:
+                files = {
+                    member.name.lstrip("./"): decode_tex(tar.extractfile(member).read())
+                    for member in tar
+                    if member.isfile() and member.name.endswith(".tex")
+                }
+        except tarfile.TarError:
+            files = {"main.tex": decode_tex(data)}
+
+        # The main files are the ones declaring a document class
+        documents = [tex for tex in files.values() if "\\documentclass" in tex]
+        if not documents:
+            return None
+        text = "\n\n".join(latex_to_text(resolve_inputs(tex, files)) for tex in documents)
+        return text or None
+
+    except Exception as e:
+        print(f"⚠ Error reading LaTeX source: {e}")
+        return None
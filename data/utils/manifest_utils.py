@@ -0,0 +1,168 @@
+import json
+import os
+
+import pyarrow.parquet as pq
+
+from utils.file_utils import write_json_atomic
+from utils.parquet_utils import SplitShardWriter, list_shards, MAX_ENTRIES_PER_PARQUET, MAX_BYTES_PER_PARQUET
+
+
+class IngestManifest:
+    """
+    Per-category record of the ingest: the processed arXiv IDs, the failed ones with their reasons, the
+    papers whose extraction was limited (page budget, text cap) and the finalized shards with their row
+    counts and sizes.
+
+    The manifest is rewritten atomically whenever a shard is finalized, so it only ever lists papers whose
+    rows are safely on disk. Resuming is a set-membership check, whatever order the papers were processed in.
+    """
+
+    def __init__(self, manifest_file, category, shard_files=()):
+        """
+        Args:
+            manifest_file (str): The path of the manifest JSON file.
+            category (str): The category name.
+            shard_files (list of str): The existing shards of the category, used to build the manifest
+                when there is none yet.
+        """
+        self.manifest_file = manifest_file
+        self.category = category
+        self.processed = set()
+        self.failed = {}
+        self.limited = {}
+        self.shards = []
+
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self.processed = set(manifest["processed"])
+            self.failed = manifest["failed"]
+            self.limited = manifest.get("limited", {})
+            self.shards = manifest["shards"]
+        elif shard_files:
+            self._bootstrap(shard_files)
+
+    def _bootstrap(self, shard_files):
+        # Shards written before manifests existed: only their ID column is read
+        for shard_file in shard_files:
+            ids = pq.read_table(shard_file, columns=["arxiv_id"]).column("arxiv_id").to_pylist()
+            self.processed.update(ids)
+            self.shards.append({
+                "file": os.path.basename(shard_file),
+                "rows": len(ids),
+                "bytes": os.path.getsize(shard_file),
+            })
+        print(f"🔄 Built manifest of {self.category} from {len(shard_files)} existing shards "
+              f"({len(self.processed)} papers)")
+        self.save()
+
+    def __contains__(self, arxiv_id):
+        return arxiv_id in self.processed
+
+    def fail(self, arxiv_id, reason):
+        """
+        Records why a paper could not be processed. Saved with the next shard.
+
+        Args:
+            arxiv_id (str): The arXiv ID of the paper.
+            reason (str): The error message.
+        """
+        self.failed[arxiv_id] = reason
+
+    def commit(self, shard, arxiv_ids, limited=None):
+        """
+        Records a finalized shard and the papers it holds, and saves the manifest.
+
+        Args:
+            shard (dict): The shard file name, row count and size in bytes.
+            arxiv_ids (list of str): The arXiv IDs of the papers in the shard.
+            limited (dict, optional): The limits applied to the extraction of some of the papers, by arXiv ID.
+        """
+        self.shards.append(shard)
+        self.processed.update(arxiv_ids)
+        for arxiv_id in arxiv_ids:
+            self.failed.pop(arxiv_id, None)
+        self.limited.update(limited or {})
+        self.save()
+
+    def save(self):
+        write_json_atomic(self.manifest_file, {
+            "category": self.category,
+            "processed": sorted(self.processed),
+            "failed": self.failed,
+            "limited": self.limited,
+            "shards": self.shards,
+        })
+
+
+class CategoryWriter:
+    """
+    Writes the papers of a category to its metadata and text shards and records them in its manifest and in the
+    ingested index once their shard is finalized.
+
+    `write` may run on a writer thread; `written`, `fail` and `close` must run on the thread owning the index.
+    """
+
+    def __init__(self, category, ingested_ids, max_rows=MAX_ENTRIES_PER_PARQUET, max_bytes=MAX_BYTES_PER_PARQUET,
+                 output_dir="."):
+        """
+        Args:
+            category (str): The category name.
+            ingested_ids (IdIndex): Index of the papers already ingested.
+            max_rows (int): Number of records after which a shard is finalized.
+            max_bytes (int): Size in bytes after which a shard is finalized.
+            output_dir (str): The directory of the shards and the manifest.
+        """
+        self.category = category
+        self.ingested_ids = ingested_ids
+        self.manifest = IngestManifest(os.path.join(output_dir, f"{category}.manifest.json"), category,
+                                       list_shards(category, output_dir))
+        self.shard_writer = SplitShardWriter(category, output_dir, max_rows=max_rows, max_bytes=max_bytes)
+        self._pending = []
+        self._limited = {}
+
+    def write(self, records):
+        """
+        Appends records to the current shard.
+
+        Args:
+            records (list of dict): The records to save.
+
+        Returns:
+            dict or None: The shard finalized by this write, if any.
+        """
+        return self.shard_writer.write(records)
+
+    def written(self, ids, shard, limited=None):
+        """
+        Takes note of the papers of a write, and commits them if their shard was finalized.
+
+        Args:
+            ids (list of tuple): The (arxiv_id, index_id) pairs of the papers written.
+            shard (dict or None): The shard returned by `write`.
+            limited (dict, optional): The limits applied to the extraction of some of the papers, by arXiv ID.
+        """
+        self._pending.extend(ids)
+        self._limited.update(limited or {})
+        if shard:
+            self._commit(shard)
+
+    def _commit(self, shard):
+        # Papers only count as processed once their shard is finalized
+        self.manifest.commit(shard, [arxiv_id for arxiv_id, _ in self._pending], self._limited)
+        self.ingested_ids.add_many([index_id for _, index_id in self._pending if index_id], self.category)
+        self._pending = []
+        self._limited = {}
+
+    def fail(self, arxiv_id, reason):
+        self.manifest.fail(arxiv_id, reason)
+
+    def close(self):
+        """
+        Finalizes the current shard and saves the manifest.
+        """
+        shard = self.shard_writer.close()
+        if shard:
+            self._commit(shard)
+        else:
+            self.manifest.save()
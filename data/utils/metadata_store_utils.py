@@ -0,0 +1,189 @@
+import json
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Typed schema of the harvested metadata
+METADATA_SCHEMA = pa.schema([
+    ("title", pa.string()),
+    ("authors", pa.list_(pa.string())),
+    ("category", pa.dictionary(pa.int16(), pa.string())),
+    ("published_year", pa.int16()),
+    ("summary", pa.string()),
+    ("pdf_link", pa.string()),
+])
+
+
+class ParquetRecordWriter:
+    """
+    Streams records into a Parquet file, one row group every `row_group_size` records.
+
+    Has the same interface as `JsonArrayWriter`: the file is written under a temporary name and
+    renamed into place on `close`, and no file is created if no record was written.
+    """
+
+    def __init__(self, parquet_file, schema=METADATA_SCHEMA, row_group_size=2000, compression="zstd"):
+        """
+        Args:
+            parquet_file (str): The path of the output Parquet file.
+            schema (pyarrow.Schema): The schema of the records.
+            row_group_size (int): Number of records buffered before a row group is written.
+            compression (str): The Parquet compression codec.
+        """
+        self.parquet_file = parquet_file
+        self.tmp_file = f"{parquet_file}.tmp"
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.count = 0
+        self._rows = []
+        self._writer = pq.ParquetWriter(self.tmp_file, schema, compression=compression, use_dictionary=["category"])
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_batch(pa.RecordBatch.from_pylist(self._rows, schema=self.schema))
+            self._rows = []
+
+    def write(self, record):
+        """
+        Appends a record to the file.
+
+        Args:
+            record (dict): The record to write.
+        """
+        self._rows.append(record)
+        self.count += 1
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def abort(self):
+        """
+        Discards everything written so far without touching the output file.
+        """
+        self._rows = []
+        self._writer.close()
+        os.remove(self.tmp_file)
+
+    def close(self):
+        """
+        Writes the remaining records and atomically moves the file into place.
+
+        Returns:
+            int: Number of records written.
+        """
+        self._flush()
+        self._writer.close()
+        if self.count:
+            os.replace(self.tmp_file, self.parquet_file)
+        else:
+            os.remove(self.tmp_file)
+        return self.count
+
+
+def publish_shards(shard_files, category_dir, append=False):
+    """
+    Moves finished shards into a category dataset directory.
+
+    When not appending, the shards replace the previous contents of the directory: the new directory is
+    built next to the old one and swapped in with two renames. When appending, a shard whose name is already
+    taken (e.g. by an earlier delta harvest of the same window) gets a sequence suffix, as in
+    'part-202401010000-202401312359-1.parquet', and no existing file is ever overwritten.
+
+    Args:
+        shard_files (list of str): The Parquet files to publish, in order.
+        category_dir (str): The category dataset directory (e.g. 'metadata/math.GM').
+        append (bool): Whether to add the shards to the existing directory instead of replacing it.
+    """
+    target_dir = category_dir if append else f"{category_dir}.new"
+    if not append:
+        # Left over by an interrupted publish
+        shutil.rmtree(target_dir, ignore_errors=True)
+    os.makedirs(target_dir, exist_ok=True)
+    for shard_file in shard_files:
+        stem, extension = os.path.splitext(os.path.basename(shard_file))
+        name = f"part-{stem}{extension}"
+        sequence = 0
+        while os.path.exists(os.path.join(target_dir, name)):
+            sequence += 1
+            name = f"part-{stem}-{sequence}{extension}"
+        # Unlike a rename, a link fails if the name was taken in the meantime
+        os.link(shard_file, os.path.join(target_dir, name))
+        os.remove(shard_file)
+
+    if not append:
+        old_dir = f"{category_dir}.old"
+        if os.path.exists(category_dir):
+            os.replace(category_dir, old_dir)
+        os.replace(target_dir, category_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def list_metadata_categories(metadata_dir):
+    """
+    Finds the metadata of every category, preferring Parquet datasets over legacy JSON files.
+
+    Args:
+        metadata_dir (str): The metadata directory.
+
+    Returns:
+        dict: Mapping from category name to its dataset directory or JSON file.
+    """
+    categories = {}
+    for entry in sorted(os.listdir(metadata_dir)):
+        path = os.path.join(metadata_dir, entry)
+        if entry.endswith(".json") and os.path.isfile(path) and entry != "watermarks.json":
+            categories.setdefault(os.path.splitext(entry)[0], path)
+        elif os.path.isdir(path) and any(f.endswith(".parquet") for f in os.listdir(path)):
+            categories[entry] = path
+    return categories
+
+
+def count_metadata_records(path):
+    """
+    Counts the records of a category's metadata. Parquet datasets are counted from their footers.
+
+    Args:
+        path (str): A category dataset directory, a Parquet file or a legacy JSON file.
+
+    Returns:
+        int: Number of records.
+    """
+    if path.endswith(".json"):
+        with open(path, 'r', encoding='utf-8') as f:
+            return len(json.load(f))
+    if os.path.isdir(path):
+        files = [os.path.join(path, f) for f in os.listdir(path) if f.endswith(".parquet")]
+    else:
+        files = [path]
+    return sum(pq.ParquetFile(parquet_file).metadata.num_rows for parquet_file in files)
+
+
+def iter_metadata_batches(path, columns=None, batch_size=1000):
+    """
+    Streams the metadata of a category as record batches, reading only the requested columns.
+
+    Args:
+        path (str): A category dataset directory, a Parquet file or a legacy JSON file.
+        columns (list of str, optional): The columns to read. Defaults to all of them.
+        batch_size (int): Maximum number of records per batch.
+
+    Yields:
+        pyarrow.RecordBatch: The next batch of records.
+    """
+    if path.endswith(".json"):
+        # Legacy files have to be loaded whole
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        for start in range(0, len(records), batch_size):
+            batch = pa.RecordBatch.from_pylist(records[start:start + batch_size])
+            yield batch.select(columns) if columns else batch
+        return
+
+    if os.path.isdir(path):
+        files = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith(".parquet")]
+    else:
+        files = [path]
+
+    for parquet_file in files:
+        yield from pq.ParquetFile(parquet_file).iter_batches(batch_size=batch_size, columns=columns)
@@ -0,0 +1,558 @@
+import functools
+import hashlib
+import inspect
+import json
+import re
+
+from utils.preprocessing_utils import meaningful_short_words, join_lines
+
+# Text normalization producing every preprocessing variant of a document in one sweep.
+#
+# Two flavors are supported, matching the two existing pipelines exactly:
+#   - "lines": the original `scripts/preprocessing.py`, kept as `scripts/benchmark_preprocessing.preprocessing`,
+#     which keeps the line structure and finds the references section from the bottom (headers, '[n]' entries,
+#     'address:' lines).
+#   - "flat": `preprocessing_utils.preprocessing`, which drops a leading arXiv stamp line, cuts at the first
+#     'references' line and collapses the text into a single line.
+#
+# The document is lowercased and, in the "lines" flavor, split once into segments: the head of its body, the
+# last lines of its body and its references. Every segment goes through the shared stages (line joining,
+# punctuation splitting) and both character branches (with and without numbers) on its own, and the variants
+# with and without references are stitched from the segments, so the head is only processed once. A stage whose
+# patterns could reach across a stitch (e.g. a '(' left open at the end of a segment) makes the stitch unsafe,
+# in which case that variant is recomputed on the whole part of the document, so the output is always identical
+# to the original pipelines. The "flat" flavor collapses every line break, which gives too little to stitch
+# for the work it saves, so its parts are processed in full.
+
+FLAVORS = ("lines", "flat")
+
+VARIANTS = tuple(
+    f"{ref}_ref_{nums}_nums{short}"
+    for ref in ("w", "wo") for nums in ("w", "wo") for short in ("", "_wo_short")
+)
+
+REFERENCE_KEYWORDS = {
+    "reference", "references",
+    "refrence", "refrences",
+    "bibliography", "bibliographic",
+    "tableofreferences", "listofreferences",
+    "referencescited", "referencesbibliography",
+    "refernece", "referencelist", "literature",
+    "literaturecited", "workscited", "referencesandnotes",
+    "referencesandbibliography", "bibliographyandreferences",
+    "referencesandlinks"
+}
+
+NON_LETTERS = re.compile(r"[^a-zA-Z]")
+NUMBERED_REFERENCE = re.compile(r"^\s*\[\d+\]")
+REFERENCES_LINE = re.compile(r"^\s*references\s*$")
+
+# Both dot-splitting passes of the original pipelines in one: a dot is split off unless it sits in a number
+# or before whitespace, and a dot after a word character is split off before whitespace or before a dot that
+# the first pass splits off
+SPLIT_DOTS = re.compile(r"\.(?:(?<!\d\.)(?![\d\s])|(?<=\w\.)(?=\s|\.(?![\d\s])))")
+# The character filters: every non-ASCII character goes first, then the ASCII ones outside the kept set
+KEPT_WITH_NUMBERS = set("abcdefghijklmnopqrstuvwxyz0123456789.-()' \n")
+WITH_NUMBERS_TABLE = {code: None for code in range(128) if chr(code) not in KEPT_WITH_NUMBERS}
+WITHOUT_NUMBERS_TABLE = {code: None for code in range(128) if chr(code) not in KEPT_WITH_NUMBERS - set("0123456789")}
+DECIMAL_POINT = re.compile(r"\.(?<=\d\.)(?=\d)")
+NUMBERS_LINE = re.compile(r"[0-9. \s\(\)-]+")
+PARENTHESES = re.compile(r"\([^b-z]*\)")
+# Only spaces and newlines survive the character filters, so these match the original `[ \t]+` and `\s+`
+SPACE_RUNS = re.compile(r" {2,}")
+WHITESPACE_RUNS = re.compile(r"[ \n]{2,}|\n")
+PERIOD_RUNS = re.compile(r"\.[.\s]*\.")
+# Same as `-+\s` and `\s-+`, written so the regex engine can skip ahead to the candidates
+TRAILING_DASHES = re.compile(r"--*\s")
+LEADING_DASHES = re.compile(r"[ \n]--*")
+
+# Ends of a segment that a pattern could extend past, into the next segment
+OPEN_PARENTHESIS_AT_END = re.compile(r"\([^b-z]*\Z")
+PERIODS_AT_END = re.compile(r"\.[.\s]*\Z")
+SAFE_LINE_END = re.compile(r"[a-z]{2}[b-z]$")
+
+
+def reference_cut(lines, flavor):
+    """
+    Finds the line where the references section starts, following the rules of each flavor.
+
+    Args:
+        lines (list of str): The lines of the lowercased document.
+        flavor (str): "lines" or "flat".
+
+    Returns:
+        int or None: The index of the first line of the references, or None if none was found.
+    """
+    if flavor == "flat":
+        for i, line in enumerate(lines):
+            if REFERENCES_LINE.match(line):
+                return i
+        return None
+
+    for i in range(len(lines) - 1, -1, -1):
+        if NON_LETTERS.sub('', lines[i]) in REFERENCE_KEYWORDS:
+            return i
+    for i in range(len(lines) - 1, -1, -1):
+        if NUMBERED_REFERENCE.match(lines[i]):
+            return i
+    for i in range(len(lines) - 1, -1, -1):
+        if "address:" in lines[i]:
+            return i
+    return None
+
+
+def keep_with_numbers(text):
+    """
+    Removes everything except a-z, 0-9, . - ( ) ' spaces and newlines.
+    """
+    return text.encode("ascii", "ignore").decode("ascii").translate(WITH_NUMBERS_TABLE)
+
+
+def keep_without_numbers(text):
+    """
+    Removes everything except a-z, . - ( ) ' spaces and newlines, dropping decimal points along with the digits.
+    """
+    return DECIMAL_POINT.sub('', text).encode("ascii", "ignore").decode("ascii").translate(WITHOUT_NUMBERS_TABLE)
+
+
+def space_parentheses(text):
+    return text.replace('- ', '').replace('(', ' ( ').replace(')', ' ) ')
+
+
+def split_dots(text):
+    """
+    Splits dots from the words around them, keeping 'e.g.', 'i.e.' and 'al.' together.
+    """
+    text = SPLIT_DOTS.sub(' . ', text)
+    return text.replace('e . g .', 'e.g.').replace('i . e .', 'i.e.').replace('al .', 'al.')
+
+
+def split_punctuation(text):
+    """
+    Splits dots and parentheses from the words around them.
+    """
+    return split_dots(space_parentheses(text))
+
+
+def clean_lines(text):
+    """
+    Drops the short words of every line (see `meaningful_short_words`), then the lines left with only
+    numbers and symbols, in a single pass over the lines.
+
+    Returns:
+        list of str: The remaining lines.
+    """
+    cleaned_lines = []
+    for line in text.split("\n"):
+        line = " ".join([word for word in line.split() if len(word) > 2 or word in meaningful_short_words])
+        if not NUMBERS_LINE.fullmatch(line):
+            cleaned_lines.append(line)
+    return cleaned_lines
+
+
+def remove_short_lines(text, min_words=4):
+    """
+    Removes lines that contain 3 or fewer words.
+    """
+    return "\n".join([line for line in text.split("\n") if len(line.split()) >= min_words])
+
+
+def rejoin_punctuation(text):
+    return text.replace('( ', '(').replace(' )', ')').replace(' .', '.')
+
+
+def remove_parentheses(text):
+    return PARENTHESES.sub('', text)
+
+
+def collapse_whitespace(text):
+    return WHITESPACE_RUNS.sub(' ', text).strip()
+
+
+def collapse_spaces(text):
+    return SPACE_RUNS.sub(' ', text)
+
+
+def remove_period_runs(text):
+    return PERIOD_RUNS.sub('.', text)
+
+
+def remove_trailing_dashes(text):
+    return TRAILING_DASHES.sub(' ', text)
+
+
+def remove_leading_dashes(text):
+    return LEADING_DASHES.sub(' ', text)
+
+
+def run_step(segments, stitches, func, unsafe=None):
+    """
+    Applies a step to every segment of a document. Before that, every stitch whose two segments the step
+    could treat differently when joined (`unsafe(left, right, sep)`) is dropped.
+    """
+    if unsafe:
+        for name, stitch in stitches.items():
+            if stitch and stitch[2] and unsafe(segments[stitch[0]], segments[stitch[1]], stitch[2]):
+                stitches[name] = None
+    for name, text in segments.items():
+        segments[name] = func(text)
+
+
+def clean_segments(segments, stitches, flat):
+    """
+    Runs the cleaning stage of the original `clean_text` on every segment of a document.
+
+    Args:
+        segments (dict): The text of every segment, after the character filter. Updated in place.
+        stitches (dict): The [left, right, separator] segments whose cleaned texts, joined with the separator,
+            are the cleaned text of a longer part of the document. A stitch that may no longer hold is set to
+            None. Updated in place.
+        flat (bool): Whether to collapse the text into a single line, as the "flat" flavor does (without any
+            stitches).
+    """
+    kept_lines = {name: clean_lines(text) for name, text in segments.items()}
+    for stitch in stitches.values():
+        # A segment left without any line leaves no line break behind
+        if stitch and not (kept_lines[stitch[0]] and kept_lines[stitch[1]]):
+            stitch[2] = ""
+    segments.update({name: "\n".join(lines) for name, lines in kept_lines.items()})
+
+    run_step(segments, stitches, remove_parentheses, lambda left, right, sep: OPEN_PARENTHESIS_AT_END.search(left))
+    run_step(segments, stitches, collapse_whitespace if flat else collapse_spaces)
+    run_step(segments, stitches, remove_period_runs, lambda left, right, sep: PERIODS_AT_END.search(left))
+    # Punctuation is only rejoined across a space, never across the line break of a stitch
+    run_step(segments, stitches, rejoin_punctuation)
+    run_step(segments, stitches, remove_trailing_dashes, lambda left, right, sep: left.endswith('-'))
+    run_step(segments, stitches, remove_leading_dashes, lambda left, right, sep: right.startswith('-'))
+
+
+def prepare_segments(segments, stitches):
+    """
+    Runs the stages shared by every variant (line joining, punctuation splitting) on every segment of a
+    document, see `clean_segments`.
+    """
+    run_step(segments, stitches, join_lines)
+    # The last line of a left segment ending with '-' would be joined with the next one
+    run_step(segments, stitches, space_parentheses, lambda left, right, sep: left.endswith('-'))
+    # A final dot is split differently at the end of the text than before a line break
+    run_step(segments, stitches, split_dots, lambda left, right, sep: left.endswith('.'))
+
+
+def stitch_point(lines, cut, lookback=20):
+    """
+    Picks the line where the body is split in two just above the references, so the end of the body can be
+    processed both alone and followed by the references. Lines ending with a word (rather than a dot, a
+    hyphen or an open parenthesis) are preferred, since no pattern reaches past them.
+    """
+    for i in range(cut - 1, max(0, cut - lookback), -1):
+        if SAFE_LINE_END.search(lines[i - 1]):
+            return i
+    return cut - 1
+
+
+def check_arguments(flavor, variants):
+    if flavor not in FLAVORS:
+        raise ValueError(f"Unknown flavor '{flavor}', expected one of {FLAVORS}")
+    variants = tuple(variants)
+    unknown = set(variants) - set(VARIANTS)
+    if unknown:
+        raise ValueError(f"Unknown variants {sorted(unknown)}, expected some of {VARIANTS}")
+    return variants
+
+
+def lowered_lines(text, flavor):
+    """
+    Lowercases a document (dropping the arXiv stamp line in the "flat" flavor) and splits it into lines.
+
+    Returns:
+        tuple: The lowercased text and its lines.
+    """
+    text = text.lower()
+    if flavor == "flat":
+        if text.startswith("arxiv"):
+            text = "\n".join(text.split("\n")[1:])
+        return text, text.split("\n")
+    return text, text.splitlines()
+
+
+def prepare_document(text, flavor="lines"):
+    """
+    Runs the "prepare" stage on a document: lowercasing, references cut, line joining and punctuation
+    splitting, shared by every variant.
+
+    Args:
+        text (str): The raw text of the document.
+        flavor (str): "lines" or "flat" (see the top of this module).
+
+    Returns:
+        dict: The prepared document, JSON-serializable: the references 'cut' (line index or None), the
+            prepared 'segments', the 'stitches' that build the body and whole parts from them, and the
+            'parts' that are segments of their own.
+    """
+    text, lines = lowered_lines(text, flavor)
+
+    # The document is split into a head, the tail of its body and its references: the variants without
+    # references stitch the head to the tail, and the ones with references stitch it to the tail followed
+    # by the references. That only works if the body is a true prefix of the document; line breaks other
+    # than '\n' (e.g. '\r\n') are rewritten by the original pipeline, so those documents are processed in
+    # full instead, like every document of the "flat" flavor.
+    cut = reference_cut(lines, flavor)
+    stitches = {}
+    if cut is None:
+        segments = {"body": text}
+        parts = {"body": "body", "whole": "body"}
+    else:
+        body = "\n".join(lines[:cut])
+        stitched = flavor == "lines" and cut > 1 and text.startswith(body + "\n")
+        split = stitch_point(lines, cut) if stitched else 0
+        if split:
+            tail = "\n".join(lines[split:cut])
+            segments = {
+                "head": "\n".join(lines[:split]),
+                "tail": tail,
+                "tail_refs": tail + text[len(body):],
+            }
+            stitches = {"body": ["head", "tail", "\n"], "whole": ["head", "tail_refs", "\n"]}
+            parts = {}
+        else:
+            segments = {"body": body, "whole": text}
+            parts = {"body": "body", "whole": "whole"}
+
+    prepare_segments(segments, stitches)
+    return {"cut": cut, "segments": segments, "stitches": stitches, "parts": parts}
+
+
+def clean_variants(text, prepared, flavor="lines", variants=VARIANTS):
+    """
+    Runs the "clean" stage (character filters and cleaning) and the "short_lines" stage on a prepared
+    document, see `prepare_document`.
+
+    Args:
+        text (str): The raw text of the document, only read again when a stitch does not hold.
+        prepared (dict): The output of `prepare_document` for the document.
+        flavor (str): "lines" or "flat" (see the top of this module).
+        variants (iterable of str): The variants to produce, among `VARIANTS`.
+
+    Returns:
+        dict: The text of every requested variant.
+    """
+    flat = flavor == "flat"
+    segments, stitches, parts = prepared["segments"], prepared["stitches"], prepared["parts"]
+
+    results = {}
+    for nums, keep in (("w", keep_with_numbers), ("wo", keep_without_numbers)):
+        wanted = {(ref, short) for ref in ("w", "wo") for short in ("", "_wo_short")
+                  if f"{ref}_ref_{nums}_nums{short}" in variants}
+        if not wanted:
+            continue
+        wanted_parts = {part for ref, part in (("wo", "body"), ("w", "whole"))
+                        if (ref, "") in wanted or (ref, "_wo_short") in wanted}
+
+        # Only the segments feeding the wanted parts go through the branch
+        branch_stitches = {part: stitches[part] and list(stitches[part]) for part in wanted_parts if part in stitches}
+        needed = {parts[part] for part in wanted_parts if part in parts}
+        for stitch in branch_stitches.values():
+            if stitch:
+                needed.update(stitch[:2])
+        branch = {name: keep(segments[name]) for name in needed}
+        clean_segments(branch, branch_stitches, flat)
+
+        for ref, part in (("wo", "body"), ("w", "whole")):
+            if part not in wanted_parts:
+                continue
+            if part in parts:
+                cleaned = branch[parts[part]]
+            elif branch_stitches[part]:
+                left, right, sep = branch_stitches[part]
+                cleaned = branch[left] + sep + branch[right]
+            else:
+                # The segments could not be stitched: process the part in full
+                whole, lines = lowered_lines(text, flavor)
+                if part == "body":
+                    whole = "\n".join(lines[:prepared["cut"]])
+                cleaned = clean(keep(split_punctuation(join_lines(whole))), flat)
+
+            results[f"{ref}_ref_{nums}_nums"] = cleaned
+            if (ref, "_wo_short") in wanted:
+                results[f"{ref}_ref_{nums}_nums_wo_short"] = remove_short_lines(cleaned)
+
+    return {variant: results[variant] for variant in variants}
+
+
+def normalize_variants(text, flavor="lines", variants=VARIANTS):
+    """
+    Produces every preprocessing variant of a document in one sweep: with and without the references, with
+    and without numbers, and with and without the lines of 3 or fewer words.
+
+    Args:
+        text (str): The raw text of the document.
+        flavor (str): "lines" to match `scripts/benchmark_preprocessing.preprocessing` or "flat" to match
+            `preprocessing_utils.preprocessing` (see the top of this module).
+        variants (iterable of str): The variants to produce, among `VARIANTS`. The stages and segments that
+            only feed other variants are skipped.
+
+    Returns:
+        dict: The text of every requested variant, e.g. 'wo_ref_w_nums_wo_short'.
+    """
+    variants = check_arguments(flavor, variants)
+    return clean_variants(text, prepare_document(text, flavor), flavor, variants)
+
+
+def clean(text, flat):
+    """
+    Runs the cleaning stage of the original `clean_text` on a whole document.
+    """
+    segments = {"text": text}
+    clean_segments(segments, {}, flat)
+    return segments["text"]
+
+
+# The stages of the pipeline in order, with the function running each one. The version of a stage is derived
+# from the code it runs, so the results cached for it (and for the stages after it) are computed again
+# whenever that code changes
+STAGES = {
+    "prepare": prepare_document,  # Lowercasing, references cut, line joining, punctuation splitting
+    "clean": clean_variants,  # Character filters, the rules of `clean_text`
+    "short_lines": remove_short_lines,  # Removal of the lines of 3 or fewer words
+}
+
+
+def stable_repr(value):
+    """
+    Formats a constant the same way in every process (sets are sorted, patterns give their source).
+    """
+    if isinstance(value, re.Pattern):
+        return f"re.compile({value.pattern!r}, {value.flags})"
+    if isinstance(value, (set, frozenset)):
+        return "{" + ", ".join(sorted(map(stable_repr, value))) + "}"
+    if isinstance(value, dict):
+        return "{" + ", ".join(sorted(f"{stable_repr(k)}: {stable_repr(v)}" for k, v in value.items())) + "}"
+    if isinstance(value, (list, tuple)):
+        return "(" + ", ".join(map(stable_repr, value)) + ")"
+    return repr(value)
+
+
+def code_digest(func):
+    """
+    Hashes the source of a function along with the module-level functions and constants it refers to,
+    recursively, wherever they are defined (e.g. the helpers imported from `preprocessing_utils`).
+    """
+    sources = {}
+    pending = [func]
+    while pending:
+        func = pending.pop()
+        sources[f"{func.__module__}.{func.__qualname__}"] = inspect.getsource(func)
+        codes = [func.__code__]
+        while codes:
+            code = codes.pop()
+            # Nested functions and lambdas are code objects among the constants of their parent
+            codes += [const for const in code.co_consts if inspect.iscode(const)]
+            for name in code.co_names:
+                value = func.__globals__.get(name)
+                key = f"{func.__module__}.{name}"
+                if callable(value) and hasattr(value, "__wrapped__"):
+                    # The function behind a decorator, e.g. `functools.lru_cache`
+                    value = inspect.unwrap(value)
+                if inspect.isfunction(value):
+                    if f"{value.__module__}.{value.__qualname__}" not in sources and value not in pending:
+                        pending.append(value)
+                elif isinstance(value, (re.Pattern, set, frozenset, dict, list, tuple, str, bytes, int, float)):
+                    sources[key] = stable_repr(value)
+
+    digest = hashlib.sha256()
+    for key in sorted(sources):
+        digest.update(f"{key}\n{sources[key]}\n".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+@functools.lru_cache(maxsize=None)
+def stage_version(stage):
+    """
+    Builds the cache version of a stage: the digest of its code and of the code of the stages it depends on,
+    e.g. 'prepare-1f0c2a9e4b7d.clean-8e3b5d0a6c21'.
+    """
+    stages = list(STAGES)
+    return ".".join(f"{name}-{code_digest(STAGES[name])}" for name in stages[:stages.index(stage) + 1])
+
+
+def normalize_documents(texts, flavor="lines", variants=VARIANTS, cache=None):
+    """
+    Produces the variants of a batch of documents, normalizing repeated documents only once.
+
+    With a cache (see `result_cache_utils.ResultCache`), the output of every stage is looked up by
+    document hash and stage version first, and only the missing ones are computed, from the latest stage
+    found: e.g. after a change to the "short_lines" stage, the short variants are rebuilt from the cached
+    cleaned ones, and after a change to the "clean" stage, from the cached prepared documents.
+
+    Args:
+        texts (iterable of str): The raw texts of the documents.
+        flavor (str): "lines" or "flat" (see the top of this module).
+        variants (iterable of str): The variants to produce, among `VARIANTS`.
+        cache (ResultCache, optional): The cache of the stage outputs.
+
+    Returns:
+        list of dict: The text of every requested variant, for every document.
+    """
+    variants = check_arguments(flavor, variants)
+    texts = list(texts)
+    if cache is None:
+        normalized = {}
+        for text in texts:
+            if text not in normalized:
+                normalized[text] = normalize_variants(text, flavor, variants)
+        return [normalized[text] for text in texts]
+
+    digests = [hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest() for text in texts]
+    documents = dict(zip(digests, texts))
+    results = {digest: {} for digest in documents}
+
+    # The short variants are built from their cleaned variant, so both are looked up
+    suffix = "_wo_short"
+    cleaned_variants = {variant[:-len(suffix)] if variant.endswith(suffix) else variant for variant in variants}
+    short_variants = [variant for variant in variants if variant.endswith(suffix)]
+    for variant in [*cleaned_variants, *short_variants]:
+        stage = "short_lines" if variant.endswith(suffix) else "clean"
+        found = cache.get_many(f"{flavor}/{variant}", stage_version(stage), list(documents))
+        for digest, value in found.items():
+            results[digest][variant] = value.decode("utf-8")
+
+    missing = {}
+    for digest, result in results.items():
+        needed = {variant for variant in cleaned_variants if variant not in result
+                  and (variant in variants or variant + suffix not in result)}
+        if needed:
+            missing[digest] = needed
+
+    # Clean stage, from the cached prepared documents where possible
+    if missing:
+        prepared = {digest: json.loads(value)
+                    for digest, value in cache.get_many(f"{flavor}/prepare", stage_version("prepare"),
+                                                        list(missing)).items()}
+        new_prepared = {}
+        for digest in missing:
+            if digest not in prepared:
+                prepared[digest] = new_prepared[digest] = prepare_document(documents[digest], flavor)
+        if new_prepared:
+            cache.put_many(f"{flavor}/prepare", stage_version("prepare"),
+                           {digest: json.dumps(value).encode("utf-8") for digest, value in new_prepared.items()})
+
+        computed = {}
+        for digest, needed in missing.items():
+            values = clean_variants(documents[digest], prepared[digest], flavor, sorted(needed))
+            results[digest].update(values)
+            for variant, value in values.items():
+                computed.setdefault(variant, {})[digest] = value.encode("utf-8")
+        for variant, values in computed.items():
+            cache.put_many(f"{flavor}/{variant}", stage_version("clean"), values)
+
+    # Short lines stage
+    for variant in short_variants:
+        computed = {}
+        for digest, result in results.items():
+            if variant not in result:
+                result[variant] = remove_short_lines(result[variant[:-len(suffix)]])
+                computed[digest] = result[variant].encode("utf-8")
+        if computed:
+            cache.put_many(f"{flavor}/{variant}", stage_version("short_lines"), computed)
+
+    return [{variant: results[digest][variant] for variant in variants} for digest in digests]
@@ -1,88 +1,240 @@
 import os
 import re
-import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 MAX_ENTRIES_PER_PARQUET = 500
+MAX_BYTES_PER_PARQUET = 256 * 1024 * 1024
 
+# The text dataset lives in this subdirectory of the metadata shards, under the same shard names
+TEXT_DIR = "text"
 
-def get_latest_parquet_file(category):
+# zstd levels: the text is written once and read rarely, so it pays for a slower, tighter level
+METADATA_COMPRESSION_LEVEL = 3
+TEXT_COMPRESSION_LEVEL = 9
+
+# Schema of the ingested papers
+PAPERS_SCHEMA = pa.schema([
+    ("arxiv_id", pa.string()),
+    ("title", pa.string()),
+    ("authors", pa.string()),
+    ("year", pa.int64()),
+    ("category", pa.string()),
+    ("summary", pa.string()),
+    ("pdf_content", pa.string()),
+])
+
+# The papers are stored as two datasets keyed by arXiv ID: the narrow metadata and the full text
+METADATA_SCHEMA = pa.schema([field for field in PAPERS_SCHEMA if field.name != "pdf_content"])
+TEXT_SCHEMA = pa.schema([PAPERS_SCHEMA.field("arxiv_id"), PAPERS_SCHEMA.field("pdf_content")])
+
+
+def shard_pattern(category):
     """
-    Retrieves the most recent Parquet file for a given category.
-    
-    Args:
-        category (str): The category name used as the prefix for Parquet files.
-        
-    Returns:
-        str: The filename of the most recent Parquet file for the category.
+    Builds the regular expression matching the shard files of a category (`<category>_<n>.parquet`),
+    including the unfinished `.tmp` ones.
     """
-    existing_files = [f for f in os.listdir() if f.startswith(f"{category}") and f.endswith(".parquet")]
-    if not existing_files:
-        return f"{category}_1.parquet"
-    existing_files.sort(key=lambda x: int(x.split("_")[-1].split(".")[0]))
-    return existing_files[-1]
+    return re.compile(rf"^{re.escape(category)}_(\d+)\.parquet(\.tmp)?$")
 
 
-def save_to_parquet(category, data_chunk):
+def list_shards(category, output_dir="."):
     """
-    Saves a chunk of data to a Parquet file for a given category. If a Parquet file for the category already exists, the function appends the new data
-    to it, provided the total number of records does not exceed the specified limit.
-    
+    Lists the finalized Parquet shards of a category, in order.
+
     Args:
-        category (str): The category name used to name the Parquet file.
-        data_chunk (list of dict): A list of data entries to be saved to the Parquet file.
+        category (str): The category name used as the prefix of the shards.
+        output_dir (str): The directory of the shards.
+
+    Returns:
+        list of str: The paths of the shards.
     """
-    
-    parquet_file = get_latest_parquet_file(category)
-
-    # Load existing data if file exists
-    if os.path.exists(parquet_file):
-        df_existing = pd.read_parquet(parquet_file, engine="pyarrow")
-        if len(df_existing) >= MAX_ENTRIES_PER_PARQUET:
-            match = re.search(r"_(\d+)\.parquet", parquet_file)
-            idx = int(match.group(1))
-
-            df_new = pd.DataFrame(data_chunk)
-            parquet_file = f"{category}_{idx+1}.parquet"
-            df_new.to_parquet(parquet_file, engine="pyarrow", compression="snappy")
-        else:
-            df_new = pd.DataFrame(data_chunk)
-            df_combined = pd.concat([df_existing, df_new], ignore_index=True)
-            df_combined.to_parquet(parquet_file, engine="pyarrow", compression="snappy")
-    else:
-        df_new = pd.DataFrame(data_chunk)
-        df_new.to_parquet(parquet_file, engine="pyarrow", compression="snappy")
-        
-    print(f"💾 Successfully saved {len(data_chunk)} new records to {parquet_file}")
-
-
-def get_last_processed_id(category):
+    pattern = shard_pattern(category)
+    shards = []
+    for f in os.listdir(output_dir):
+        match = pattern.match(f)
+        if match and not match.group(2):
+            shards.append((int(match.group(1)), os.path.join(output_dir, f)))
+    return [path for _, path in sorted(shards)]
+
+
+class ParquetShardWriter:
     """
-    Retrieves the last processed arXiv ID from the latest Parquet file for a given category.
-    
-    Args:
-        category (str): The category name used to identify the Parquet file.
-        
-    Returns:
-        str or None: The last processed arXiv ID, or None if no file exists or if the file is empty.
+    Appends records to the Parquet shards of a category (`<category>_<n>.parquet`), one row group per write.
+
+    The current shard is kept open under a temporary name and renamed into place once it reaches `max_rows`
+    records or `max_bytes` bytes, so a flush only costs the new rows and finished shards are never rewritten.
+    New shards always follow the existing ones.
     """
-    parquet_file = get_latest_parquet_file(category)
 
-    if not os.path.exists(parquet_file):
+    def __init__(self, category, output_dir=".", max_rows=MAX_ENTRIES_PER_PARQUET, max_bytes=MAX_BYTES_PER_PARQUET,
+                 schema=PAPERS_SCHEMA, compression="snappy", compression_level=None, verbose=True):
+        """
+        Args:
+            category (str): The category name used as the prefix of the shards.
+            output_dir (str): The directory of the shards.
+            max_rows (int): Number of records after which a shard is finalized.
+            max_bytes (int): Size in bytes after which a shard is finalized.
+            schema (pyarrow.Schema): The schema of the records.
+            compression (str): The Parquet compression codec.
+            compression_level (int, optional): The level of the codec.
+            verbose (bool): Whether to report every write.
+        """
+        self.category = category
+        self.output_dir = output_dir
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.schema = schema
+        self.compression = compression
+        self.compression_level = compression_level
+        self.verbose = verbose
+        self.parquet_file = None
+        self.rows = 0
+        self._sink = None
+        self._writer = None
+
+        # Continue after the last existing shard, dropping shards left unfinished by an interrupted run
+        pattern = shard_pattern(category)
+        self.index = 0
+        for f in os.listdir(output_dir):
+            match = pattern.match(f)
+            if match and match.group(2):
+                os.remove(os.path.join(output_dir, f))
+            elif match:
+                self.index = max(self.index, int(match.group(1)))
+
+    def _open(self):
+        self.index += 1
+        self.parquet_file = os.path.join(self.output_dir, f"{self.category}_{self.index}.parquet")
+        self._sink = pa.OSFile(f"{self.parquet_file}.tmp", "wb")
+        self._writer = pq.ParquetWriter(self._sink, self.schema, compression=self.compression,
+                                        compression_level=self.compression_level)
+
+    @property
+    def bytes(self):
+        """
+        Size in bytes of the current shard so far.
+        """
+        return self._sink.tell() if self._sink is not None else 0
+
+    def _finalize(self):
+        self._writer.close()
+        self._sink.close()
+        os.replace(f"{self.parquet_file}.tmp", self.parquet_file)
+        if self.verbose:
+            print(f"📦 Finalized {os.path.basename(self.parquet_file)} ({self.rows} records)")
+
+        shard = {
+            "file": os.path.basename(self.parquet_file),
+            "rows": self.rows,
+            "bytes": os.path.getsize(self.parquet_file),
+        }
+        self._writer = None
+        self._sink = None
+        self.rows = 0
+        return shard
+
+    def write(self, records):
+        """
+        Appends a batch of records to the current shard as a new row group.
+
+        Args:
+            records (list of dict): The records to save.
+
+        Returns:
+            dict or None: The file name, row count and size in bytes of the shard finalized by this write,
+                if any.
+        """
+        if not records:
+            return None
+        if self._writer is None:
+            self._open()
+
+        self._writer.write_table(pa.Table.from_pylist(records, schema=self.schema))
+        self.rows += len(records)
+        if self.verbose:
+            print(f"💾 Successfully saved {len(records)} new records to {os.path.basename(self.parquet_file)}")
+
+        if self.rows >= self.max_rows or self.bytes >= self.max_bytes:
+            return self._finalize()
         return None
-    
-    try:
-        # Load the Parquet file
-        df = pd.read_parquet(parquet_file, engine="pyarrow")
-        
-        # If the DataFrame is empty, return None to indicate no processed records
-        if df.empty:
+
+    def close(self):
+        """
+        Finalizes the current shard.
+
+        Returns:
+            dict or None: The file name, row count and size in bytes of the finalized shard, if any.
+        """
+        if self._writer is None:
             return None
-        
-        # Get the arXiv ID of the last processed record
-        last_id = df.iloc[-1]["arxiv_id"]
-        print(f"🔄 Resuming from last processed paper: {last_id}")
-        return last_id
-    except Exception as e:
-        # If there is an error reading the file, print the error and return None
-        print(f"⚠ Error reading Parquet file {parquet_file}: {e}")
+        return self._finalize()
+
+
+class SplitShardWriter:
+    """
+    Writes the papers of a category as two datasets with matching shards: the metadata shards
+    (`<category>_<n>.parquet`) and the text shards (`text/<category>_<n>.parquet`), both keyed by arXiv ID
+    and zstd-compressed. Metadata scans then never page in the full text.
+
+    Both shards of a pair are finalized together, once they reach `max_rows` records or `max_bytes` bytes: the
+    text shard first, then the metadata shard, whose rename completes the pair. A text shard without its
+    metadata shard was left by an interrupted run, and is dropped when the writer opens, like the unfinished
+    shards. The papers of a pair only count as ingested once the manifest commits it (see `CategoryWriter`).
+    """
+
+    def __init__(self, category, output_dir=".", max_rows=MAX_ENTRIES_PER_PARQUET, max_bytes=MAX_BYTES_PER_PARQUET):
+        """
+        Args:
+            category (str): The category name used as the prefix of the shards.
+            output_dir (str): The directory of the metadata shards.
+            max_rows (int): Number of records after which a pair of shards is finalized.
+            max_bytes (int): Size in bytes after which a pair of shards is finalized.
+        """
+        text_dir = os.path.join(output_dir, TEXT_DIR)
+        os.makedirs(text_dir, exist_ok=True)
+        for text_file in list_shards(category, text_dir):
+            if not os.path.exists(os.path.join(output_dir, os.path.basename(text_file))):
+                os.remove(text_file)
+
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.metadata = ParquetShardWriter(category, output_dir, max_rows=float("inf"), max_bytes=float("inf"),
+                                           schema=METADATA_SCHEMA, compression="zstd",
+                                           compression_level=METADATA_COMPRESSION_LEVEL)
+        self.text = ParquetShardWriter(category, text_dir, max_rows=float("inf"), max_bytes=float("inf"),
+                                       schema=TEXT_SCHEMA, compression="zstd",
+                                       compression_level=TEXT_COMPRESSION_LEVEL, verbose=False)
+
+        # Keep the shard numbers aligned, even if an interrupted run left only one shard of a pair
+        self.metadata.index = self.text.index = max(self.metadata.index, self.text.index)
+
+    def write(self, records):
+        """
+        Appends a batch of records to the current pair of shards. Each dataset keeps its own columns.
+
+        Args:
+            records (list of dict): The records to save, with every column of `PAPERS_SCHEMA`.
+
+        Returns:
+            dict or None: The file name, row count and total size in bytes of the shards finalized by this
+                write, if any.
+        """
+        self.metadata.write(records)
+        self.text.write(records)
+
+        if self.metadata.rows >= self.max_rows or self.metadata.bytes + self.text.bytes >= self.max_bytes:
+            return self.close()
         return None
+
+    def close(self):
+        """
+        Finalizes the current pair of shards.
+
+        Returns:
+            dict or None: The file name, row count and total size in bytes of the finalized shards, if any.
+        """
+        text_shard = self.text.close()
+        shard = self.metadata.close()
+        if shard is not None and text_shard is not None:
+            shard["bytes"] += text_shard["bytes"]
+        return shard
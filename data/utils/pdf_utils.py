@@ -1,19 +1,85 @@
 import fitz
 
-def extract_text_from_pdf(pdf_path):
+def extract_text_from_pdf(pdf):
     """
-    This function opens the PDF file located at the given path and extracts the text from all pages.
+    This function opens a PDF and extracts the text from all pages. In-memory PDFs are opened from a memory
+    stream, without touching the disk.
 
     Args:
-        pdf_path (str): The file path to the PDF from which to extract text.
+        pdf (str, bytes or file-like): The file path to the PDF, its raw bytes, or a binary buffer holding it.
 
     Returns:
         str: The extracted text from the PDF. Returns None if an error occurs.
     """
+    name = pdf if isinstance(pdf, str) else "in-memory PDF"
     try:
-        doc = fitz.open(pdf_path)
-        return "\n".join([page.get_text("text") for page in doc])
-    
+        with open_pdf(pdf) as doc:
+            return "\n".join([page.get_text("text") for page in doc])
+
     except Exception as e:
-        print(f"⚠ Error reading {pdf_path}: {e}")
-        return None
\ No newline at end of file
+        print(f"⚠ Error reading {name}: {e}")
+        return None
+
+
+def open_pdf(pdf):
+    """
+    Opens a PDF from a file path, raw bytes or a binary buffer.
+    """
+    if isinstance(pdf, str):
+        return fitz.open(pdf)
+    data = pdf if isinstance(pdf, (bytes, bytearray, memoryview)) else pdf.read()
+    return fitz.open(stream=data, filetype="pdf")
+
+
+def cap_text(text, max_bytes=None):
+    """
+    Cuts a text down to at most `max_bytes` UTF-8 bytes, without splitting a character.
+
+    Args:
+        text (str): The text.
+        max_bytes (int, optional): The byte cap. No cap if None.
+
+    Returns:
+        tuple: The text and a note describing the cut (None if the text was not cut).
+    """
+    if max_bytes is None or len(text) * 4 <= max_bytes:
+        return text, None
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text, None
+    return encoded[:max_bytes].decode("utf-8", errors="ignore"), f"text cut to {max_bytes} of {len(encoded)} bytes"
+
+
+def extract_text_within_budget(pdf, head_pages=None, tail_pages=0, max_bytes=None):
+    """
+    Extracts the text of a PDF within a page and size budget. Long documents keep their first `head_pages`
+    pages and their last `tail_pages` pages, so the boundary of the references section is not lost.
+
+    Args:
+        pdf (str, bytes or file-like): The file path to the PDF, its raw bytes, or a binary buffer holding it.
+        head_pages (int, optional): Number of pages kept from the start. No page limit if None.
+        tail_pages (int): Number of pages kept from the end, on top of the first ones.
+        max_bytes (int, optional): Cap on the UTF-8 size of the text.
+
+    Returns:
+        tuple: The extracted text (None if the PDF could not be read) and a list of notes describing
+            every limit that was applied.
+    """
+    notes = []
+    try:
+        with open_pdf(pdf) as doc:
+            page_count = doc.page_count
+            if head_pages is not None and page_count > head_pages + tail_pages:
+                pages = list(range(head_pages)) + list(range(page_count - tail_pages, page_count))
+                notes.append(f"kept first {head_pages} and last {tail_pages} of {page_count} pages")
+            else:
+                pages = range(page_count)
+            text = "\n".join([doc[number].get_text("text") for number in pages])
+
+    except Exception as e:
+        return None, [f"unreadable PDF: {e}"]
+
+    text, note = cap_text(text, max_bytes)
+    if note:
+        notes.append(note)
+    return text, notes
@@ -0,0 +1,138 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PipelineStats:
+    """
+    Counts the items leaving each stage of the ingest pipeline and reports queue depths and throughput.
+    """
+
+    STAGES = ("downloaded", "extracted", "written", "failed")
+
+    def __init__(self, queues):
+        """
+        Args:
+            queues (dict): Mapping from stage name to the asyncio.Queue feeding the next stage.
+        """
+        self.queues = queues
+        self.counts = dict.fromkeys(self.STAGES, 0)
+        self.started = time.monotonic()
+
+    def add(self, stage, count=1):
+        self.counts[stage] += count
+
+    def report(self):
+        """
+        Returns a one-line summary of the queue depths and per-stage throughput.
+        """
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        depths = ", ".join(f"{name} {queue.qsize()}/{queue.maxsize}" for name, queue in self.queues.items())
+        rates = ", ".join(f"{stage} {count} ({count / elapsed:.2f}/s)" for stage, count in self.counts.items())
+        return f"queues: {depths} | {rates}"
+
+
+async def run_pipeline(downloads, extract, executor, write_batch, on_written=None, on_failure=None,
+                       batch_size=50, queue_size=16, extract_workers=4, report_interval=30):
+    """
+    Runs the staged ingest pipeline: downloads feed a bounded queue, `extract_workers` tasks hand the
+    payloads to a process pool, and a single writer batches the results.
+
+    Every queue is bounded, so a slow stage stops the one before it: a full download queue stops new
+    downloads from being pulled, and a full extraction queue keeps the process pool from running ahead
+    of the writer. Memory is bounded by the queue sizes plus the work in flight.
+
+    Args:
+        downloads (async iterator of tuple): (item, payload, error) triples, as yielded by `download_pdfs`.
+        extract (callable): Picklable function turning a payload into a (text, notes) pair, where text is None
+            when there is no text and notes is a list of remarks on the extraction (e.g. limits applied).
+        executor (concurrent.futures.Executor): The process pool running `extract`.
+        write_batch (callable): Called with a list of (item, text, notes) triples on a dedicated writer thread.
+        on_written (callable, optional): Called on the event loop with the value returned by `write_batch`.
+        on_failure (callable, optional): Called with (item, stage, error) for every dropped item.
+        batch_size (int): Number of results written at once.
+        queue_size (int): Capacity of each queue between stages.
+        extract_workers (int): Number of extractions in flight, usually the size of the process pool.
+        report_interval (float): Seconds between two progress reports.
+
+    Returns:
+        PipelineStats: The final counts of the run.
+    """
+    loop = asyncio.get_running_loop()
+    downloaded = asyncio.Queue(queue_size)
+    extracted = asyncio.Queue(queue_size)
+    stats = PipelineStats({"downloaded": downloaded, "extracted": extracted})
+    writer_thread = ThreadPoolExecutor(max_workers=1)
+
+    def fail(item, stage, error):
+        stats.add("failed")
+        if on_failure:
+            on_failure(item, stage, error)
+
+    async def download_stage():
+        async for item, payload, error in downloads:
+            if payload is None:
+                fail(item, "download", error)
+                continue
+            stats.add("downloaded")
+            await downloaded.put((item, payload))
+        for _ in range(extract_workers):
+            await downloaded.put(None)
+
+    async def extract_stage():
+        while True:
+            job = await downloaded.get()
+            if job is None:
+                break
+            item, payload = job
+            try:
+                text, notes = await loop.run_in_executor(executor, extract, payload)
+            except Exception as e:
+                fail(item, "extract", str(e) or type(e).__name__)
+                continue
+            if not text:
+                fail(item, "extract", "; ".join(notes) or "empty text")
+                continue
+            stats.add("extracted")
+            await extracted.put((item, text, notes))
+        await extracted.put(None)
+
+    async def flush(batch):
+        result = await loop.run_in_executor(writer_thread, write_batch, batch)
+        stats.add("written", len(batch))
+        if on_written:
+            on_written(result)
+
+    async def write_stage():
+        batch = []
+        finished = 0
+        while finished < extract_workers:
+            result = await extracted.get()
+            if result is None:
+                finished += 1
+                continue
+            batch.append(result)
+            if len(batch) >= batch_size:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+
+    async def report_stage():
+        while True:
+            await asyncio.sleep(report_interval)
+            print(f"📊 {stats.report()}")
+
+    reporter = asyncio.ensure_future(report_stage())
+    tasks = [asyncio.ensure_future(download_stage()), asyncio.ensure_future(write_stage())]
+    tasks += [asyncio.ensure_future(extract_stage()) for _ in range(extract_workers)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        reporter.cancel()
+        for task in tasks:
+            task.cancel()
+        writer_thread.shutdown()
+
+    print(f"📊 {stats.report()}")
+    return stats
@@ -0,0 +1,110 @@
+import asyncio
+import multiprocessing
+import time
+
+
+class TokenBucket:
+    """
+    Asynchronous token-bucket rate limiter shared by every task that talks to the same host.
+
+    Tokens are refilled continuously at `rate` tokens per second up to `capacity`. Waiters are
+    served in FIFO order, so no single category can starve the others.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): Number of requests allowed per second.
+            capacity (float, optional): Maximum burst size. Defaults to max(1, rate).
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1):
+        """
+        Waits until `tokens` tokens are available and consumes them.
+
+        Args:
+            tokens (float): Number of tokens to consume.
+        """
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def pause(self, seconds):
+        """
+        Holds every caller back for at least `seconds` seconds, e.g. when the server asks to slow down.
+
+        Args:
+            seconds (float): The length of the pause.
+        """
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class SharedTokenBucket:
+    """
+    Token-bucket rate limiter shared by several processes, with the same `acquire` interface as `TokenBucket`.
+
+    The bucket lives in shared memory, so it has to be created in the parent process and handed to the
+    workers when they start (e.g. through a pool initializer). Every caller reserves its tokens up front and
+    then waits for them, so requests are served in the order they were made, whatever process they come from.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): Number of requests allowed per second across all processes.
+            capacity (float, optional): Maximum burst size. Defaults to max(1, rate).
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._lock = multiprocessing.Lock()
+        self._tokens = multiprocessing.RawValue('d', self.capacity)
+        self._updated = multiprocessing.RawValue('d', time.monotonic())
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens.value = min(self.capacity, self._tokens.value + (now - self._updated.value) * self.rate)
+        self._updated.value = now
+
+    def _reserve(self, tokens):
+        with self._lock:
+            self._refill()
+            self._tokens.value -= tokens
+            return max(0.0, -self._tokens.value / self.rate)
+
+    async def acquire(self, tokens=1):
+        """
+        Reserves `tokens` tokens and waits until they are available.
+
+        Args:
+            tokens (float): Number of tokens to consume.
+        """
+        wait = self._reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Holds every caller of every process back for at least `seconds` seconds, e.g. when the server asks
+        to slow down.
+
+        Args:
+            seconds (float): The length of the pause.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens.value = min(self._tokens.value, -seconds * self.rate)
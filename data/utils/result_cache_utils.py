@@ -0,0 +1,153 @@
+import sqlite3
+import threading
+import time
+
+import pyarrow as pa
+
+# Digests looked up per query, below the SQLite limit on query parameters
+LOOKUP_BATCH = 500
+# Once over its budget, the cache is trimmed down to this share of it, so it is not trimmed on every write
+EVICT_TO = 0.9
+
+
+class ResultCache:
+    """
+    Cache of the outputs of versioned processing stages, keyed by (stage, stage version, document hash).
+
+    A rerun only misses on the stages whose version changed and on the documents whose text changed; the
+    entries of older versions are never read again and age out. Values are stored zstd-compressed inside
+    the SQLite database itself, since they are small and counted in millions. Once they exceed `max_bytes`,
+    the least recently used ones are evicted. Hits and misses are counted per stage in the database, so the
+    counts of every process sharing the cache add up. The cache is safe to share between threads and between
+    processes.
+    """
+
+    def __init__(self, db_file, max_bytes, compression_level=3):
+        """
+        Args:
+            db_file (str): Path of the SQLite database.
+            max_bytes (int): Size budget of the stored values (compressed), in bytes.
+            compression_level (int): The zstd level of the stored values.
+        """
+        self.max_bytes = max_bytes
+        self.codec = pa.Codec("zstd", compression_level=compression_level)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                stage TEXT, version TEXT, digest TEXT, size INTEGER, stored_size INTEGER, value BLOB,
+                last_access REAL, UNIQUE (stage, version, digest)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+        # Running total of the stored sizes, so writes do not have to sum the whole table
+        self.conn.execute("CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY, stored_bytes INTEGER)")
+        self.conn.execute("INSERT OR IGNORE INTO totals VALUES (0, 0)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS stats (stage TEXT PRIMARY KEY, hits INTEGER, misses INTEGER)")
+        self.conn.commit()
+
+    def get_many(self, stage, version, digests):
+        """
+        Reads the cached outputs of a stage for a batch of documents and marks them as recently used.
+
+        Args:
+            stage (str): The stage name.
+            version (str): The version of the stage (and of the stages it depends on).
+            digests (list of str): The hashes of the documents.
+
+        Returns:
+            dict: The output of every document found in the cache, by hash.
+        """
+        rows = []
+        with self._lock, self.conn:
+            for i in range(0, len(digests), LOOKUP_BATCH):
+                batch = digests[i:i + LOOKUP_BATCH]
+                rows += self.conn.execute(
+                    f"SELECT rowid, digest, size, value FROM results WHERE stage = ? AND version = ? "
+                    f"AND digest IN ({', '.join('?' * len(batch))})",
+                    (stage, version, *batch),
+                ).fetchall()
+            now = time.time()
+            self.conn.executemany("UPDATE results SET last_access = ? WHERE rowid = ?",
+                                  [(now, rowid) for rowid, _, _, _ in rows])
+            self.conn.execute(
+                "INSERT INTO stats VALUES (?, ?, ?) "
+                "ON CONFLICT (stage) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses",
+                (stage, len(rows), len(digests) - len(rows)),
+            )
+        return {digest: self.codec.decompress(value, decompressed_size=size, asbytes=True)
+                for _, digest, size, value in rows}
+
+    def put_many(self, stage, version, values):
+        """
+        Stores the outputs of a stage for a batch of documents, then evicts the least recently used outputs
+        if the cache is over its budget.
+
+        Args:
+            stage (str): The stage name.
+            version (str): The version of the stage (and of the stages it depends on).
+            values (dict): The output of every document (bytes), by hash.
+        """
+        compressed = [(digest, len(value), self.codec.compress(value, asbytes=True))
+                      for digest, value in values.items()]
+        with self._lock, self.conn:
+            now = time.time()
+            added = 0
+            for digest, size, value in compressed:
+                cursor = self.conn.execute("INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                           (stage, version, digest, size, len(value), value, now))
+                if cursor.rowcount:
+                    added += len(value)
+            self.conn.execute("UPDATE totals SET stored_bytes = stored_bytes + ? WHERE id = 0", (added,))
+            self._evict()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT stored_bytes FROM totals WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        removed = 0
+        for rowid, stored_size in self.conn.execute("SELECT rowid, stored_size FROM results ORDER BY last_access"):
+            if total - removed <= self.max_bytes * EVICT_TO:
+                break
+            evicted.append((rowid,))
+            removed += stored_size
+
+        self.conn.executemany("DELETE FROM results WHERE rowid = ?", evicted)
+        self.conn.execute("UPDATE totals SET stored_bytes = stored_bytes - ? WHERE id = 0", (removed,))
+
+    def stats(self):
+        """
+        Returns the hit and miss counts of every stage, across all the processes sharing the cache.
+
+        Returns:
+            dict: (hits, misses) pairs, by stage.
+        """
+        with self._lock:
+            rows = self.conn.execute("SELECT stage, hits, misses FROM stats ORDER BY stage").fetchall()
+        return {stage: (hits, misses) for stage, hits, misses in rows}
+
+    def report(self, since=None):
+        """
+        Formats the hit rate of every stage.
+
+        Args:
+            since (dict, optional): Counts returned by `stats` earlier, to report only the lookups made since.
+
+        Returns:
+            str: One line per stage.
+        """
+        since = since or {}
+        lines = []
+        for stage, (hits, misses) in self.stats().items():
+            hits_before, misses_before = since.get(stage, (0, 0))
+            hits, misses = hits - hits_before, misses - misses_before
+            if hits + misses:
+                lines.append(f"{stage}: {hits}/{hits + misses} hits ({100 * hits / (hits + misses):.1f}%)")
+        return "\n".join(lines)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,109 @@
+import json
+import random
+import sqlite3
+import time
+
+
+class RetryQueue:
+    """
+    Persistent queue of the papers whose download failed, stored in SQLite next to the ID index.
+
+    Transient failures are retried with jittered exponential backoff across runs, up to `max_attempts`
+    attempts; permanent failures (e.g. HTTP 404, not a PDF) are kept as given up so they are not downloaded
+    again. Each entry keeps the pipeline item of the paper, so it can be retried without its metadata.
+    """
+
+    def __init__(self, db_file, max_attempts=6, backoff_base=300.0, backoff_cap=86400.0):
+        """
+        Args:
+            db_file (str): Path of the SQLite database.
+            max_attempts (int): Number of failed attempts after which a paper is given up.
+            backoff_base (float): Delay in seconds before the first retry, doubled on every failure.
+            backoff_cap (float): Maximum delay in seconds between two attempts.
+        """
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.conn = sqlite3.connect(db_file, timeout=60)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS retries (
+                category TEXT, arxiv_id TEXT, item TEXT, url TEXT, attempts INTEGER, next_attempt REAL,
+                last_error TEXT, gave_up INTEGER, PRIMARY KEY (category, arxiv_id)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def queued_ids(self, category):
+        """
+        Returns the arXiv IDs of a category that are in the queue, given up or not.
+        """
+        rows = self.conn.execute("SELECT arxiv_id FROM retries WHERE category = ?", (category,))
+        return {arxiv_id for (arxiv_id,) in rows}
+
+    def record_failure(self, category, item, url, error, retryable):
+        """
+        Records a failed attempt and schedules the next one.
+
+        Args:
+            category (str): The category of the paper.
+            item (tuple): The pipeline item of the paper; its second element is the arXiv ID.
+            url (str): The URL to retry.
+            error (str): The error message.
+            retryable (bool): Whether the failure is transient.
+
+        Returns:
+            float or None: Seconds until the next attempt, or None if the paper was given up.
+        """
+        row = self.conn.execute("SELECT attempts FROM retries WHERE category = ? AND arxiv_id = ?",
+                                (category, item[1])).fetchone()
+        attempts = (row[0] if row else 0) + 1
+
+        delay = None
+        if retryable and attempts < self.max_attempts:
+            delay = min(self.backoff_cap, self.backoff_base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO retries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (category, item[1], json.dumps(item), url, attempts,
+                 time.time() + delay if delay is not None else None, error, int(delay is None)),
+            )
+        return delay
+
+    def due(self, category):
+        """
+        Returns the retries of a category whose next attempt is due, oldest first.
+
+        Args:
+            category (str): The category name.
+
+        Returns:
+            list of tuple: (item, url) pairs, as expected by `download_pdfs`.
+        """
+        rows = self.conn.execute(
+            "SELECT item, url FROM retries WHERE category = ? AND gave_up = 0 AND next_attempt <= ? "
+            "ORDER BY next_attempt",
+            (category, time.time()),
+        ).fetchall()
+        return [(tuple(json.loads(item)), url) for item, url in rows]
+
+    def remove(self, category, arxiv_ids):
+        """
+        Removes papers from the queue once they were ingested.
+        """
+        with self.conn:
+            self.conn.executemany("DELETE FROM retries WHERE category = ? AND arxiv_id = ?",
+                                  [(category, arxiv_id) for arxiv_id in arxiv_ids])
+
+    def counts(self, category):
+        """
+        Returns the number of papers of a category waiting for a retry and given up.
+        """
+        waiting, gave_up = self.conn.execute(
+            "SELECT COALESCE(SUM(1 - gave_up), 0), COALESCE(SUM(gave_up), 0) FROM retries WHERE category = ?",
+            (category,),
+        ).fetchone()
+        return {"retries": waiting, "gave_up": gave_up}
+
+    def close(self):
+        self.conn.close()
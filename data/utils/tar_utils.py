@@ -0,0 +1,54 @@
+import os
+import re
+import tarfile
+
+# PDF names in arXiv's bulk tarballs, e.g. '0901/0901.0001v1.pdf' or '9901/hep-th9901001v1.pdf'
+NEW_STYLE_MEMBER = re.compile(r"^(\d{4}\.\d{4,5})(?:v\d+)?\.pdf$")
+LEGACY_MEMBER = re.compile(r"^([a-z\-]+(?:\.[A-Z]{2})?)(\d{7})(?:v\d+)?\.pdf$")
+
+
+def member_arxiv_id(name):
+    """
+    Extracts the version-less arXiv ID from the name of a PDF in a bulk tarball.
+
+    Args:
+        name (str): The member name, e.g. '0901/0901.0001v1.pdf' or '9901/hep-th9901001v1.pdf'.
+
+    Returns:
+        str or None: The ID in the same form as `normalize_arxiv_id` (e.g. '0901.0001' or 'hep-th/9901001'),
+            or None if the member is not an arXiv PDF.
+    """
+    basename = os.path.basename(name)
+    match = NEW_STYLE_MEMBER.match(basename)
+    if match:
+        return match.group(1)
+    match = LEGACY_MEMBER.match(basename)
+    if match:
+        return f"{match.group(1)}/{match.group(2)}"
+    return None
+
+
+def iter_tar_pdfs(tar_path, wanted=None, max_bytes=None):
+    """
+    Streams the PDFs of a tar archive (optionally compressed) in archive order, reading each one straight
+    into memory without extracting anything to disk.
+
+    Args:
+        tar_path (str): The path of the archive.
+        wanted (callable, optional): Predicate on the arXiv ID; PDFs it rejects are skipped without being read.
+        max_bytes (int, optional): Maximum accepted size of a PDF.
+
+    Yields:
+        tuple: (arxiv_id, pdf_bytes, error). pdf_bytes is None when the PDF was rejected.
+    """
+    with tarfile.open(tar_path, mode="r|*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            arxiv_id = member_arxiv_id(member.name)
+            if arxiv_id is None or (wanted and not wanted(arxiv_id)):
+                continue
+            if max_bytes and member.size > max_bytes:
+                yield arxiv_id, None, f"too large ({member.size} bytes)"
+                continue
+            yield arxiv_id, tar.extractfile(member).read(), None
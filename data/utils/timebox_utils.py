@@ -0,0 +1,131 @@
+import multiprocessing
+import pickle
+import queue
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+# Workers start from a fresh interpreter: the parent has PyMuPDF loaded, which is not safe to use in a forked
+# process
+CONTEXT = multiprocessing.get_context("spawn")
+
+
+def _worker(conn):
+    conn.send(None)
+    while True:
+        try:
+            job = conn.recv_bytes()
+        except EOFError:
+            break
+        try:
+            job = pickle.loads(job)
+            if job is None:
+                break
+            func, args, kwargs = job
+            result = (True, func(*args, **kwargs))
+        except Exception as e:
+            result = (False, f"{type(e).__name__}: {e}")
+        conn.send(result)
+    conn.close()
+
+
+class _Worker:
+    """
+    A worker process of a `TimeboxedPool` and its end of the pipe to it.
+    """
+
+    def __init__(self):
+        self.conn, child_conn = CONTEXT.Pipe()
+        self.process = CONTEXT.Process(target=_worker, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        # Startup does not count towards the timeout of the first task
+        try:
+            self.conn.recv()
+        except EOFError:
+            self.stop()
+            raise RuntimeError(f"worker process died at startup (exit code {self.process.exitcode})")
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        elif self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class TimeboxedPool(Executor):
+    """
+    Process pool whose tasks are killed if they do not finish in time. Every worker is a long-lived process
+    with its own pipe, and is only replaced when its task times out or takes it down, so a stuck or crashing
+    task never affects the others. Workers are started on first use.
+    """
+
+    def __init__(self, max_workers, timeout=60):
+        """
+        Args:
+            max_workers (int): Number of worker processes, i.e. of tasks running at once.
+            timeout (float): Seconds a task is allowed to run.
+        """
+        self.timeout = timeout
+        self._threads = ThreadPoolExecutor(max_workers=max_workers)
+        # Workers waiting for a task, None for the ones not started yet
+        self._idle = queue.SimpleQueue()
+        for _ in range(max_workers):
+            self._idle.put(None)
+        self._workers = set()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        """
+        Schedules a function to run in a worker process. The function, its arguments and its result have to
+        be picklable.
+
+        Returns:
+            concurrent.futures.Future: The result of the function. It raises TimeoutError if the function did
+                not finish in time, and RuntimeError if the function raised an exception or the worker died.
+        """
+        return self._threads.submit(self._run, fn, args, kwargs)
+
+    def _run(self, fn, args, kwargs):
+        worker = self._idle.get()
+        try:
+            if worker is None:
+                worker = _Worker()
+                with self._lock:
+                    self._workers.add(worker)
+            worker.conn.send((fn, args, kwargs))
+            if not worker.conn.poll(self.timeout):
+                self._replace(worker, kill=True)
+                worker = None
+                raise TimeoutError(f"timeout after {self.timeout} s")
+            try:
+                ok, result = worker.conn.recv()
+            except EOFError:
+                self._replace(worker)
+                exitcode, worker = worker.process.exitcode, None
+                raise RuntimeError(f"worker process died (exit code {exitcode})")
+            if not ok:
+                raise RuntimeError(result)
+            return result
+        finally:
+            self._idle.put(worker)
+
+    def _replace(self, worker, kill=False):
+        # The next task of the slot starts a new worker
+        with self._lock:
+            self._workers.discard(worker)
+        worker.stop(kill)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self._threads.shutdown(wait=wait, cancel_futures=cancel_futures)
+        with self._lock:
+            workers, self._workers = self._workers, set()
+        for worker in workers:
+            worker.stop()
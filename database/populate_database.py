@@ -1,9 +1,16 @@
 import os
+import sys
 import pandas as pd
 from utils.connections_utils import get_connection
 from utils.populate_tables_utils import populate_all_tables
 from utils.create_tables_utils import create_all_tables
 
+# The shard layout comes from the data extraction pipeline. Its utils/ merges with the local one, which comes
+# first on the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+
+from utils.parquet_utils import TEXT_DIR
+
 def main():
     """
     Main script to populate the database accordingly.
@@ -19,13 +26,22 @@ def main():
     create_all_tables()
 
     # Step 3: Walk through all subdirectories and process .parquet files
-    for root, _, files in os.walk(data_dir):
+    for root, dirs, files in os.walk(data_dir):
+        # The text shards are joined to their metadata shards below
+        if TEXT_DIR in dirs:
+            dirs.remove(TEXT_DIR)
+
         for filename in files:
             if filename.endswith(".parquet"):
                 parquet_path = os.path.join(root, filename)
                 print(f"📄 Processing {parquet_path}...")
 
                 paper_df = pd.read_parquet(parquet_path)
+
+                # Split layout: the full text lives in a separate shard of the same name
+                text_path = os.path.join(root, TEXT_DIR, filename)
+                if os.path.exists(text_path):
+                    paper_df = paper_df.merge(pd.read_parquet(text_path), on="arxiv_id", how="left")
                 paper_df["dim1"] = None
                 paper_df["dim2"] = None
 
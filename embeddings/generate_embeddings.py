@@ -1,4 +1,5 @@
 import pandas as pd
+import pyarrow.parquet as pq
 import ollama
 import os
 import time
@@ -27,8 +28,7 @@ for file in os.listdir('data'):
     if file.endswith(".parquet") and file.startswith("data."):
         file_path = os.path.join('data', file)
         try:
-            df = pd.read_parquet(file_path, columns=['arxiv_id'])  # lightweight read
-            category_lengths.append((file, len(df)))
+            category_lengths.append((file, pq.ParquetFile(file_path).metadata.num_rows))  # footer only
         except Exception as e:
             print(f"❌ Could not read {file}: {e}")
 
@@ -39,7 +39,7 @@ sorted_category_files = sorted(category_lengths, key=lambda x: x[1])
 for category_file, file_length in sorted_category_files:
     category_file_path = os.path.join('data', category_file)
     print(f"\n🚀 Starting embedding generation for category: {category_file} ({file_length} rows)")
-    category_data = pd.read_parquet(category_file_path)
+    category_data = pd.read_parquet(category_file_path, columns=COLUMNS_TO_EMBED)
 
     for column in COLUMNS_TO_EMBED:
         base_output = f"embeddings.{category_file.replace('.parquet', '')}_{column}"
@@ -51,8 +51,7 @@ for category_file, file_length in sorted_category_files:
         total_done = 0
         for fname in output_files:
             try:
-                df_chunk = pd.read_parquet(os.path.join('embeddings', fname))
-                total_done += len(df_chunk)
+                total_done += pq.ParquetFile(os.path.join('embeddings', fname)).metadata.num_rows
             except Exception as e:
                 print(f"⚠️ Skipping unreadable file {fname}: {e}")
 
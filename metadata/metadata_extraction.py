@@ -1,92 +1,54 @@
-import urllib.request
-import xml.etree.ElementTree as ET
+import argparse
+import asyncio
 import os
-import time
-from datetime import datetime
-import json
-
-# --- Set of already seen paper IDs ---
-seen_papers = set()
-
-
-def save_to_json(papers, filename="papers.json"):
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(papers, f, ensure_ascii=False, indent=2)
-    print(f"✅ Saved {len(papers)} papers to '{filename}'")
-
-
-def download_papers(queries):
-    base_url = "http://export.arxiv.org/api/query"
-
-    for query in queries:
-        papers = []
-        print(f"\n🔍 Starting query: {query}")
-
-        for start in range(0, 20001, 2000):
-            url = f"{base_url}?search_query={query}&start={start}&max_results=2000"
-            print(f"Fetching {query} results {start}–{start+1999}...")
-
-            try:
-                response = urllib.request.urlopen(url)
-                xml_data = response.read().decode('utf-8', errors='replace')
-            except Exception as e:
-                print(f"❌ Failed to fetch data: {e}")
-                continue
-
-            try:
-                root = ET.fromstring(xml_data)
-            except ET.ParseError as e:
-                print(f"❌ Failed to parse XML: {e}")
-                continue
-
-            atom_ns = '{http://www.w3.org/2005/Atom}'
-            arxiv_ns = '{http://arxiv.org/schemas/atom}'
-
-            for entry in root.findall(f'{atom_ns}entry'):
-                paper_id = entry.find(f'{atom_ns}id')
-                if paper_id is None or paper_id.text in seen_papers:
-                    continue
-
-                seen_papers.add(paper_id.text)
-
-                primary_cat = entry.find(f'{arxiv_ns}primary_category')
-                if primary_cat is None:
-                    continue
-
-                category_term = primary_cat.attrib.get('term', '')
-                if category_term != query.split(':')[1]:
-                    continue
-
-                title = entry.find(f'{atom_ns}title').text.strip()
-                authors = [author.find(f'{atom_ns}name').text.strip()
-                           for author in entry.findall(f'{atom_ns}author')]
-                summary = entry.find(f'{atom_ns}summary').text.strip()
-                published_raw = entry.find(f'{atom_ns}published').text.strip()
-                pdf_link = None
-                for link in entry.findall(f'{atom_ns}link'):
-                    if link.attrib.get('title') == 'pdf':
-                        pdf_link = link.attrib['href']
-                        break
-
-                published_year = datetime.strptime(published_raw, '%Y-%m-%dT%H:%M:%SZ').year
-
-                papers.append({
-                    "title": title,
-                    "authors": authors[:10],
-                    "category": category_term,
-                    "published_year": published_year,
-                    "summary": summary,
-                    "pdf_link": pdf_link or ""
-                })
-
-            time.sleep(1)  # Respect API rate limits
-
-        if papers:
-            category_name = query.split(':')[1]
-            filename = f"{category_name}.json"
-            save_to_json(papers, filename)
-        else:
-            print(f"⚠️ No papers found for query '{query}'")
+import sys
+
+# The harvester shares its helpers and configuration with the data extraction pipeline
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+
+from utils.harvest_utils import harvest
+from config import (ARXIV_API_URL, HARVEST_PAGE_SIZE, HARVEST_MAX_START, HARVEST_REQUESTS_PER_SECOND,
+                    HARVEST_CONCURRENT_QUERIES, HARVEST_CONCURRENT_WINDOWS, HARVEST_MAX_RETRIES, HARVEST_BACKOFF_BASE,
+                    HARVEST_TIMEOUT, HARVEST_WINDOW_CAP, HARVEST_START_DATE, HARVEST_OUTPUT_FORMAT,
+                    HARVEST_COALESCE, HARVEST_CACHE_DIR, HARVEST_CACHE_TTL, ID_INDEX_FILE)
+
+
+def download_papers(queries, output_dir=".", base_url=ARXIV_API_URL, delta=False, replay_only=False, end_date=None):
+    """
+    Harvests the given arXiv queries concurrently and writes the metadata of every category.
+    An interrupted harvest resumes from the per-category checkpoints left in `output_dir`.
+
+    Args:
+        queries (list of str): The arXiv search queries (e.g. 'cat:math.GM').
+        output_dir (str): Directory where the metadata is written.
+        base_url (str): The arXiv API endpoint.
+        delta (bool): Whether to only fetch papers published since the last run and append them.
+        replay_only (bool): Whether to serve every page from the response cache, without network access.
+        end_date (str, optional): Upper bound of the harvest (YYYYMMDDHHMM). Defaults to the end of today.
+    """
+    return asyncio.run(harvest(
+        queries,
+        base_url,
+        output_dir=output_dir,
+        requests_per_second=HARVEST_REQUESTS_PER_SECOND,
+        max_concurrent_queries=HARVEST_CONCURRENT_QUERIES,
+        max_concurrent_windows=HARVEST_CONCURRENT_WINDOWS,
+        page_size=HARVEST_PAGE_SIZE,
+        max_start=HARVEST_MAX_START,
+        max_retries=HARVEST_MAX_RETRIES,
+        backoff_base=HARVEST_BACKOFF_BASE,
+        timeout=HARVEST_TIMEOUT,
+        window_cap=HARVEST_WINDOW_CAP,
+        start_date=HARVEST_START_DATE,
+        delta=delta,
+        id_index_file=ID_INDEX_FILE,
+        output_format=HARVEST_OUTPUT_FORMAT,
+        coalesce=HARVEST_COALESCE,
+        cache_dir=os.path.join(output_dir, HARVEST_CACHE_DIR),
+        cache_ttl=HARVEST_CACHE_TTL,
+        replay_only=replay_only,
+        end_date=end_date,
+    ))
 
 
 raw_categories = """
@@ -102,4 +64,14 @@ queries = [f"cat:{cat.strip()}" for cat in raw_categories.split() if cat.strip()
 
 
 if __name__ == "__main__":
-    download_papers(queries)
+    parser = argparse.ArgumentParser(description="Harvest arXiv metadata for every category.")
+    parser.add_argument("--output-dir", default=".", help="Directory where the metadata is written.")
+    parser.add_argument("--delta", action="store_true",
+                        help="Only fetch papers published since the last run and append them to the existing metadata.")
+    parser.add_argument("--replay-only", action="store_true",
+                        help="Serve every page from the response cache, without network access.")
+    parser.add_argument("--end-date", help="Upper bound of the harvest (YYYYMMDDHHMM), to replay an earlier run.")
+    args = parser.parse_args()
+
+    download_papers(queries, output_dir=args.output_dir, delta=args.delta, replay_only=args.replay_only,
+                    end_date=args.end_date)
@@ -0,0 +1,85 @@
+import argparse
+import os
+import sys
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from preprocessing import process_texts, process_array, input_shards
+
+# The original pipeline the engines are checked against is shared with the tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+from reference_preprocessing import EDGE_CASES, preprocessing
+
+
+def two_pass_texts(texts):
+    """
+    The original per-row path: `preprocessing` run twice on every document, with and without references.
+    """
+    columns = {'text_w_ref_w_nums': [], 'text_wo_ref_w_nums': [], 'text_wo_ref_wo_nums': [],
+               'text_wo_ref_wo_nums_wo_short': []}
+    for text in texts:
+        with_references = preprocessing(text, remove_references=False)
+        without_references = preprocessing(text, remove_references=True)
+        columns['text_w_ref_w_nums'].append(with_references['w_nums'])
+        columns['text_wo_ref_w_nums'].append(without_references['w_nums'])
+        columns['text_wo_ref_wo_nums'].append(without_references['wo_nums'])
+        columns['text_wo_ref_wo_nums_wo_short'].append(without_references['wo_nums_wo_short'])
+    return columns
+
+
+def load_texts(input_path, rows):
+    """
+    Reads the first `rows` non-null documents of a Parquet file or directory of shards.
+    """
+    chunks = []
+    count = 0
+    for shard_file in input_shards(input_path):
+        column = pq.read_table(shard_file, columns=["pdf_content"]).column("pdf_content").drop_null()
+        chunks.append(column.slice(0, rows - count))
+        count += len(chunks[-1])
+        if count >= rows:
+            break
+    return pa.chunked_array([chunk for column in chunks for chunk in column.chunks], pa.string()).combine_chunks()
+
+
+def benchmark(input_path, rows=500, repeat=1):
+    texts = pa.concat_arrays([load_texts(input_path, rows), pa.array(EDGE_CASES, pa.string())])
+    texts_list = texts.to_pylist()
+    megabytes = sum(len(text.encode("utf-8")) for text in texts_list) / 1e6
+    print(f"📄 {len(texts_list)} documents, {megabytes:.1f} MB")
+
+    engines = {
+        "two preprocessing() runs per row": lambda: two_pass_texts(texts_list),
+        "process_texts (per row)": lambda: process_texts(texts_list),
+        "process_array (pyarrow.compute)": lambda: {column: values.to_pylist()
+                                                    for column, values in process_array(texts).items()},
+    }
+    # The columnar engine builds its lowercase table once per process
+    process_array(texts.slice(0, 1))
+
+    expected = None
+    baseline = None
+    for name, run in engines.items():
+        seconds = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            columns = run()
+            seconds = min(seconds, time.perf_counter() - start)
+        if expected is None:
+            expected, baseline = columns, seconds
+        status = "✅ same output" if columns == expected else "❌ different output"
+        print(f"{name:36} {seconds:8.2f} s {megabytes / seconds:7.2f} MB/s {baseline / seconds:6.1f}x  {status}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the preprocessing engines on a sample of the corpus.")
+    parser.add_argument("input", nargs="?", default="data.parquet",
+                        help="Parquet file, or directory of shards (its text dataset if it was split).")
+    parser.add_argument("--rows", type=int, default=500, help="Documents in the sample.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of each engine (the best one is kept).")
+    args = parser.parse_args()
+
+    benchmark(args.input, rows=args.rows, repeat=args.repeat)
@@ -1,4 +1,5 @@
 import pandas as pd
+import pyarrow.parquet as pq
 import os
 import re
 from collections import defaultdict
@@ -16,9 +17,9 @@ for file in os.listdir():
         if match:
             category = match.group(1)
             try:
-                df = pd.read_parquet(file)
-                if all(col in df.columns for col in ["arxiv_id", "summary", "title"]):
-                    category_frames[category].append(df[["arxiv_id", "summary", "title"]])
+                # Only the needed columns are read, never the full text
+                if all(col in pq.read_schema(file).names for col in ["arxiv_id", "summary", "title"]):
+                    category_frames[category].append(pd.read_parquet(file, columns=["arxiv_id", "summary", "title"]))
                     print(f"✅ Included: {file} in category {category}")
                 else:
                     print(f"⚠️ Skipping {file}: missing required columns")
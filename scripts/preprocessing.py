@@ -1,195 +1,317 @@
-import re
-import pandas as pd
+import argparse
+import functools
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-# Define a set of meaningful 1- and 2-letter words to keep
-meaningful_short_words = {
-    "a", "an", "am", "as", "at", "be", "by", "do", "go", "he", "hi",
-    "if", "in", "is", "it", "me", "my", "no", "of", "on", "or", "so", "to", "up", "us", "we", ".", "(", ")",
-    "00", "01", "02", "03", "04", "05", "06", "07", "08", "09", "0.", "1.", "2.", "3.", "4.", "5.", "6.", "7.", "8.", "9.", "et", "\n"
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# The variants are produced by the normalizer of the data extraction pipeline
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+
+from utils.normalizer_utils import code_digest, normalize_documents, stage_version
+from utils.result_cache_utils import ResultCache
+from utils.arrow_normalizer_utils import normalize_array
+from utils.parquet_utils import TEXT_DIR, TEXT_COMPRESSION_LEVEL
+
+# Columns added by the preprocessing and the variant of `normalize_variants` each one holds
+PROCESSED_COLUMNS = {
+    'text_w_ref_w_nums': 'w_ref_w_nums',
+    'text_wo_ref_w_nums': 'wo_ref_w_nums',
+    'text_wo_ref_wo_nums': 'wo_ref_wo_nums',
+    'text_wo_ref_wo_nums_wo_short': 'wo_ref_wo_nums_wo_short',
 }
 
-# Add numbers from 0 to 99 and -1 to -9 to the set
-meaningful_short_words.update({str(i) for i in range(100)})  # Add numbers 0 to 99
-meaningful_short_words.update({str(i) for i in range(-1, -10, -1)})  # Add numbers -1 to -9
-
-
-def clean_short_words(text):
-    """
-    Cleans the input text by removing short words (length <= 2), except for a predefined list of meaningful short words, while preserving newlines.
-    """
-    lines = text.split("\n")
-    cleaned_lines = [
-        " ".join([word for word in line.split() if len(word) > 2 or word in meaningful_short_words])
-        for line in lines
-    ]
-    return "\n".join(cleaned_lines)
-
-
+# Rough peak memory of a batch in flight, as a multiple of its Arrow size: the batch itself, its copy in the
+# worker, its texts as Python strings and the four processed columns
+BATCH_MEMORY_FACTOR = 8
 
-def remove_references_section(text):
-    keywords = {
-        "reference", "references",
-        "refrence", "refrences",
-        "bibliography", "bibliographic",
-        "tableofreferences", "listofreferences",
-        "referencescited", "referencesbibliography",
-        "refernece", "referencelist", "literature", 
-        "literaturecited", "workscited", "referencesandnotes",
-        "referencesandbibliography", "bibliographyandreferences",
-        "referencesandlinks"
-    }
+# Engine an output shard was built with and the version of its code, in its Parquet metadata
+ENGINE_KEY = b"preprocessing_engine"
+VERSION_KEY = b"preprocessing_version"
 
-    lines = text.splitlines()
+# Result cache of the current worker process, see `init_worker`
+worker_cache = None
 
-    # Search from bottom up to find the start of references
-    for i in range(len(lines) - 1, -1, -1):
-        cleaned = re.sub(r'[^a-zA-Z]', '', lines[i]).lower()
-        if cleaned in keywords:
-            return "\n".join(lines[:i])
-    
-    for i in range(len(lines) - 1, -1, -1):
-        if re.match(r'^\s*\[\d+\]', lines[i]):  # e.g. [1], [2], etc.
-            return "\n".join(lines[:i])
-
-    for i in range(len(lines) - 1, -1, -1):
-        if "address:" in lines[i].lower():
-            return "\n".join(lines[:i])
-
-    # If no references section is found, return original text
-    return text
 
+def process_texts(texts, cache=None):
+    """
+    Preprocesses a batch of documents into the processed columns. Each document is normalized once for all
+    of its variants (the variants without references are stitched from the normalized body rather than
+    computed by a second run of the original pipeline), and repeated documents are only normalized once.
 
+    Args:
+        texts (iterable of str): The documents. Missing ones (None or NaN) give None in every column.
+        cache (ResultCache, optional): Cache of the stage outputs, see `normalize_documents`.
 
-def join_lines(text):
+    Returns:
+        dict: The values of every column of `PROCESSED_COLUMNS`, in the order of the documents.
     """
-    Joins lines in the input text while handling line breaks caused by hyphens at the end of lines.
-    """
-    lines = text.split("\n")
-    processed_lines = []
-     
-    for i in range(len(lines)):
-        if i > 0 and processed_lines and processed_lines[-1].endswith("-"):
-            # Merge with the previous line, removing the hyphen
-            processed_lines[-1] = processed_lines[-1][:-1] + lines[i].lstrip()
-        else:
-            processed_lines.append(lines[i])
-
-    return "\n".join(processed_lines)
+    texts = list(texts)
+    normalized = iter(normalize_documents([text for text in texts if isinstance(text, str)], "lines",
+                                          PROCESSED_COLUMNS.values(), cache))
+    columns = {column: [] for column in PROCESSED_COLUMNS}
+    missing = dict.fromkeys(PROCESSED_COLUMNS.values())
+    for text in texts:
+        variants = next(normalized) if isinstance(text, str) else missing
+        for column, variant in PROCESSED_COLUMNS.items():
+            columns[column].append(variants[variant])
+    return columns
 
 
-def remove_short_lines(text, min_words=4):
+def process_row(row):
     """
-    Removes lines that contain 3 or fewer words.
+    Preprocesses a single row, see `process_texts`.
     """
-    lines = text.split("\n")
-    return "\n".join([line for line in lines if len(line.split()) >= min_words])
+    return pd.Series({column: values[0] for column, values in process_texts([row['pdf_content']]).items()})
 
 
-def remove_lines_with_numbers(text):
+def process_frame(df):
     """
-    Removes lines that contain only numbers, spaces, or symbols.
+    Adds the processed columns to a DataFrame of papers.
     """
-    lines = text.split("\n")
-    return "\n".join([
-        line for line in lines if not re.fullmatch(r"[0-9. \s\(\)-]+", line)
-    ])
+    return df.join(pd.DataFrame(process_texts(df['pdf_content']), index=df.index))
 
 
-def clean_text(text):
+def process_array(texts):
     """
-    Cleans the text by applying multiple text transformations, such as whitespace cleanup, punctuation handling, and unwanted character removal.
-    """
-    # Remove short words
-    text = clean_short_words(text)
-    
-    # Remove lines with only numbers or symbols
-    text = remove_lines_with_numbers(text)
-    
-    # Remove Remove unnecessary parentheses
-    text = re.sub(r'\([^b-z]*\)', '', text)
-    
-    # Remove extra spaces (but preserve newlines)
-    text = re.sub(r'[ \t]+', ' ', text)
-
-    # Remove multiple periods
-    text = re.sub(r'\.[.\s]*\.', '.', text)
+    Preprocesses an Arrow array of documents into the processed columns with the columnar engine (see
+    `arrow_normalizer_utils`), which gives the same output as `process_texts`.
 
-    # Re-join punctuation
-    text = text.replace('( ', '(').replace(' )', ')').replace(' .', '.')
+    Returns:
+        dict: The array of every column of `PROCESSED_COLUMNS`.
+    """
+    variants = normalize_array(texts, "lines", PROCESSED_COLUMNS.values())
+    return {column: variants[variant] for column, variant in PROCESSED_COLUMNS.items()}
 
-    #  Remove '-' at the beginning or end of words
-    text = re.sub(r'-+\s', ' ', text)
-    text = re.sub(r'\s-+', ' ', text)
 
-    return text
+def process_batch(batch, engine="python"):
+    """
+    Preprocesses a record batch of papers in a worker process.
 
+    Args:
+        batch (pyarrow.RecordBatch): Papers with a 'pdf_content' column.
+        engine (str): "python" for `process_texts` (with the result cache of the worker, if any) or "arrow"
+            for `process_array`.
 
-def preprocessing(text, remove_references):
+    Returns:
+        pyarrow.RecordBatch: The other columns of the batch followed by the processed columns.
     """
-    Main preprocessing function that applies various cleaning steps to the input text.
+    if engine == "arrow":
+        columns = process_array(batch.column("pdf_content"))
+    else:
+        texts = batch.column("pdf_content").to_pylist()
+        columns = {column: pa.array(values, pa.string())
+                   for column, values in process_texts(texts, worker_cache).items()}
+    kept = [name for name in batch.schema.names if name != "pdf_content"]
+    return pa.RecordBatch.from_arrays([batch.column(name) for name in kept] + list(columns.values()),
+                                      names=kept + list(columns))
+
+
+@functools.lru_cache(maxsize=None)
+def engine_version(engine):
     """
+    Builds the version of the code of an engine: the versions of the stages of the normalizer for "python",
+    the digest of the columnar engine for "arrow", e.g. 'normalize_array-f39a31301d3d'.
+    """
+    if engine == "arrow":
+        return f"normalize_array-{code_digest(normalize_array)}"
+    return stage_version("short_lines")
 
-    text = text.lower()
-
-    if remove_references:
-        text = remove_references_section(text)
-   
-
-    # 3. Join lines that end with '-'
-    text = join_lines(text)
-
-    # 4. Split dots and parenthesis
-    text = text.replace('- ', '').replace('(', ' ( ').replace(')', ' ) ')
-    text = re.sub(r'(?<!\d)\.(?!\d|\s)', ' . ', text)  
-    text = re.sub(r'(\w)\.(?=\s)', r'\1 . ', text).replace('e . g .', 'e.g.').replace('i . e .', 'i.e.').replace('al .', 'al.')
-
-    # 5.1. Remove everything except a-z, . ' ( ) : and spaces
-    text_without_numbers = re.sub(r'(?<=\d)\.(?=\d)', '', text) 
-    text_without_numbers = re.sub(r"[^a-z.\-()' \n]", '', text_without_numbers)
-
-    # 5.2. Remove everything except a-z, 0-9 . ' ( ) : and spaces
-    text_with_numbers = re.sub(r"[^a-z0-9.\-()' \n]", '', text)
-
-    # 6. Clean text
-    text_without_numbers = clean_text(text_without_numbers)
-    text_with_numbers = clean_text(text_with_numbers)
-
-
-    # 7. Remove lines with less than 3 words
-    text_without_numbers_short_sentences_removed = remove_short_lines(text_without_numbers)
-    # text_with_numbers_short_sentences_removed = remove_short_lines(text_with_numbers)
-
-
-
-    return {
-        "w_nums": text_with_numbers,
-        "wo_nums": text_without_numbers,
-        "wo_nums_wo_short": text_without_numbers_short_sentences_removed
-    }
-
-
-def process_row(row):
-    original_text = row['pdf_content']
- 
-    pre_no_ref_removal = preprocessing(original_text, remove_references=False)
 
-    # Step 2: With removing references
-    pre_with_ref_removal = preprocessing(original_text, remove_references=True)
+def input_shards(input_path):
+    """
+    Lists the shards to preprocess: a single Parquet file, or every shard of a directory holding the papers'
+    text. The text dataset of a split directory (see `split_text_dataset.py`) is used when there is one.
 
-    return pd.Series({
-        'text_w_ref_w_nums': pre_no_ref_removal['w_nums'],
-        'text_wo_ref_w_nums': pre_with_ref_removal['w_nums'],
-        'text_wo_ref_wo_nums': pre_with_ref_removal['wo_nums'],
-        'text_wo_ref_wo_nums_wo_short': pre_with_ref_removal['wo_nums_wo_short'],
-    })
+    Returns:
+        list of str: The paths of the shards, in order.
+    """
+    if os.path.isfile(input_path):
+        return [input_path]
+    if os.path.isdir(os.path.join(input_path, TEXT_DIR)):
+        input_path = os.path.join(input_path, TEXT_DIR)
+    return [
+        os.path.join(input_path, file) for file in sorted(os.listdir(input_path))
+        if file.endswith(".parquet") and "pdf_content" in pq.read_schema(os.path.join(input_path, file)).names
+    ]
 
-df = pd.read_parquet("data.parquet")
 
-processed_df = df.join(df.apply(process_row, axis=1))
+class ProcessedShardWriter:
+    """
+    Writes the processed batches to one output shard per input shard, under the same name. Batches must
+    arrive in order; a shard is written to a `.tmp` file and only renamed once all of its batches are in,
+    so a finalized output shard is the checkpoint of its input shard. Every shard records the engine it was
+    built with and the version of its code.
+    """
 
+    def __init__(self, output_dir, engine="python"):
+        self.output_dir = output_dir
+        self.engine = engine
+        self.shard_file = None
+        self.writer = None
+        self.rows = 0
+
+    def _output_file(self, shard_file):
+        return os.path.join(self.output_dir, os.path.basename(shard_file))
+
+    def _open(self, shard_file, schema):
+        self.shard_file = shard_file
+        schema = schema.with_metadata({ENGINE_KEY: self.engine, VERSION_KEY: engine_version(self.engine)})
+        self.writer = pq.ParquetWriter(f"{self._output_file(shard_file)}.tmp", schema,
+                                       compression="zstd", compression_level=TEXT_COMPRESSION_LEVEL)
+
+    def write(self, shard_file, batch):
+        if self.writer is None:
+            self._open(shard_file, batch.schema)
+        self.writer.write_batch(batch)
+        self.rows += batch.num_rows
+
+    def finish(self, shard_file, schema):
+        """
+        Finalizes the output shard of an input shard once all of its batches were written.
+
+        Args:
+            shard_file (str): The input shard.
+            schema (pyarrow.Schema): The schema of the output, for input shards without any row.
+        """
+        output_file = self._output_file(shard_file)
+        if self.writer is None:
+            self._open(shard_file, schema)
+        self.writer.close()
+        os.replace(f"{output_file}.tmp", output_file)
+        print(f"✅ Preprocessed {os.path.basename(shard_file)} ({self.rows} papers)")
+        self.shard_file = None
+        self.writer = None
+        self.rows = 0
+
+
+def output_schema(shard_file):
+    schema = pq.read_schema(shard_file)
+    fields = [field for field in schema if field.name != "pdf_content"]
+    return pa.schema(fields + [(column, pa.string()) for column in PROCESSED_COLUMNS])
+
+
+def shard_done(shard_file, output_dir, engine="python"):
+    """
+    Returns whether an input shard was already preprocessed, i.e. its output shard is finalized with as
+    many rows, by the same engine at the current version of its code.
+    """
+    output_file = os.path.join(output_dir, os.path.basename(shard_file))
+    if not os.path.exists(output_file):
+        return False
+    output = pq.ParquetFile(output_file)
+    metadata = output.schema_arrow.metadata or {}
+    return metadata.get(ENGINE_KEY) == engine.encode() \
+        and metadata.get(VERSION_KEY) == engine_version(engine).encode() \
+        and output.metadata.num_rows == pq.ParquetFile(shard_file).metadata.num_rows
 
-processed_df.to_parquet("data.processed.parquet", index=False)
-print("✅ Finished preprocessing and saved to 'data.processed.parquet'")
 
+def init_worker(cache_file, cache_max_bytes):
+    """
+    Initializes a preprocessing worker process with its own connection to the result cache.
+    """
+    global worker_cache
+    if cache_file:
+        worker_cache = ResultCache(cache_file, cache_max_bytes)
 
 
+def preprocess_dataset(input_path, output_dir, workers=None, memory_budget=2 * 1024 ** 3, batch_rows=64,
+                       engine="python", cache_file=None, cache_max_bytes=20 * 1024 ** 3):
+    """
+    Preprocesses a set of shards as a stream: record batches are read from the shards one at a time, fanned
+    out to a process pool, and their results written in order to one output shard per input shard, next to
+    the other columns of the input (the text itself is left out, it stays in its own dataset). The output is
+    a directory of shards rather than the single `data.processed.parquet` of the original script, and for
+    a split input only `arxiv_id` comes along; the metadata is joined back on it (see the README).
+
+    Batches keep being submitted while their estimated memory (see `BATCH_MEMORY_FACTOR`) fits in
+    `memory_budget`; past it, the oldest result is written first. Shards that were already preprocessed by
+    the same engine at the current version of its code are skipped, so an interrupted run resumes from the
+    first unfinished shard.
+    With a result cache, a run after a stage version bump only recomputes that stage and the ones after it.
+
+    Args:
+        input_path (str): A Parquet file or a directory of shards, see `input_shards`.
+        output_dir (str): The directory of the output shards.
+        workers (int, optional): Number of worker processes (one per core if None).
+        memory_budget (int): Memory budget of the batches in flight, in bytes.
+        batch_rows (int): Number of papers per batch.
+        engine (str): "python" or "arrow", see `process_batch`.
+        cache_file (str, optional): SQLite database of the result cache, shared by the workers (python
+            engine only). No cache if None.
+        cache_max_bytes (int): Size budget of the result cache, in bytes.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    shards = input_shards(input_path)
+    todo = [shard_file for shard_file in shards if not shard_done(shard_file, output_dir, engine)]
+    if len(todo) < len(shards):
+        print(f"⏭️ Skipping {len(shards) - len(todo)} shards already preprocessed.")
+
+    writer = ProcessedShardWriter(output_dir, engine)
+    # Batches in flight, in order: (shard, future, estimated memory), with a None future closing each shard
+    pending = deque()
+    in_flight = 0
+
+    def write_oldest():
+        nonlocal in_flight
+        shard_file, future, cost = pending.popleft()
+        if future is None:
+            writer.finish(shard_file, output_schema(shard_file))
+            return
+        writer.write(shard_file, future.result())
+        in_flight -= cost
+
+    cache = ResultCache(cache_file, cache_max_bytes) if cache_file else None
+    cache_stats = cache.stats() if cache else None
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(cache_file, cache_max_bytes)) as pool:
+        for shard_file in todo:
+            source = pq.ParquetFile(shard_file)
+            for batch in source.iter_batches(batch_size=batch_rows):
+                cost = batch.nbytes * BATCH_MEMORY_FACTOR
+                while pending and in_flight + cost > memory_budget:
+                    write_oldest()
+                pending.append((shard_file, pool.submit(process_batch, batch, engine), cost))
+                in_flight += cost
+            pending.append((shard_file, None, 0))
+
+        while pending:
+            write_oldest()
+
+    print(f"✅ Finished preprocessing {len(todo)} shards into '{output_dir}'.")
+    if cache:
+        report = cache.report(cache_stats)
+        if report:
+            print(f"📊 Result cache hit rates:\n{report}")
+        cache.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Preprocess the text of the papers into the training variants.",
+        epilog="The output directory holds one shard per input shard with the input columns (but pdf_content) "
+               "and the variants; for a split input that is only arxiv_id, to join the metadata back on.")
+    parser.add_argument("input", nargs="?", default="data.parquet",
+                        help="Parquet file, or directory of shards (its text dataset if it was split).")
+    parser.add_argument("output_dir", nargs="?", default="data.processed", help="Directory of the output shards (not a single file).")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core).")
+    parser.add_argument("--memory-budget", type=int, default=2048,
+                        help="Memory budget of the batches in flight, in MB.")
+    parser.add_argument("--batch-rows", type=int, default=64, help="Papers per batch.")
+    parser.add_argument("--engine", choices=("python", "arrow"), default="python",
+                        help="Per-document Python normalizer or columnar pyarrow.compute kernels (same output).")
+    parser.add_argument("--cache", default=None,
+                        help="SQLite file of the result cache, so reruns only recompute the changed stages.")
+    parser.add_argument("--cache-max-gb", type=float, default=20, help="Size budget of the result cache, in GB.")
+    args = parser.parse_args()
+    if args.cache and args.engine != "python":
+        parser.error("the result cache is only used by the python engine")
+
+    preprocess_dataset(args.input, args.output_dir, workers=args.workers,
+                       memory_budget=args.memory_budget * 1024 ** 2, batch_rows=args.batch_rows,
+                       engine=args.engine, cache_file=args.cache, cache_max_bytes=int(args.cache_max_gb * 1024 ** 3))
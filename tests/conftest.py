@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The tests import the helpers the way the scripts do, with data/ on the path, and the scripts themselves
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
@@ -0,0 +1,63 @@
+import itertools
+import os
+from types import SimpleNamespace
+
+from utils import blob_cache_utils
+from utils.blob_cache_utils import BlobCache, cache_key
+
+
+def stored_bytes(cache):
+    return cache.conn.execute("SELECT stored_bytes FROM totals").fetchone()[0]
+
+
+def blob_files(cache):
+    return [os.path.join(root, file) for root, _, files in os.walk(cache.cache_dir)
+            for file in files if file.endswith(".zst")]
+
+
+def test_cache_key_only_covers_versioned_downloads():
+    assert cache_key("http://arxiv.org/pdf/2101.01234v2") == "pdf/2101.01234v2"
+    assert cache_key("https://arxiv.org/pdf/2101.01234v2.pdf") == "pdf/2101.01234v2"
+    assert cache_key("https://arxiv.org/e-print/hep-th/9901001v1") == "e-print/hep-th/9901001v1"
+    # Without a version, the URL points to whatever the latest version is
+    assert cache_key("http://arxiv.org/pdf/2101.01234") is None
+    assert cache_key("http://arxiv.org/abs/2101.01234v2") is None
+
+
+def test_least_recently_used_blobs_are_evicted(tmp_path, monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(blob_cache_utils, "time", SimpleNamespace(time=lambda: next(clock)))
+    cache = BlobCache(str(tmp_path), max_bytes=3500)
+    # Random bytes do not compress, so every blob takes about 1000 bytes
+    blobs = {f"pdf/2101.0000{i}v1": os.urandom(1000) for i in range(4)}
+    for key in list(blobs)[:3]:
+        cache.put(key, blobs[key])
+    assert cache.get("pdf/2101.00000v1") == blobs["pdf/2101.00000v1"]
+
+    cache.put("pdf/2101.00003v1", blobs["pdf/2101.00003v1"])
+
+    assert cache.get("pdf/2101.00001v1") is None
+    for key in ("pdf/2101.00000v1", "pdf/2101.00002v1", "pdf/2101.00003v1"):
+        assert cache.get(key) == blobs[key]
+    assert (cache.hits, cache.misses) == (4, 1)
+    assert len(blob_files(cache)) == 3
+    cache.close()
+
+
+def test_the_running_total_follows_the_stored_blobs(tmp_path):
+    cache = BlobCache(str(tmp_path), max_bytes=10 ** 6)
+    cache.put("pdf/2101.00000v1", os.urandom(1000))
+    cache.put("pdf/2101.00001v1", os.urandom(2000))
+    # Replaced, then lost from the disk
+    cache.put("pdf/2101.00000v1", os.urandom(500))
+    os.remove(blob_files(cache)[0])
+    missing = [key for key in ("pdf/2101.00000v1", "pdf/2101.00001v1") if cache.get(key) is None]
+
+    assert len(missing) == 1
+    assert stored_bytes(cache) == sum(os.path.getsize(path) for path in blob_files(cache))
+    assert stored_bytes(cache) == cache.conn.execute("SELECT SUM(stored_size) FROM blobs").fetchone()[0]
+    cache.close()
+    # Kept across runs
+    cache = BlobCache(str(tmp_path), max_bytes=10 ** 6)
+    assert stored_bytes(cache) == sum(os.path.getsize(path) for path in blob_files(cache))
+    cache.close()
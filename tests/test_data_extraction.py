@@ -0,0 +1,69 @@
+import asyncio
+import json
+import os
+import time
+
+import pyarrow.parquet as pq
+import pytest
+
+import data_extraction
+from utils.id_index_utils import IdIndex
+from utils.retry_queue_utils import RetryQueue
+from utils.timebox_utils import TimeboxedPool
+
+
+def extract_or_hang(pdf):
+    """
+    Stands in for the PDF extraction, in the pool workers: hangs on the b"hang" PDF.
+    """
+    if pdf == b"hang":
+        time.sleep(60)
+    return f"Text of {pdf.decode()}", []
+
+
+def paper(arxiv_id):
+    return {"title": f"Paper {arxiv_id}", "authors": ["A. Smith"], "published_year": 2020,
+            "summary": "A summary.", "pdf_link": f"http://arxiv.org/pdf/{arxiv_id}v1"}
+
+
+def test_a_hanging_extraction_is_killed_and_recorded_in_the_manifest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pdfs = {"2001.00001": b"first", "2001.00002": b"hang", "2001.00003": b"third", "2001.00004": b"fourth"}
+    with open("hep-th.json", "w", encoding="utf-8") as f:
+        json.dump([paper(arxiv_id) for arxiv_id in pdfs], f)
+
+    async def download_pdfs(jobs, **settings):
+        for item, url in jobs:
+            yield item, pdfs[item[1]], None
+
+    monkeypatch.setattr(data_extraction, "download_pdfs", download_pdfs)
+    monkeypatch.setattr(data_extraction, "extract_download", extract_or_hang)
+    harvested_ids = IdIndex("index.sqlite", "harvested")
+    ingested_ids = IdIndex("index.sqlite", "ingested")
+    retry_queue = RetryQueue("index.sqlite")
+
+    started = time.monotonic()
+    with TimeboxedPool(2, timeout=3) as extract_pool:
+        manifest = asyncio.run(data_extraction.process_category("hep-th", "hep-th.json", harvested_ids, ingested_ids,
+                                                                retry_queue, extract_pool, 2))
+
+    assert time.monotonic() - started < 30
+    with open("hep-th.manifest.json", encoding="utf-8") as f:
+        assert json.load(f)["failed"] == {"2001.00002": "extract: timeout after 3 s"}
+    # The other papers went through, the ones after the timeout on a new worker
+    assert manifest.processed == {"2001.00001", "2001.00003", "2001.00004"}
+    shard, = [file for file in os.listdir("text") if file.endswith(".parquet")]
+    texts = pq.read_table(os.path.join("text", shard)).column("pdf_content").to_pylist()
+    assert sorted(texts) == ["Text of first", "Text of fourth", "Text of third"]
+    harvested_ids.close()
+    ingested_ids.close()
+    retry_queue.close()
+
+
+def test_the_pool_replaces_workers_that_die():
+    with TimeboxedPool(1, timeout=10) as pool:
+        first = pool.submit(os.getpid).result()
+        assert pool.submit(os.getpid).result() == first
+        with pytest.raises(RuntimeError, match="exit code 1"):
+            pool.submit(os._exit, 1).result()
+        assert pool.submit(os.getpid).result() != first
@@ -0,0 +1,180 @@
+import asyncio
+import os
+from collections import Counter
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils.blob_cache_utils import BlobCache
+from utils.download_utils import download_pdfs, fetch_pdf
+from utils.rate_limit_utils import TokenBucket
+
+PDF = b"%PDF-1.4\n" + b"x" * 1000
+
+
+class StubServer:
+    """
+    Local HTTP server standing in for arxiv.org, with one route per behaviour under test.
+    """
+
+    def __init__(self):
+        self.requests = Counter()
+
+    def server(self):
+        # An application is bound to the event loop that first runs it
+        app = web.Application()
+        app.router.add_get("/pdf/{name}", self.pdf)
+        app.router.add_get("/flaky/{name}", self.flaky)
+        app.router.add_get("/status/{status}", self.status)
+        app.router.add_get("/html", self.html)
+        app.router.add_get("/chunked/{size}", self.chunked)
+        app.router.add_get("/slow/{delay}", self.slow)
+        return TestServer(app)
+
+    async def pdf(self, request):
+        self.requests[request.path] += 1
+        return web.Response(body=PDF, content_type="application/pdf")
+
+    async def flaky(self, request):
+        # Rate limited, then a server error, then the PDF
+        self.requests[request.path] += 1
+        if self.requests[request.path] == 1:
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        if self.requests[request.path] == 2:
+            return web.Response(status=503)
+        return web.Response(body=PDF, content_type="application/pdf")
+
+    async def status(self, request):
+        self.requests[request.path] += 1
+        return web.Response(status=int(request.match_info["status"]))
+
+    async def html(self, request):
+        self.requests[request.path] += 1
+        return web.Response(text="<html>Paper not available</html>", content_type="text/html")
+
+    async def chunked(self, request):
+        # No Content-Length, so the size is only known while reading
+        self.requests[request.path] += 1
+        response = web.StreamResponse(headers={"Content-Type": "application/pdf"})
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        body = PDF[:9] + b"y" * (int(request.match_info["size"]) - 9)
+        for i in range(0, len(body), 4096):
+            await response.write(body[i:i + 4096])
+        await response.write_eof()
+        return response
+
+    async def slow(self, request):
+        self.requests[request.path] += 1
+        await asyncio.sleep(float(request.match_info["delay"]))
+        return web.Response(body=PDF, content_type="application/pdf")
+
+
+def fetch(stub, path, **settings):
+    async def run():
+        async with stub.server() as server, aiohttp.ClientSession() as session:
+            return await fetch_pdf(session, str(server.make_url(path)), TokenBucket(1000), backoff_base=0.01,
+                                   **settings)
+
+    return asyncio.run(run())
+
+
+def test_fetch_pdf_retries_rate_limits_and_server_errors():
+    stub = StubServer()
+
+    content, error = fetch(stub, "/flaky/1")
+
+    assert (content, error) == (PDF, None)
+    assert stub.requests["/flaky/1"] == 3
+
+
+def test_fetch_pdf_gives_up_after_max_retries():
+    stub = StubServer()
+
+    content, error = fetch(stub, "/status/500", max_retries=3)
+
+    assert content is None and error.retryable
+    assert stub.requests["/status/500"] == 3
+
+
+def test_fetch_pdf_does_not_retry_permanent_errors():
+    stub = StubServer()
+
+    content, error = fetch(stub, "/status/404")
+
+    assert content is None and not error.retryable
+    assert stub.requests["/status/404"] == 1
+
+
+def test_fetch_pdf_rejects_other_content_types():
+    stub = StubServer()
+
+    content, error = fetch(stub, "/html")
+
+    assert content is None and not error.retryable and "Content-Type" in str(error)
+    assert stub.requests["/html"] == 1
+    # Without the PDF checks, e.g. for e-print sources, the body is returned as is
+    content, error = fetch(stub, "/html", expect_pdf=False)
+    assert content == b"<html>Paper not available</html>" and error is None
+
+
+def test_fetch_pdf_rejects_downloads_over_the_size_limit(tmp_path):
+    stub = StubServer()
+
+    # Announced by the Content-Length
+    content, error = fetch(stub, "/pdf/1", max_bytes=len(PDF) - 1)
+    assert content is None and not error.retryable and "too large" in str(error)
+    # Only found while streaming, after part of it was spilled to disk
+    content, error = fetch(stub, "/chunked/100000", max_bytes=50000, spill_bytes=10000, spill_dir=str(tmp_path))
+    assert content is None and not error.retryable and "too large" in str(error)
+    assert os.listdir(tmp_path) == []
+
+
+def test_fetch_pdf_spills_large_bodies_to_disk(tmp_path):
+    stub = StubServer()
+
+    content, error = fetch(stub, "/chunked/100000", spill_bytes=10000, spill_dir=str(tmp_path))
+
+    assert error is None and os.path.dirname(content) == str(tmp_path)
+    with open(content, "rb") as f:
+        assert f.read() == PDF[:9] + b"y" * (100000 - 9)
+    # Bodies under the threshold stay in memory
+    content, error = fetch(stub, "/chunked/5000", spill_bytes=10000, spill_dir=str(tmp_path))
+    assert content == PDF[:9] + b"y" * (5000 - 9) and error is None
+
+
+def test_download_pdfs_yields_results_as_they_complete():
+    stub = StubServer()
+
+    async def run():
+        async with stub.server() as server:
+            jobs = [({"id": i}, str(server.make_url(path)))
+                    for i, path in enumerate(["/slow/0.6", "/slow/0.3", "/html"])]
+            return [result async for result in download_pdfs(jobs, max_concurrency=4, requests_per_second=1000,
+                                                              backoff_base=0.01)]
+
+    results = asyncio.run(run())
+
+    assert [item["id"] for item, _, _ in results] == [2, 1, 0]
+    assert [pdf for _, pdf, _ in results] == [None, PDF, PDF]
+    assert [error is None for _, _, error in results] == [False, True, True]
+
+
+def test_download_pdfs_caches_only_versioned_urls(tmp_path):
+    stub = StubServer()
+    cache = BlobCache(str(tmp_path), max_bytes=10 ** 6)
+
+    async def run():
+        async with stub.server() as server:
+            jobs = [(path, str(server.make_url(path))) for path in ["/pdf/2101.00001v1", "/pdf/2101.00002"]]
+            return [result async for result in download_pdfs(jobs, requests_per_second=1000, cache=cache)]
+
+    first, second = asyncio.run(run()), asyncio.run(run())
+
+    assert sorted(pdf for _, pdf, _ in first) == sorted(pdf for _, pdf, _ in second) == [PDF, PDF]
+    # The versioned PDF was served from the cache the second time
+    assert stub.requests == {"/pdf/2101.00001v1": 1, "/pdf/2101.00002": 2}
+    assert cache.conn.execute("SELECT key FROM blobs").fetchall() == [("pdf/2101.00001v1",)]
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import defaultdict
+from xml.sax.saxutils import escape
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils.harvest_utils import harvest, window_query
+
+
+def make_paper(arxiv_id, category, published, authors=1, cross_lists=(), pdf=True):
+    return {
+        "id": f"http://arxiv.org/abs/{arxiv_id}v1",
+        "title": f"  Paper {arxiv_id}\n ",
+        "authors": [f"Author {i}" for i in range(authors)],
+        "summary": f"\n  Summary of {arxiv_id}.\n",
+        "published": published,
+        "category": category,
+        "categories": [category, *cross_lists],
+        "pdf": f"http://arxiv.org/pdf/{arxiv_id}v1" if pdf else None,
+    }
+
+
+def old_format(paper):
+    """
+    The record the original sequential harvester wrote for a paper.
+    """
+    return {
+        "title": paper["title"].strip(),
+        "authors": paper["authors"][:10],
+        "category": paper["category"],
+        "published_year": int(paper["published"][:4]),
+        "summary": paper["summary"].strip(),
+        "pdf_link": paper["pdf"] or "",
+    }
+
+
+def matches(query, paper):
+    """
+    Evaluates an arXiv search query against a paper, with AND binding tighter than OR like the real API.
+    """
+    tokens = re.findall(r"\(|\)|submittedDate:\[\d+ TO \d+\]|[^\s()]+", query)
+    submitted = re.sub(r"\D", "", paper["published"])[:12]
+
+    def term():
+        token = tokens.pop(0)
+        if token == "(":
+            value = disjunction()
+            assert tokens.pop(0) == ")"
+            return value
+        if token.startswith("cat:"):
+            return token[4:] in paper["categories"]
+        window_start, window_end = re.findall(r"\d+", token)
+        return window_start <= submitted <= window_end
+
+    def conjunction():
+        value = term()
+        while tokens and tokens[0] == "AND":
+            tokens.pop(0)
+            value = term() and value
+        return value
+
+    def disjunction():
+        value = conjunction()
+        while tokens and tokens[0] == "OR":
+            tokens.pop(0)
+            value = conjunction() or value
+        return value
+
+    value = disjunction()
+    assert not tokens, f"Unparsed query: {query}"
+    return value
+
+
+def atom_feed(papers, total):
+    entries = []
+    for paper in papers:
+        authors = "".join(f"<author><name>{name}</name></author>" for name in paper["authors"])
+        categories = "".join(f'<category term="{category}"/>' for category in paper["categories"])
+        pdf = f'<link title="pdf" href="{paper["pdf"]}" rel="related"/>' if paper["pdf"] else ""
+        entries.append(
+            f"<entry><id>{paper['id']}</id><published>{paper['published']}</published>"
+            f"<title>{escape(paper['title'])}</title><summary>{escape(paper['summary'])}</summary>{authors}"
+            f'<link href="{paper["id"]}" rel="alternate"/>{pdf}'
+            f'<arxiv:primary_category term="{paper["category"]}"/>{categories}</entry>'
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/" '
+        'xmlns:arxiv="http://arxiv.org/schemas/atom">'
+        f"<opensearch:totalResults>{total}</opensearch:totalResults>{''.join(entries)}</feed>"
+    )
+
+
+class StubArxiv:
+    """
+    Local stand-in for the arXiv API: answers `search_query` / `start` / `max_results` requests with Atom pages.
+
+    The first requests of the first page matching each (query pattern, start) of `failures` get the given
+    error statuses instead. Pages carry an ETag, and unchanged pages are answered 304 to conditional requests.
+    """
+
+    def __init__(self, papers, failures=None):
+        self.papers = sorted(papers, key=lambda paper: paper["published"])
+        self.failures = {key: list(statuses) for key, statuses in (failures or {}).items()}
+        self.requests = defaultdict(list)
+        self.not_modified = 0
+
+    async def handle(self, request):
+        query = request.query["search_query"]
+        start = int(request.query["start"])
+        max_results = int(request.query["max_results"])
+        self.requests[query, start, max_results].append(time.monotonic())
+
+        for (failing_query, failing_start), statuses in list(self.failures.items()):
+            if start == failing_start and re.fullmatch(failing_query, query):
+                # Only the first matching page fails
+                del self.failures[failing_query, failing_start]
+                self.failures[query, start] = statuses
+        statuses = self.failures.get((query, start))
+        if statuses:
+            return web.Response(status=statuses.pop(0))
+
+        found = [paper for paper in self.papers if matches(query, paper)]
+        feed = atom_feed(found[start:start + max_results], len(found))
+        etag = f'"{hashlib.sha256(feed.encode("utf-8")).hexdigest()[:16]}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=feed, content_type="application/atom+xml", headers={"ETag": etag})
+
+    async def harvest(self, queries, output_dir, **settings):
+        app = web.Application()
+        app.router.add_get("/api/query", self.handle)
+        async with TestServer(app) as server:
+            return await harvest(queries, str(server.make_url("/api/query")), output_dir=str(output_dir),
+                                 requests_per_second=1000, start_date="202001010000", end_date="202012312359",
+                                 output_format="json", **settings)
+
+
+def test_window_query_restricts_every_category():
+    query = window_query("cat:cs.GL OR cat:q-bio.OT", "202001010000", "202006302359")
+
+    assert query == "(cat:cs.GL OR cat:q-bio.OT) AND submittedDate:[202001010000 TO 202006302359]"
+    assert not matches(query, make_paper("2009.00001", "cs.GL", "2020-09-01T00:00:00Z"))
+
+
+def test_harvest_pages_retries_and_writes_old_json(tmp_path):
+    papers = [make_paper(f"2001.{i:05d}", "hep-th", f"2020-{i:02d}-15T12:00:00Z", authors=i + 6)
+              for i in range(1, 8)]
+    papers.append(make_paper("2008.00001", "hep-th", "2020-08-01T00:00:00Z", pdf=False))
+    # Cross-listed to hep-th, but published under another category
+    papers.append(make_paper("2002.00001", "math.GM", "2020-02-01T00:00:00Z", cross_lists=["hep-th"]))
+    stub = StubArxiv(papers, failures={(r"\(cat:hep-th\) AND .*", 2): [503, 429]})
+
+    counts = asyncio.run(stub.harvest(["cat:hep-th", "cat:math.GM"], tmp_path, page_size=2, window_cap=5,
+                                      max_retries=3, backoff_base=0.05, coalesce=False))
+
+    assert counts == {"hep-th": 8, "math.GM": 1}
+    expected = [old_format(paper) for paper in stub.papers if paper["category"] == "hep-th"]
+    with open(tmp_path / "hep-th.json", encoding="utf-8") as f:
+        assert f.read() == json.dumps(expected, ensure_ascii=False, indent=2)
+    # The cross-listed paper is only kept under its primary category
+    with open(tmp_path / "math.GM.json", encoding="utf-8") as f:
+        assert [paper["category"] for paper in json.load(f)] == ["math.GM"]
+
+    # Every window was fetched two results at a time, up to its last page
+    windows = defaultdict(set)
+    for query, start, max_results in stub.requests:
+        if max_results == 2:
+            windows[query].add(start)
+    assert len(windows) > 1 and any(len(starts) > 1 for starts in windows.values())
+    for query, starts in windows.items():
+        found = sum(matches(query, paper) for paper in stub.papers)
+        assert starts == set(range(0, max(found, 1), 2))
+    # The failing page was retried after a growing, jittered backoff
+    retried = [times for times in stub.requests.values() if len(times) > 1]
+    assert len(retried) == 1 and len(retried[0]) == 3
+    first_delay, second_delay = retried[0][1] - retried[0][0], retried[0][2] - retried[0][1]
+    assert first_delay >= 0.05 * 0.5 and second_delay >= 0.05 * 2 * 0.5
+
+
+def test_harvest_coalesced_group_windows_every_category(tmp_path):
+    papers = [
+        make_paper("2002.00001", "cs.GL", "2020-02-10T00:00:00Z"),
+        make_paper("2003.00001", "q-bio.OT", "2020-03-10T00:00:00Z"),
+        make_paper("2010.00001", "q-bio.OT", "2020-10-10T00:00:00Z"),
+    ]
+    stub = StubArxiv(papers)
+
+    counts = asyncio.run(stub.harvest(["cat:cs.GL", "cat:q-bio.OT"], tmp_path, page_size=3, window_cap=2))
+
+    assert counts == {"cs.GL": 1, "q-bio.OT": 2}
+    # One query for both categories, split into several windows
+    windows = {query for query, _, max_results in stub.requests if max_results == 3}
+    assert len(windows) > 1 and all(query.startswith("(cat:cs.GL OR cat:q-bio.OT) AND") for query in windows)
+    for category in ("cs.GL", "q-bio.OT"):
+        with open(tmp_path / f"{category}.json", encoding="utf-8") as f:
+            assert json.load(f) == [old_format(paper) for paper in papers if paper["category"] == category]
+
+
+def test_harvest_serves_fresh_pages_from_the_cache_and_revalidates_stale_ones(tmp_path, capsys):
+    papers = [make_paper(f"2001.{i:05d}", "hep-th", f"2020-{i:02d}-15T12:00:00Z") for i in range(1, 6)]
+    stub = StubArxiv(papers)
+    runs = [{}, {}, {"cache_ttl": 0}, {"queries": ["cat:math.GM"], "replay_only": True}]
+
+    async def harvest_runs():
+        # Cache entries are keyed by the full URL, so every run goes to the same server
+        app = web.Application()
+        app.router.add_get("/api/query", stub.handle)
+        results = []
+        async with TestServer(app) as server:
+            for settings in runs:
+                settings = dict(settings)
+                capsys.readouterr()
+                counts = await harvest(settings.pop("queries", ["cat:hep-th"]), str(server.make_url("/api/query")),
+                                       output_dir=str(tmp_path / "metadata"), requests_per_second=1000,
+                                       start_date="202001010000", end_date="202012312359", output_format="json",
+                                       page_size=2, coalesce=False, cache_dir=str(tmp_path / "cache"), **settings)
+                report = re.search(r"Response cache: (.*)", capsys.readouterr().out).group(1)
+                results.append((counts, report, sum(len(times) for times in stub.requests.values())))
+                if len(results) == 1:
+                    with open(tmp_path / "metadata" / "hep-th.json", encoding="utf-8") as f:
+                        expected = f.read()
+        with open(tmp_path / "metadata" / "hep-th.json", encoding="utf-8") as f:
+            assert f.read() == expected
+        return results
+
+    first, fresh, stale, replay = asyncio.run(harvest_runs())
+    fetched = first[2]
+    assert first == ({"hep-th": 5}, f"0 hits, 0 revalidated, {fetched} misses", fetched)
+    # Within the TTL, no request reaches the server
+    assert fresh == ({"hep-th": 5}, f"{fetched} hits, 0 revalidated, 0 misses", fetched)
+    # Past it, every page is revalidated and served from the cache
+    assert stale == ({"hep-th": 5}, f"0 hits, {fetched} revalidated, 0 misses", 2 * fetched)
+    assert stub.not_modified == fetched
+    # A replay of an uncached query never goes to the network
+    assert replay == ({"math.GM": None}, "0 hits, 0 revalidated, 1 misses", 2 * fetched)
+    assert not (tmp_path / "metadata" / "math.GM.json").exists()
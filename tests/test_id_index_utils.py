@@ -0,0 +1,51 @@
+import pytest
+
+from utils.id_index_utils import IdIndex, normalize_arxiv_id
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("http://arxiv.org/abs/2101.01234v2", "2101.01234"),
+    ("http://arxiv.org/pdf/2101.01234v12", "2101.01234"),
+    ("0704.0001", "0704.0001"),
+    ("http://arxiv.org/abs/0704.0001v1", "0704.0001"),
+    ("http://arxiv.org/pdf/hep-th/9901001v1", "hep-th/9901001"),
+    ("hep-th/9901001", "hep-th/9901001"),
+    ("http://arxiv.org/abs/math.GT/0309136v3", "math.GT/0309136"),
+    ("http://arxiv.org/abs/cond-mat/0102536v2", "cond-mat/0102536"),
+    ("http://arxiv.org/abs/", None),
+    ("", None),
+    (None, None),
+])
+def test_normalize_arxiv_id(value, expected):
+    assert normalize_arxiv_id(value) == expected
+
+
+def test_id_index_confirms_bloom_positives_against_sqlite(tmp_path):
+    index = IdIndex(str(tmp_path / "index.db"), "harvested", capacity=100)
+    index.add_many(["2101.01234", "hep-th/9901001"], "hep-th")
+    # Every ID now passes the filter, so only SQLite can tell them apart
+    index.bloom.bits = bytearray(b"\xff" * len(index.bloom.bits))
+    assert "2101.99999" in index.bloom
+
+    assert index.get("2101.01234") == "hep-th"
+    assert index.get("2101.99999") is None
+    assert "2101.99999" not in index
+    index.close()
+
+
+def test_id_index_persists_and_grows_its_filter(tmp_path):
+    db_file = str(tmp_path / "index.db")
+    index = IdIndex(db_file, "harvested", capacity=10)
+    index.add_many([f"2101.{i:05d}" for i in range(25)], "math.GM")
+    assert index.bloom.capacity == 50
+    index.close()
+
+    index = IdIndex(db_file, "harvested", capacity=10)
+    assert index.count == 25
+    assert all(f"2101.{i:05d}" in index for i in range(25))
+    assert index.get("2101.00025") is None
+    # Tables of the same database are independent
+    other = IdIndex(db_file, "ingested")
+    assert "2101.00000" not in other
+    other.close()
+    index.close()
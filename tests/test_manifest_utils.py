@@ -0,0 +1,64 @@
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.id_index_utils import IdIndex
+from utils.manifest_utils import CategoryWriter, IngestManifest
+from utils.parquet_utils import PAPERS_SCHEMA
+
+
+def make_papers(ids):
+    return [{"arxiv_id": arxiv_id, "title": f"Paper {arxiv_id}", "authors": "A. Smith", "year": 2020,
+             "category": "hep-th", "summary": "A summary.", "pdf_content": f"Text of {arxiv_id}"}
+            for arxiv_id in ids]
+
+
+def test_ingest_manifest_bootstraps_from_legacy_shards(tmp_path):
+    # Full-schema shards written before manifests existed
+    shard_files = []
+    for n, ids in enumerate([["2001.00003", "2001.00001"], ["hep-th/9901001"]], start=1):
+        shard_files.append(str(tmp_path / f"hep-th_{n}.parquet"))
+        pq.write_table(pa.Table.from_pylist(make_papers(ids), schema=PAPERS_SCHEMA), shard_files[-1])
+    manifest_file = str(tmp_path / "hep-th.manifest.json")
+
+    manifest = IngestManifest(manifest_file, "hep-th", shard_files)
+    assert manifest.processed == {"2001.00001", "2001.00003", "hep-th/9901001"}
+    assert manifest.shards == [{"file": "hep-th_1.parquet", "rows": 2, "bytes": os.path.getsize(shard_files[0])},
+                               {"file": "hep-th_2.parquet", "rows": 1, "bytes": os.path.getsize(shard_files[1])}]
+    with open(manifest_file, encoding="utf-8") as f:
+        assert json.load(f)["processed"] == ["2001.00001", "2001.00003", "hep-th/9901001"]
+
+    # Once saved, the manifest is read back instead of the shards
+    os.remove(shard_files[1])
+    manifest = IngestManifest(manifest_file, "hep-th", shard_files[:1])
+    assert "hep-th/9901001" in manifest
+    assert len(manifest.shards) == 2
+
+
+def test_category_writer_resumes_by_set_membership(tmp_path):
+    output_dir = str(tmp_path)
+    ingested = IdIndex(str(tmp_path / "index.db"), "ingested")
+    writer = CategoryWriter("hep-th", ingested, max_rows=2, output_dir=output_dir)
+    writer.fail("2001.00005", "download: HTTP 404")
+    # Processed out of order, e.g. by concurrent workers
+    for ids in (["2001.00007", "2001.00002"], ["2001.00005"]):
+        writer.written([(arxiv_id, arxiv_id) for arxiv_id in ids], writer.write(make_papers(ids)))
+    # Interrupted before the second shard was finalized
+
+    writer = CategoryWriter("hep-th", ingested, max_rows=2, output_dir=output_dir)
+    manifest = writer.manifest
+    assert manifest.processed == {"2001.00002", "2001.00007"}
+    assert manifest.failed == {"2001.00005": "download: HTTP 404"}
+    assert [arxiv_id for arxiv_id in ["2001.00002", "2001.00005", "2001.00007"] if arxiv_id not in manifest] \
+        == ["2001.00005"]
+
+    writer.written([("2001.00005", "2001.00005")], writer.write(make_papers(["2001.00005"])))
+    writer.close()
+    manifest = IngestManifest(str(tmp_path / "hep-th.manifest.json"), "hep-th")
+    assert manifest.processed == {"2001.00002", "2001.00005", "2001.00007"}
+    assert manifest.failed == {}
+    assert [shard["file"] for shard in manifest.shards] == ["hep-th_1.parquet", "hep-th_2.parquet"]
+    assert ingested.get("2001.00005") == "hep-th"
+    ingested.close()
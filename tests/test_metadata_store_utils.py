@@ -0,0 +1,50 @@
+import os
+
+from utils.metadata_store_utils import ParquetRecordWriter, count_metadata_records, publish_shards, \
+    iter_metadata_batches
+
+
+def write_part(parts_dir, name, titles):
+    writer = ParquetRecordWriter(str(parts_dir / name))
+    for title in titles:
+        writer.write({"title": title, "authors": ["A. Smith"], "category": "hep-th", "published_year": 2024,
+                      "summary": "A summary.", "pdf_link": None})
+    writer.close()
+    return str(parts_dir / name)
+
+
+def test_publish_shards_appends_the_same_window_twice_without_overwriting(tmp_path):
+    category_dir = str(tmp_path / "hep-th")
+    parts_dir = tmp_path / "hep-th.parts"
+    parts_dir.mkdir()
+    name = "202401010000-202401012359.parquet"
+
+    publish_shards([write_part(parts_dir, "202312010000-202312312359.parquet", ["a", "b"])], category_dir)
+    # Two delta harvests on the same day cover the same window
+    publish_shards([write_part(parts_dir, name, ["c"])], category_dir, append=True)
+    publish_shards([write_part(parts_dir, name, ["d", "e"])], category_dir, append=True)
+
+    assert sorted(os.listdir(category_dir)) == ["part-202312010000-202312312359.parquet",
+                                                "part-202401010000-202401012359-1.parquet",
+                                                "part-202401010000-202401012359.parquet"]
+    assert os.listdir(parts_dir) == []
+    assert count_metadata_records(category_dir) == 5
+    titles = [title for batch in iter_metadata_batches(category_dir, columns=["title"])
+              for title in batch.column("title").to_pylist()]
+    assert sorted(titles) == ["a", "b", "c", "d", "e"]
+
+
+def test_publish_shards_replaces_the_category_and_a_leftover_new_directory(tmp_path):
+    category_dir = str(tmp_path / "hep-th")
+    parts_dir = tmp_path / "hep-th.parts"
+    parts_dir.mkdir()
+    publish_shards([write_part(parts_dir, "1.parquet", ["a"])], category_dir)
+    # Left over by a publish interrupted before the swap
+    os.makedirs(f"{category_dir}.new")
+    write_part(tmp_path / "hep-th.new", "part-stale.parquet", ["stale"])
+
+    publish_shards([write_part(parts_dir, "2.parquet", ["b", "c"])], category_dir)
+
+    assert os.listdir(category_dir) == ["part-2.parquet"]
+    assert count_metadata_records(category_dir) == 2
+    assert sorted(os.listdir(tmp_path)) == ["hep-th", "hep-th.parts"]
@@ -0,0 +1,81 @@
+import pytest
+
+from utils import normalizer_utils
+from utils.normalizer_utils import FLAVORS, VARIANTS, normalize_variants, prepare_document
+
+from reference_preprocessing import EDGE_CASES, flat_preprocessing, load_corpus, preprocessing, remove_short_lines
+
+# Documents whose body cannot be stitched to its end: every line the body could be split at ends with a
+# pattern reaching into the next line ('(', '.', '-', '--')
+UNSAFE_STITCHES = [
+    "A figure of the results (\n" * 5 + "The last line of the body\nReferences\n[1] A. Smith, A paper (2020).",
+    "The body ends with a dot.\n" * 5 + "The last line of the body\nReferences\n[1] A. Smith, A paper.",
+    "A word split over two lines by a hyphen -\n" * 5 + "The last line of the body\nReferences\n[1] A. Smith.",
+    "Dashes at the end of the line --\n" * 5 + "-- and dashes at the start\nReferences\n[1] A. Smith.",
+]
+
+
+def reference_variants(text, flavor):
+    """
+    Runs the original pipeline of a flavor with and without the references, into every variant.
+    """
+    variants = {}
+    for ref, remove_references in (("w", False), ("wo", True)):
+        if flavor == "lines":
+            output = preprocessing(text, remove_references)
+            w_nums, wo_nums = output["w_nums"], output["wo_nums"]
+            variants.update({
+                f"{ref}_ref_w_nums": w_nums,
+                f"{ref}_ref_wo_nums": wo_nums,
+                f"{ref}_ref_w_nums_wo_short": remove_short_lines(w_nums),
+                f"{ref}_ref_wo_nums_wo_short": output["wo_nums_wo_short"],
+            })
+        else:
+            wo_nums, w_nums, wo_nums_wo_short, w_nums_wo_short = flat_preprocessing(text, remove_references)
+            variants.update({
+                f"{ref}_ref_w_nums": w_nums,
+                f"{ref}_ref_wo_nums": wo_nums,
+                f"{ref}_ref_w_nums_wo_short": w_nums_wo_short,
+                f"{ref}_ref_wo_nums_wo_short": wo_nums_wo_short,
+            })
+    return variants
+
+
+@pytest.mark.parametrize("flavor", FLAVORS)
+def test_normalize_variants_matches_the_original_pipelines(flavor):
+    for text in load_corpus() + EDGE_CASES + UNSAFE_STITCHES:
+        assert normalize_variants(text, flavor) == reference_variants(text, flavor)
+
+
+@pytest.mark.parametrize("flavor", FLAVORS)
+def test_normalize_variants_produces_only_the_requested_variants(flavor):
+    text = load_corpus()[0]
+    expected = reference_variants(text, flavor)
+
+    for variant in VARIANTS:
+        assert normalize_variants(text, flavor, [variant]) == {variant: expected[variant]}
+    with pytest.raises(ValueError):
+        normalize_variants(text, flavor, ["w_ref"])
+
+
+def test_the_body_is_stitched_to_its_end_in_the_lines_flavor():
+    corpus = load_corpus()
+
+    assert all(prepare_document(text)["stitches"] for text in corpus)
+    assert not any(prepare_document(text, "flat")["stitches"] for text in corpus)
+
+
+def test_unsafe_stitches_fall_back_to_the_whole_document(monkeypatch):
+    # The cleaning of a whole document is only used when a stitch does not hold
+    calls = []
+    clean = normalizer_utils.clean
+    monkeypatch.setattr(normalizer_utils, "clean", lambda text, flat: calls.append(text) or clean(text, flat))
+
+    for text in UNSAFE_STITCHES:
+        calls.clear()
+        assert normalize_variants(text) == reference_variants(text, "lines")
+        # Both parts, in both character branches
+        assert len(calls) == 4
+    calls.clear()
+    normalize_variants(load_corpus()[0])
+    assert calls == []
@@ -0,0 +1,77 @@
+import os
+
+import pyarrow.parquet as pq
+
+from utils.parquet_utils import TEXT_DIR, ParquetShardWriter, SplitShardWriter, list_shards
+
+
+def make_papers(start, count):
+    return [{"arxiv_id": f"2001.{i:05d}", "title": f"Paper {i}", "authors": "A. Smith", "year": 2020,
+             "category": "hep-th", "summary": "A summary.", "pdf_content": f"Text of paper {i}"}
+            for i in range(start, start + count)]
+
+
+def read_ids(shard_file):
+    return pq.read_table(shard_file, columns=["arxiv_id"]).column("arxiv_id").to_pylist()
+
+
+def test_split_shard_writer_drops_the_text_shard_of_an_interrupted_pair(tmp_path):
+    writer = SplitShardWriter("hep-th", str(tmp_path), max_rows=2)
+    assert writer.write(make_papers(0, 2)) == {"file": "hep-th_1.parquet", "rows": 2,
+                                               "bytes": os.path.getsize(tmp_path / "hep-th_1.parquet")
+                                               + os.path.getsize(tmp_path / TEXT_DIR / "hep-th_1.parquet")}
+    # Interrupted while finalizing the second pair, between the text and the metadata shard
+    writer.write(make_papers(2, 1))
+    writer.text.close()
+    writer.metadata._writer.close()
+    writer.metadata._sink.close()
+    assert sorted(os.listdir(tmp_path / TEXT_DIR)) == ["hep-th_1.parquet", "hep-th_2.parquet"]
+
+    writer = SplitShardWriter("hep-th", str(tmp_path), max_rows=2)
+    assert sorted(os.listdir(tmp_path)) == ["hep-th_1.parquet", TEXT_DIR]
+    assert os.listdir(tmp_path / TEXT_DIR) == ["hep-th_1.parquet"]
+    writer.write(make_papers(2, 1))
+    assert writer.close()["file"] == "hep-th_2.parquet"
+
+    for shard in ("hep-th_1.parquet", "hep-th_2.parquet"):
+        assert read_ids(tmp_path / shard) == read_ids(tmp_path / TEXT_DIR / shard)
+    assert read_ids(tmp_path / TEXT_DIR / "hep-th_2.parquet") == ["2001.00002"]
+
+
+def test_parquet_shard_writer_rolls_over_by_rows(tmp_path):
+    writer = ParquetShardWriter("hep-th", str(tmp_path), max_rows=3, verbose=False)
+    assert writer.write(make_papers(0, 2)) is None
+    assert os.listdir(tmp_path) == ["hep-th_1.parquet.tmp"]
+    shard = writer.write(make_papers(2, 2))
+    assert shard == {"file": "hep-th_1.parquet", "rows": 4, "bytes": os.path.getsize(tmp_path / "hep-th_1.parquet")}
+    assert writer.write(make_papers(4, 1)) is None
+    assert writer.close()["file"] == "hep-th_2.parquet"
+    assert writer.close() is None
+
+    assert sorted(os.listdir(tmp_path)) == ["hep-th_1.parquet", "hep-th_2.parquet"]
+    assert pq.ParquetFile(tmp_path / "hep-th_1.parquet").num_row_groups == 2
+    assert read_ids(tmp_path / "hep-th_2.parquet") == ["2001.00004"]
+
+
+def test_parquet_shard_writer_rolls_over_by_bytes(tmp_path):
+    writer = ParquetShardWriter("hep-th", str(tmp_path), max_bytes=1, verbose=False)
+    assert writer.write(make_papers(0, 1))["file"] == "hep-th_1.parquet"
+    assert writer.write(make_papers(1, 1))["file"] == "hep-th_2.parquet"
+    assert writer.close() is None
+    assert list_shards("hep-th", str(tmp_path)) == [str(tmp_path / "hep-th_1.parquet"),
+                                                     str(tmp_path / "hep-th_2.parquet")]
+
+
+def test_parquet_shard_writer_drops_unfinished_shards_on_reopen(tmp_path):
+    writer = ParquetShardWriter("hep-th", str(tmp_path), max_rows=2, verbose=False)
+    writer.write(make_papers(0, 2))
+    # Interrupted with the second shard still open
+    writer.write(make_papers(2, 1))
+    assert sorted(os.listdir(tmp_path)) == ["hep-th_1.parquet", "hep-th_2.parquet.tmp"]
+
+    writer = ParquetShardWriter("hep-th", str(tmp_path), max_rows=2, verbose=False)
+    assert os.listdir(tmp_path) == ["hep-th_1.parquet"]
+    writer.write(make_papers(2, 1))
+    assert writer.close()["file"] == "hep-th_2.parquet"
+    assert read_ids(tmp_path / "hep-th_1.parquet") == ["2001.00000", "2001.00001"]
+    assert read_ids(tmp_path / "hep-th_2.parquet") == ["2001.00002"]
@@ -0,0 +1,34 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas.testing import assert_frame_equal
+
+from preprocessing import engine_version, preprocess_dataset, process_frame, shard_done
+from utils import arrow_normalizer_utils
+from reference_preprocessing import EDGE_CASES, load_corpus, process_row
+
+
+def test_process_frame_matches_the_original_process_row():
+    texts = load_corpus() + EDGE_CASES
+    df = pd.DataFrame({"id": range(len(texts)), "pdf_content": texts}, index=range(100, 100 + len(texts)))
+
+    assert_frame_equal(process_frame(df), df.join(df.apply(process_row, axis=1)))
+
+
+def test_shards_are_preprocessed_again_by_another_engine_or_version(tmp_path, monkeypatch):
+    texts = load_corpus()[:3]
+    input_dir, output_dir = tmp_path / "input", tmp_path / "output"
+    input_dir.mkdir()
+    pq.write_table(pa.table({"arxiv_id": ["1", "2", "3"], "pdf_content": texts}), input_dir / "part-0.parquet")
+    shard_file = str(input_dir / "part-0.parquet")
+
+    preprocess_dataset(str(input_dir), str(output_dir), workers=1, engine="arrow")
+
+    assert shard_done(shard_file, str(output_dir), "arrow")
+    assert not shard_done(shard_file, str(output_dir), "python")
+    # An edit to the code of the engine, even in one of its helpers
+    join_lines = arrow_normalizer_utils.join_lines
+    monkeypatch.setattr(arrow_normalizer_utils, "join_lines", lambda texts: join_lines(texts))
+    engine_version.cache_clear()
+    assert not shard_done(shard_file, str(output_dir), "arrow")
+    engine_version.cache_clear()
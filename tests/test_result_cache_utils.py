@@ -0,0 +1,165 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from utils import normalizer_utils, result_cache_utils
+from utils.normalizer_utils import normalize_documents, stage_version
+from utils.result_cache_utils import EVICT_TO, ResultCache
+
+from reference_preprocessing import load_corpus
+
+VARIANTS = ["w_ref_w_nums", "wo_ref_w_nums", "wo_ref_wo_nums", "wo_ref_wo_nums_wo_short"]
+
+
+@pytest.fixture
+def counted_stages(monkeypatch):
+    """
+    Counts the calls to the function of every stage, without changing the code the stage versions are
+    derived from.
+    """
+    calls = {stage: 0 for stage in normalizer_utils.STAGES}
+
+    def counting(stage, func):
+        def wrapper(*args, **kwargs):
+            calls[stage] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    for stage, func in normalizer_utils.STAGES.items():
+        monkeypatch.setattr(normalizer_utils, func.__name__, counting(stage, func))
+    return calls
+
+
+def change_stage(monkeypatch, stage):
+    """
+    Gives a stage new code, as an edit to it would, and with it a new version.
+    """
+    func = normalizer_utils.STAGES[stage]
+
+    def changed(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    monkeypatch.setitem(normalizer_utils.STAGES, stage, changed)
+    stage_version.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_stage_versions():
+    stage_version.cache_clear()
+    yield
+    stage_version.cache_clear()
+
+
+def lookups(cache, since):
+    """
+    The (hits, misses) of every stage since earlier stats, leaving out the stages not looked up.
+    """
+    counts = {}
+    for stage, (hits, misses) in cache.stats().items():
+        hits_before, misses_before = since.get(stage, (0, 0))
+        if (hits - hits_before, misses - misses_before) != (0, 0):
+            counts[stage] = (hits - hits_before, misses - misses_before)
+    return counts
+
+
+def test_a_changed_stage_recomputes_only_itself_and_the_stages_after_it(tmp_path, monkeypatch, counted_stages):
+    texts = load_corpus()[:4]
+    cache = ResultCache(str(tmp_path / "cache.sqlite"), max_bytes=10 ** 8)
+    expected = normalize_documents(texts, variants=VARIANTS)
+    assert counted_stages == {"prepare": 4, "clean": 4, "short_lines": 4}
+
+    assert normalize_documents(texts, variants=VARIANTS, cache=cache) == expected
+    assert lookups(cache, {}) == {
+        "lines/prepare": (0, 4),
+        "lines/w_ref_w_nums": (0, 4),
+        "lines/wo_ref_w_nums": (0, 4),
+        "lines/wo_ref_wo_nums": (0, 4),
+        "lines/wo_ref_wo_nums_wo_short": (0, 4),
+    }
+
+    # Only the short lines are removed again, from the cached cleaned variant
+    change_stage(monkeypatch, "short_lines")
+    for stage in counted_stages:
+        counted_stages[stage] = 0
+    since = cache.stats()
+    assert normalize_documents(texts, variants=VARIANTS, cache=cache) == expected
+    assert counted_stages == {"prepare": 0, "clean": 0, "short_lines": 4}
+    assert lookups(cache, since) == {
+        "lines/w_ref_w_nums": (4, 0),
+        "lines/wo_ref_w_nums": (4, 0),
+        "lines/wo_ref_wo_nums": (4, 0),
+        "lines/wo_ref_wo_nums_wo_short": (0, 4),
+    }
+
+    # Everything is cached again by the new version
+    for stage in counted_stages:
+        counted_stages[stage] = 0
+    assert normalize_documents(texts, variants=VARIANTS, cache=cache) == expected
+    assert counted_stages == {"prepare": 0, "clean": 0, "short_lines": 0}
+    cache.close()
+
+
+def test_a_changed_clean_stage_starts_from_the_cached_prepared_documents(tmp_path, monkeypatch, counted_stages):
+    texts = load_corpus()[:4]
+    cache = ResultCache(str(tmp_path / "cache.sqlite"), max_bytes=10 ** 8)
+    expected = normalize_documents(texts, variants=VARIANTS, cache=cache)
+
+    change_stage(monkeypatch, "clean")
+    for stage in counted_stages:
+        counted_stages[stage] = 0
+    since = cache.stats()
+    assert normalize_documents(texts, variants=VARIANTS, cache=cache) == expected
+    assert counted_stages == {"prepare": 0, "clean": 4, "short_lines": 4}
+    assert lookups(cache, since) == {
+        "lines/prepare": (4, 0),
+        "lines/w_ref_w_nums": (0, 4),
+        "lines/wo_ref_w_nums": (0, 4),
+        "lines/wo_ref_wo_nums": (0, 4),
+        "lines/wo_ref_wo_nums_wo_short": (0, 4),
+    }
+    cache.close()
+
+
+def test_the_least_recently_used_values_are_evicted_down_to_evict_to(tmp_path, monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(result_cache_utils, "time", SimpleNamespace(time=lambda: next(clock)))
+    cache = ResultCache(str(tmp_path / "cache.sqlite"), max_bytes=10000)
+    # Random bytes do not compress, so every value takes about 1000 bytes
+    values = {f"doc{i}": os.urandom(1000) for i in range(9)}
+    for digest, value in values.items():
+        cache.put_many("stage", "v1", {digest: value})
+    assert cache.get_many("stage", "v1", ["doc0"]) == {"doc0": values["doc0"]}
+
+    cache.put_many("stage", "v1", {"doc9": os.urandom(1000), "doc10": os.urandom(1000)})
+
+    kept = cache.get_many("stage", "v1", [f"doc{i}" for i in range(11)])
+    total, = cache.conn.execute("SELECT stored_bytes FROM totals").fetchone()
+    assert total == cache.conn.execute("SELECT SUM(stored_size) FROM results").fetchone()[0]
+    assert 10000 * EVICT_TO - 1100 < total <= 10000 * EVICT_TO
+    # The oldest values went first, but doc0 was read since
+    assert sorted(kept) == ["doc0", "doc10", "doc4", "doc5", "doc6", "doc7", "doc8", "doc9"]
+    cache.close()
+
+
+def look_up(db_file, digests):
+    cache = ResultCache(db_file, max_bytes=10 ** 8)
+    found = cache.get_many("stage", "v1", digests)
+    cache.close()
+    return len(found)
+
+
+def test_the_stats_of_every_process_add_up(tmp_path):
+    db_file = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(db_file, max_bytes=10 ** 8)
+    cache.put_many("stage", "v1", {"a": b"1", "b": b"2"})
+
+    with ProcessPoolExecutor(max_workers=3) as pool:
+        found = list(pool.map(look_up, [db_file] * 3, [["a", "b", "c"], ["a", "d"], ["e"]]))
+
+    assert found == [2, 1, 0]
+    assert cache.stats() == {"stage": (3, 3)}
+    assert cache.report() == "stage: 3/6 hits (50.0%)"
+    cache.close()
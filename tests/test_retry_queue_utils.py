@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils import retry_queue_utils
+from utils.retry_queue_utils import RetryQueue
+
+
+def make_item(arxiv_id):
+    url = f"http://arxiv.org/pdf/{arxiv_id}v1"
+    return (0, arxiv_id, "hep-th", {"pdf_link": url}), url
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(retry_queue_utils, "time", SimpleNamespace(time=lambda: now.value))
+    # No jitter, so the delays are exact
+    monkeypatch.setattr(retry_queue_utils, "random", SimpleNamespace(uniform=lambda low, high: 1.0))
+    return now
+
+
+def test_retries_back_off_exponentially_up_to_the_cap_and_give_up(tmp_path, clock):
+    queue = RetryQueue(str(tmp_path / "index.db"), max_attempts=5, backoff_base=100, backoff_cap=300)
+    item, url = make_item("2001.00001")
+    delays = [queue.record_failure("hep-th", item, url, "download: HTTP 503", retryable=True) for _ in range(5)]
+    assert delays == [100, 200, 300, 300, None]
+    assert queue.counts("hep-th") == {"retries": 0, "gave_up": 1}
+    assert queue.queued_ids("hep-th") == {"2001.00001"}
+
+
+def test_permanent_failures_are_given_up_at_once(tmp_path, clock):
+    queue = RetryQueue(str(tmp_path / "index.db"))
+    item, url = make_item("2001.00001")
+    assert queue.record_failure("hep-th", item, url, "download: HTTP 404", retryable=False) is None
+    row = queue.conn.execute("SELECT attempts, next_attempt, last_error, gave_up FROM retries").fetchone()
+    assert row == (1, None, "download: HTTP 404", 1)
+    clock.value += 10 ** 9
+    assert queue.due("hep-th") == []
+
+
+def test_due_only_returns_the_entries_whose_time_has_come(tmp_path, clock):
+    db_file = str(tmp_path / "index.db")
+    queue = RetryQueue(db_file, backoff_base=100)
+    first, second, other = make_item("2001.00001"), make_item("2001.00002"), make_item("hep-th/9901001")
+    queue.record_failure("hep-th", *first, "download: timeout", retryable=True)
+    queue.record_failure("hep-th", *second, "download: timeout", retryable=True)
+    queue.record_failure("hep-th", *second, "download: timeout", retryable=True)
+    queue.record_failure("math.GM", *other, "download: timeout", retryable=True)
+
+    clock.value += 99
+    assert queue.due("hep-th") == []
+    clock.value += 1
+    assert queue.due("hep-th") == [first]
+    clock.value += 200
+    assert queue.due("hep-th") == [first, second]
+    assert queue.counts("hep-th") == {"retries": 2, "gave_up": 0}
+    queue.close()
+
+    # Persisted across runs, and dropped once ingested
+    queue = RetryQueue(db_file, backoff_base=100)
+    queue.remove("hep-th", ["2001.00001"])
+    assert queue.due("hep-th") == [second]
+    assert queue.due("math.GM") == [other]
+    queue.close()
@@ -0,0 +1,35 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from split_text_dataset import split_text_dataset
+from utils.parquet_utils import METADATA_SCHEMA, PAPERS_SCHEMA, TEXT_DIR, TEXT_SCHEMA
+
+
+def test_split_text_dataset_migrates_legacy_shards_once(tmp_path):
+    shards = {}
+    for n, count in ((1, 3), (2, 2)):
+        papers = [{"arxiv_id": f"200{n}.{i:05d}", "title": f"Paper {i}", "authors": "A. Smith", "year": 2020,
+                   "category": "math.GM", "summary": "A summary.", "pdf_content": f"Text of paper {n}.{i}"}
+                  for i in range(count)]
+        shards[f"math.GM_{n}.parquet"] = pa.Table.from_pylist(papers, schema=PAPERS_SCHEMA)
+        # Legacy shards hold the full papers, in several row groups
+        pq.write_table(shards[f"math.GM_{n}.parquet"], tmp_path / f"math.GM_{n}.parquet", row_group_size=2)
+    (tmp_path / "math.GM.manifest.json").write_text("{}")
+
+    split_text_dataset(str(tmp_path))
+    migrated = {file: (tmp_path / file).read_bytes() for file in shards}
+    split_text_dataset(str(tmp_path))
+
+    assert sorted(os.listdir(tmp_path / TEXT_DIR)) == sorted(shards)
+    for file, table in shards.items():
+        metadata = pq.read_table(tmp_path / file)
+        text = pq.read_table(tmp_path / TEXT_DIR / file)
+        assert metadata.schema == METADATA_SCHEMA and text.schema == TEXT_SCHEMA
+        assert metadata.num_rows == text.num_rows == table.num_rows
+        assert metadata == table.select(METADATA_SCHEMA.names)
+        assert text == table.select(TEXT_SCHEMA.names)
+        # The second run left the split shards alone
+        assert (tmp_path / file).read_bytes() == migrated[file]
+    assert not [file for file in os.listdir(tmp_path) if file.endswith((".tmp", ".split"))]